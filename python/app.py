@@ -1,22 +1,16 @@
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
-import pandas as pd
 import plotly.express as px
-import json
 import os
+from utils import load_json_to_dataframe
 
 # added to handle relative path for JSON file
 # replace with your desired file path
 filename = os.path.join(os.path.dirname(__file__), "..", "assets", "air_quality_data.json")
 
-# Load data from specified JSON file
-with open(filename, "r") as file:
-    data = json.load(file)
-
-# Extract the 'Data' section into a DataFrame
-data_section = data.get("Data", [])
-df = pd.DataFrame(data_section)
+# Stream the 'Data' section of the specified JSON file into a DataFrame
+df = load_json_to_dataframe(filename=filename, record_path="Data")
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
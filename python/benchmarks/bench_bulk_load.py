@@ -0,0 +1,77 @@
+"""
+Benchmark: bulk_load_csv vs. the previous read_csv + to_sql(chunksize=1000) path
+on a local SQLite database.
+
+    python benchmarks/bench_bulk_load.py --rows 1000000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import pandas as pd
+import sqlalchemy
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from bulk_load import bulk_load_csv
+from synthetic import write_synthetic_csv
+
+def load_with_to_sql(engine, table_name, data_path):
+    """The loader initialize_db_data used before bulk_load_csv."""
+    with engine.begin() as conn:
+        pd.read_csv(data_path).to_sql(table_name, conn, index=False, if_exists="replace", chunksize=1000)
+
+def measure(load, trace_memory=False):
+    """
+    Run `load()` and return (seconds, peak traced memory in MiB or None).
+    Tracing memory slows the load down, so only trust one of the two numbers per run.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = round(tracemalloc.get_traced_memory()[1] / 1024**2, 1)
+        tracemalloc.stop()
+    return seconds, peak
+
+def run(rows=200000, chunksize=50000, trace_memory=False):
+    """Load the same synthetic CSV both ways and return the timings."""
+    directory = tempfile.mkdtemp()
+    try:
+        data_path = write_synthetic_csv(os.path.join(directory, "synthetic.csv"), rows)
+        results = {}
+        for name, load in [
+            ("to_sql", lambda engine: load_with_to_sql(engine, "air_quality", data_path)),
+            ("bulk_load_csv", lambda engine: bulk_load_csv(engine, "air_quality", data_path, chunksize=chunksize)),
+        ]:
+            engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(directory, name + '.db')}")
+            seconds, peak = measure(lambda: load(engine), trace_memory)
+            engine.dispose()
+            results[name] = {"seconds": round(seconds, 3), "rows_per_second": round(rows / seconds), "peak_mib": peak}
+        results["speedup"] = round(results["to_sql"]["seconds"] / results["bulk_load_csv"]["seconds"], 2)
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk_load_csv with to_sql on SQLite.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--memory", action="store_true", help="also report peak Python memory (slower)")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.chunksize, args.memory)
+    for name in ("to_sql", "bulk_load_csv"):
+        r = results[name]
+        peak = f"  peak {r['peak_mib']} MiB" if r["peak_mib"] is not None else ""
+        print(f"{name:>14}: {r['seconds']:8.2f} s  {r['rows_per_second']:>9,} rows/s{peak}")
+    print(f"{'speedup':>14}: {results['speedup']}x")
+
+if __name__ == "__main__":
+    main()
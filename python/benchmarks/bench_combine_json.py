@@ -0,0 +1,133 @@
+"""
+Benchmark: scripts/combine_json.py (columnar frames, categorical header columns,
+arithmetic quarter-end dates, parallel reads) vs. the previous per-record path
+(a {**record, **header} dict per row and dates parsed from 'YYYYQn' strings).
+
+    python benchmarks/bench_combine_json.py --rows 1000000
+"""
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+import pandas.tseries.offsets as offsets
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "scripts")))
+from combine_json import combine_json_files, add_quarter_end_date
+from synthetic import write_synthetic_json_dir
+
+def combine_per_record(data_dir, pattern="quarterlysummary_by_state"):
+    """The combine_json_files used before: one merged dict per record."""
+    records = []
+    for fname in sorted(os.listdir(data_dir)):
+        if fname.startswith(pattern) and fname.endswith(".json"):
+            with open(os.path.join(data_dir, fname), "r") as f:
+                j = json.load(f)
+            header = j["Header"][0]
+            for record in j["Data"]:
+                records.append({**record, **header})
+    return pd.DataFrame(records)
+
+def add_quarter_end_date_strings(df, year_col="year", quarter_col="quarter", date_col="date"):
+    """The add_quarter_end_date used before: parses 'YYYYQn' strings."""
+    df[year_col] = df[year_col].astype(int)
+    df[quarter_col] = df[quarter_col].astype(int)
+    df[date_col] = pd.to_datetime(df[year_col].astype(str) + 'Q' + df[quarter_col].astype(str)) + offsets.QuarterEnd()
+    return df
+
+METHODS = {
+    "per_record": lambda data_dir, workers: add_quarter_end_date_strings(combine_per_record(data_dir)),
+    "columnar": lambda data_dir, workers: add_quarter_end_date(combine_json_files(data_dir, workers=1)),
+    "columnar_parallel": lambda data_dir, workers: add_quarter_end_date(combine_json_files(data_dir, workers=workers)),
+}
+
+def measure(method, data_dir, workers=None):
+    """Run one method in this process. Returns seconds, peak RSS of this process (not pool workers) and the frame's size."""
+    start = time.perf_counter()
+    df = METHODS[method](data_dir, workers)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 3),
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "frame_mib": round(df.memory_usage(deep=True).sum() / 1024**2, 1),
+    }
+
+def measure_in_subprocess(method, data_dir, workers=None, timeout=None):
+    """
+    measure() in a fresh interpreter, so peak memory isn't shared between methods.
+    None if it fails (e.g. runs out of memory) or takes longer than `timeout` seconds.
+    """
+    command = [sys.executable, "-W", "ignore", __file__, "--measure", method, "--data-dir", data_dir]
+    if workers:
+        command += ["--workers", str(workers)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"{method} timed out after {timeout} s")
+        return None
+    if completed.returncode != 0:
+        print(f"{method} failed with exit code {completed.returncode}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def check_same_result(files=5, rows=5000):
+    """The methods produce the same rows, values and dates."""
+    directory = tempfile.mkdtemp()
+    try:
+        write_synthetic_json_dir(directory, rows, files)
+        frames = [METHODS[method](directory, 2) for method in METHODS]
+        for frame in frames[1:]:
+            pd.testing.assert_frame_equal(frames[0], frame, check_dtype=False, check_categorical=False)
+    finally:
+        shutil.rmtree(directory)
+
+def run(rows=200000, files=50, workers=None, timeout=None):
+    """Combine the same synthetic JSON directory each way and return the timings."""
+    check_same_result()
+    directory = tempfile.mkdtemp()
+    try:
+        write_synthetic_json_dir(directory, rows, files)
+        results = {method: measure_in_subprocess(method, directory, workers, timeout) for method in METHODS}
+        for result in results.values():
+            if result:
+                result["rows_per_second"] = round(rows / result["seconds"])
+        if results["per_record"] and results["columnar_parallel"]:
+            results["speedup"] = round(results["per_record"]["seconds"] / results["columnar_parallel"]["seconds"], 2)
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare combine_json with the per-record combine.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per method")
+    parser.add_argument("--measure", choices=list(METHODS), help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.data_dir, args.workers)))
+        return
+
+    results = run(args.rows, args.files, args.workers, args.timeout)
+    for method in METHODS:
+        r = results[method]
+        if r is None:
+            print(f"{method:>17}: failed")
+            continue
+        print(f"{method:>17}: {r['seconds']:8.2f} s  {r['rows_per_second']:>9,} rows/s  "
+              f"peak RSS {r['peak_rss_mib']:,} MiB  frame {r['frame_mib']:,} MiB")
+    if "speedup" in results:
+        print(f"{'speedup':>17}: {results['speedup']}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: memory use and groupby speed of the combined dataset as pandas infers it
+vs. with the declared AQS schema (schema.apply_schema).
+
+    python benchmarks/bench_schema.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from cube import AggregateCube
+from schema import apply_schema
+from synthetic import write_synthetic_csv, SAMPLE_PATH
+
+def groupbys(df):
+    """The dashboard's aggregations: per (parameter, county, date) means and the per-county time series."""
+    return {
+        "mean_by_parameter_county_date": lambda: df.groupby(['parameter', 'county', 'date'], observed=True)['arithmetic_mean'].mean(),
+        "max_by_site_year": lambda: df.groupby(['state_code', 'county_code', 'site_number', 'year'], observed=True)['maximum_value'].max(),
+        "aggregate_cube": lambda: AggregateCube(df),
+    }
+
+def best_of(function, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(rows=None, repeat=3):
+    """Time the groupbys on the inferred and the declared frame. `rows` resamples the sample dataset (None: use it as is)."""
+    if rows:
+        # Round-trip through a CSV file so the frame has the types pandas infers on load
+        with tempfile.TemporaryDirectory() as directory:
+            inferred = pd.read_csv(write_synthetic_csv(os.path.join(directory, "synthetic.csv"), rows))
+    else:
+        inferred = pd.read_csv(SAMPLE_PATH)
+    inferred['date'] = pd.to_datetime(inferred['date']) # the dashboard parses dates either way
+    start = time.perf_counter()
+    declared = apply_schema(inferred)
+    results = {"rows": len(inferred), "apply_schema_seconds": round(time.perf_counter() - start, 3)}
+    for name, df in (("inferred", inferred), ("declared", declared)):
+        results[name] = {
+            "memory_mib": round(df.memory_usage(deep=True).sum() / 1024**2, 1),
+            **{key: round(best_of(function, repeat), 4) for key, function in groupbys(df).items()},
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory and groupby speed with inferred vs. declared dtypes.")
+    parser.add_argument("--rows", type=int, default=None, help="synthetic rows (default: the sample dataset)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    print(f"{results['rows']:,} rows, apply_schema {results['apply_schema_seconds']} s")
+    for key in results["inferred"]:
+        before, after = results["inferred"][key], results["declared"][key]
+        unit = "MiB" if key == "memory_mib" else "s"
+        print(f"{key:>30}: {before:>10} {unit} -> {after:>10} {unit}  ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Benchmark suite: ingest, aggregation and dashboard callback latency on synthetic
+AQS data with the combined_data schema (see synthetic.py), at several sizes.
+
+    python benchmarks/suite.py                          # 10k rows
+    python benchmarks/suite.py --sizes 10k,1m,10m
+    python benchmarks/suite.py --groups callbacks --compare HEAD~1
+
+Cases:
+- ingest: load_json_to_dataframe, combine_json_files and initialize_db_data on SQLite
+- aggregation: the dashboard's groupbys (AggregateCube and its lookups, filter_df, FilterIndex)
+- callbacks: each Dash callback called directly, with the parquet (in-memory) and the
+  SQLite (SQL pushdown) backend; figure callbacks are timed uncached ('build') and
+  from the figure cache ('cached')
+
+Each size runs in its own interpreter so peak memory doesn't carry over. Every run
+is appended to a JSON history (--history) with the commit it ran on, and compared
+with the latest earlier run on the same machine (or the one at --compare). The file
+isn't named test_*.py, so pytest doesn't collect it.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+from datetime import datetime as dt
+
+import pandas as pd
+import sqlalchemy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.append(APP_DIR)
+sys.path.append(os.path.abspath(os.path.join(APP_DIR, "..", "scripts")))
+from synthetic import make_quarterly_frame, write_synthetic_json_dir
+
+GROUPS = ["ingest", "aggregation", "callbacks"]
+HISTORY_PATH = os.path.join(APP_DIR, ".benchmarks", "history.json")
+ROWS_PER_JSON_FILE = 20000
+# Dash callbacks that return figures, and the memoized function that builds each figure
+FIGURE_CALLBACKS = {"update_time_series": "full_time_series_figure", "update_distribution": "update_distribution", "update_map": "update_map"}
+REGRESSION_THRESHOLD = 1.2 # flag cases this much slower than the baseline run
+
+def parse_size(size):
+    """'10k' -> 10000, '1m' -> 1000000."""
+    size = size.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(size[-1], 1)
+    return int(float(size.rstrip("km")) * multiplier)
+
+def timed(function, repeat=1):
+    """Best of `repeat` calls, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 5)
+
+def ingest_cases(directory, frame):
+    """One-shot loads: timed once."""
+    from utils import load_json_to_dataframe, initialize_db_data
+    from combine_json import combine_json_files
+
+    json_dir = os.path.join(directory, "json")
+    os.makedirs(json_dir)
+    json_paths = write_synthetic_json_dir(json_dir, len(frame), files=max(1, len(frame) // ROWS_PER_JSON_FILE))
+    csv_path = os.path.join(directory, "combined.csv")
+    frame.to_csv(csv_path, index=False)
+    engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(directory, 'ingest.db')}")
+    results = {
+        "load_json_to_dataframe": timed(lambda: [load_json_to_dataframe(path, record_path="Data") for path in json_paths]),
+        "combine_json_files": timed(lambda: combine_json_files(json_dir)),
+        "initialize_db_data_sqlite": timed(
+            lambda: initialize_db_data(engine, sqlalchemy.inspect, "air_quality", csv_path, "sqlite")
+        ),
+    }
+    engine.dispose()
+    shutil.rmtree(json_dir)
+    return results
+
+def aggregation_cases(frame, repeat):
+    """The dashboard's groupbys and filters on the loaded frame."""
+    from cube import AggregateCube
+    from utils import filter_df, FilterIndex
+    from schema import apply_schema
+
+    df = apply_schema(frame).dropna(subset=["arithmetic_mean"])
+    cube = AggregateCube(df)
+    index = FilterIndex(df, max_cached=0)
+    parameter = df["parameter"].value_counts().index[0]
+    counties = list(df.loc[df["parameter"] == parameter, "county"].value_counts().index[:2])
+    return {
+        "apply_schema": timed(lambda: apply_schema(frame), repeat),
+        "aggregate_cube": timed(lambda: AggregateCube(df), repeat),
+        "grouped_df": timed(lambda: cube.grouped_df(), repeat),
+        "quarterly_df": timed(lambda: cube.quarterly_df(), repeat),
+        "time_series": timed(lambda: cube.time_series(parameter, counties), repeat),
+        "histogram": timed(lambda: cube.histogram(parameter, counties), repeat),
+        "filter_df": timed(lambda: filter_df(df=df, pollutant=parameter, counties=counties), repeat),
+        "filter_index": timed(lambda: index.filter(pollutant=parameter, counties=counties), repeat),
+        "filter_index_build": timed(lambda: FilterIndex(df), repeat),
+    }
+
+def dashboard_env(directory, backend):
+    """Settings for dash-app.py, which reads them at import: set before the child process starts."""
+    return {
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY") or "benchmark",
+        "DB_CONNECTION_TYPE": backend,
+        "PARQUET_DATA_PATH": os.path.join(directory, "combined.parquet"),
+        "SQLITE_DB_PATH": os.path.join(directory, "callbacks.db"),
+        "FIGURE_CACHE_DIR": os.path.join(directory, "figures"),
+        "LLM_CACHE_DIR": os.path.join(directory, "llm"),
+        "JOB_QUEUE_PATH": os.path.join(directory, "jobs", "jobs.sqlite"),
+        "PRELOAD_DATA": "false",
+    }
+
+def load_dashboard(directory, frame, backend):
+    """Write `frame` where dashboard_env points the backend, then import dash-app.py."""
+    from utils import save_parquet_dataset, initialize_db_data
+    if backend == "parquet":
+        save_parquet_dataset(frame, os.environ["PARQUET_DATA_PATH"])
+    else:
+        csv_path = os.path.join(directory, "callbacks.csv")
+        frame.to_csv(csv_path, index=False)
+        engine = sqlalchemy.create_engine(f"sqlite:///{os.environ['SQLITE_DB_PATH']}")
+        initialize_db_data(engine, sqlalchemy.inspect, "air_quality", csv_path, "sqlite")
+        engine.dispose()
+    cwd = os.getcwd()
+    os.chdir(APP_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location("dash_app", os.path.join(APP_DIR, "dash-app.py"))
+        app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app)
+    finally:
+        os.chdir(cwd)
+    return app
+
+def callback_cases(directory, frame, backend, repeat):
+    """Each callback called directly, as Dash would on a page load and a selection."""
+    app = load_dashboard(directory, frame, backend)
+    results = {"load_data": timed(app.get_data)}
+    data = app.get_data()
+    parameter = data.pollutant_options[0]["value"]
+    counties = [option["value"] for option in app.set_county_options(parameter, None)[1:3]]
+    results["set_pollutant_options"] = timed(lambda: app.set_pollutant_options("/"), repeat)
+    results["set_county_options"] = timed(lambda: app.set_county_options(parameter, None), repeat)
+    for name, figure in FIGURE_CALLBACKS.items():
+        callback, build = getattr(app, name), getattr(app, figure).__wrapped__
+        for selection, selected in (("all", None), ("counties", counties)):
+            results[f"{name}.{selection}.build"] = timed(lambda: build(parameter, selected).to_json(), repeat)
+            callback(parameter, selected) # fill the figure cache
+            results[f"{name}.{selection}.cached"] = timed(lambda: callback(parameter, selected), repeat)
+    # Zoomed in on the last two years (the refined window is built from the downsampling levels)
+    end = frame["date"].max()
+    window = (str(pd.Timestamp(end) - pd.DateOffset(years=2)), str(pd.Timestamp(end)))
+    results["update_time_series.zoom.build"] = timed(lambda: app.time_series_figure(parameter, None, window).to_json(), repeat)
+    return {f"{backend}.{name}": seconds for name, seconds in results.items()}
+
+def run_size(rows, groups, directory, repeat=3, backend="parquet"):
+    """Run the cases of `groups` at one size in this process. Returns {group: {case: seconds}}."""
+    frame = make_quarterly_frame(rows)
+    results = {}
+    if "ingest" in groups and backend == "parquet":
+        results["ingest"] = ingest_cases(directory, frame)
+    if "aggregation" in groups and backend == "parquet":
+        results["aggregation"] = aggregation_cases(frame, repeat)
+    if "callbacks" in groups:
+        results["callbacks"] = callback_cases(directory, frame, backend, repeat)
+    return results
+
+def run_size_in_subprocess(rows, groups, repeat, backend):
+    """run_size in a fresh interpreter with its own scratch directory."""
+    directory = tempfile.mkdtemp()
+    command = [
+        sys.executable, "-W", "ignore", os.path.abspath(__file__), "--child", str(rows), "--dir", directory,
+        "--groups", ",".join(groups), "--repeat", str(repeat), "--backend", backend,
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, env={**os.environ, **dashboard_env(directory, backend)})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if completed.returncode != 0:
+        print(f"{rows:,} rows ({backend}) failed with exit code {completed.returncode}:\n{completed.stderr[-2000:]}")
+        return {}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit(ref="HEAD"):
+    """The commit hash of `ref` ('-dirty' if it's HEAD and the tree has changes), or None outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", ref], cwd=APP_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        if ref == "HEAD":
+            status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=APP_DIR, capture_output=True, text=True)
+            if status.stdout.strip():
+                commit += "-dirty"
+        return commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def save_history(history, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_path, path)
+
+def find_baseline(history, run, compare=None):
+    """The latest earlier run at `compare` (a commit prefix), or on the same machine."""
+    for previous in reversed(history):
+        if compare:
+            if (previous["commit"] or "").startswith(compare):
+                return previous
+        elif previous["machine"] == run["machine"]:
+            return previous
+    return None
+
+def print_results(run, baseline=None):
+    for size, groups in run["results"].items():
+        print(f"\n{int(size):,} rows")
+        for group, cases in groups.items():
+            for case, seconds in cases.items():
+                line = f"  {group:>11}  {case:<45} {seconds * 1000:>11.2f} ms"
+                before = (baseline or {}).get("results", {}).get(size, {}).get(group, {}).get(case)
+                if before:
+                    ratio = seconds / before
+                    flag = "  SLOWER" if ratio > REGRESSION_THRESHOLD else ""
+                    line += f"  {ratio:5.2f}x vs {before * 1000:.2f} ms{flag}"
+                print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest, aggregation and dashboard callbacks.")
+    parser.add_argument("--sizes", default="10k", help="comma-separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"comma-separated subset of {GROUPS}")
+    parser.add_argument("--repeat", type=int, default=3, help="timings per case (best is kept); ingest runs once")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON file runs are appended to")
+    parser.add_argument("--compare", help="git ref to compare with (default: the previous run on this machine)")
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the history")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backend", default="parquet", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    groups = [group for group in args.groups.split(",") if group]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {sorted(unknown)}")
+
+    if args.child:
+        print(json.dumps(run_size(args.child, groups, args.dir, args.repeat, args.backend)))
+        return
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": dt.now().isoformat(timespec="seconds"),
+        "machine": f"{socket.gethostname()} {platform.machine()} {os.cpu_count()} cpus",
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "results": {},
+    }
+    for rows in map(parse_size, args.sizes.split(",")):
+        results = run_size_in_subprocess(rows, groups, args.repeat, "parquet")
+        if "callbacks" in groups:
+            sql_results = run_size_in_subprocess(rows, ["callbacks"], args.repeat, "sqlite")
+            results.setdefault("callbacks", {}).update(sql_results.get("callbacks", {}))
+        run["results"][str(rows)] = results
+
+    history = load_history(args.history)
+    compare = git_commit(args.compare) if args.compare else None
+    print_results(run, find_baseline(history, run, compare))
+    if not args.no_save:
+        history.append(run)
+        save_history(history, args.history)
+        print(f"\nSaved to {args.history}")
+
+if __name__ == "__main__":
+    main()
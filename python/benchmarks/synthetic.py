@@ -0,0 +1,57 @@
+"""
+Synthetic AQS quarterlyData for benchmarks.
+
+Rows are resampled from the sample dataset in data/ (so every column, dtype and
+repetitive string looks like real API output), spread over more years and with
+perturbed measurements.
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+def make_quarterly_frame(rows, years=range(2000, 2025), seed=0, sample_path=SAMPLE_PATH):
+    """Return a frame of `rows` synthetic quarterly records."""
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(sample_path, dtype={"state_code": str, "county_code": str, "site_number": str})
+    df = sample.iloc[rng.integers(0, len(sample), rows)].reset_index(drop=True)
+
+    years = np.asarray(list(years))
+    df["year"] = rng.choice(years, rows)
+    df["quarter"] = rng.integers(1, 5, rows)
+    df["date"] = (pd.PeriodIndex.from_fields(year=df["year"], quarter=df["quarter"], freq="Q")
+                  .to_timestamp(how="end").strftime("%Y-%m-%d"))
+    df["arithmetic_mean"] = df["arithmetic_mean"] * rng.lognormal(0, 0.3, rows)
+    df["observation_count"] = rng.integers(1, 92, rows)
+    return df
+
+def write_synthetic_csv(path, rows, seed=0):
+    """Write `rows` synthetic quarterly records to a CSV file and return its path."""
+    make_quarterly_frame(rows, seed=seed).to_csv(path, index=False)
+    return path
+
+HEADER_COLUMNS = ["status", "request_time", "url", "rows"]
+
+def write_synthetic_json_dir(directory, rows, files=50, seed=0, pattern="quarterlysummary_by_state"):
+    """
+    Write `rows` synthetic quarterly records to `files` AQS-style JSON responses
+    ({"Header": [...], "Data": [...]}) in `directory` and return the file paths.
+    """
+    df = make_quarterly_frame(rows, seed=seed).drop(columns=HEADER_COLUMNS + ["date"])
+    paths = []
+    for number, chunk in enumerate(np.array_split(np.arange(rows), files)):
+        data = df.iloc[chunk]
+        header = [{
+            "status": "Success",
+            "request_time": f"2025-10-06T10:{number % 60:02d}:00-04:00",
+            "url": f"https://aqs.epa.gov/data/api/quarterlyData/byState?email=*****&key=*****&state={number:02d}",
+            "rows": len(data),
+        }]
+        path = os.path.join(directory, f"{pattern}_{number:03d}.json")
+        with open(path, "w") as f:
+            f.write(f'{{"Header": {json.dumps(header)}, "Data": {data.to_json(orient="records")}}}')
+        paths.append(path)
+    return paths
@@ -0,0 +1,224 @@
+import io
+
+import pandas as pd
+import sqlalchemy
+
+from constants import BULK_LOAD_CHUNKSIZE, BULK_LOAD_INDEXES
+
+# Column kinds from narrowest to widest; a column takes the widest kind any chunk needs
+KIND_TYPES = {
+    "bool": sqlalchemy.Boolean,
+    "int": sqlalchemy.BigInteger,
+    "float": lambda: sqlalchemy.Float(precision=53),
+    "datetime": sqlalchemy.DateTime,
+    "text": sqlalchemy.Text,
+}
+
+def column_kind(series):
+    """Kind of the non-missing values of a column ('bool', 'int', 'float', 'datetime' or 'text'), None if there are none."""
+    values = series.dropna()
+    if values.empty:
+        return None
+    if pd.api.types.is_bool_dtype(values):
+        return "bool"
+    if pd.api.types.is_integer_dtype(values):
+        return "int"
+    if pd.api.types.is_float_dtype(values):
+        # Integer columns with missing values are read as floats
+        integral = (values == values.round()).all() and values.abs().max() < 2**63
+        return "int" if integral else "float"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "datetime"
+    return "text"
+
+def widen(kind, other):
+    """The narrowest kind that holds values of both kinds."""
+    if kind is None or kind == other:
+        return other
+    if other is None:
+        return kind
+    if {kind, other} == {"int", "float"}:
+        return "float"
+    return "text"
+
+def _sql_types(kinds, indexed_columns=()):
+    """
+    Explicit SQL column types for column kinds (all-missing columns are text).
+    Indexed text columns get a bounded VARCHAR so MySQL can index them.
+    """
+    types = {}
+    for column, kind in kinds.items():
+        kind = kind or "text"
+        types[column] = sqlalchemy.String(255) if kind == "text" and column in indexed_columns else KIND_TYPES[kind]()
+    return types
+
+def get_column_types(df, indexed_columns=()):
+    """Explicit SQL column types for a frame, from the kinds of its columns."""
+    return _sql_types({column: column_kind(df[column]) for column in df.columns}, indexed_columns)
+
+def scan_column_types(data_path, chunksize=BULK_LOAD_CHUNKSIZE, indexed_columns=()):
+    """
+    Explicit SQL column types for a CSV, read `chunksize` rows at a time: each column
+    gets the widest kind any chunk needs (e.g. text if a later chunk has '06A' in a
+    column of numbers).
+    """
+    kinds = {}
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        for column in chunk.columns:
+            kinds[column] = widen(kinds.get(column), column_kind(chunk[column]))
+    return _sql_types(kinds, indexed_columns)
+
+def _cast_chunk(chunk, column_types):
+    """Cast a CSV chunk to the declared column types; raises ValueError on a value that doesn't fit."""
+    chunk = chunk.reindex(columns=list(column_types))
+    for column, col_type in column_types.items():
+        try:
+            if isinstance(col_type, sqlalchemy.Boolean):
+                continue
+            if isinstance(col_type, sqlalchemy.Integer):
+                chunk[column] = pd.to_numeric(chunk[column]).astype("Int64")
+            elif isinstance(col_type, sqlalchemy.Float):
+                chunk[column] = pd.to_numeric(chunk[column])
+            elif isinstance(col_type, sqlalchemy.DateTime):
+                chunk[column] = pd.to_datetime(chunk[column])
+            else:
+                chunk[column] = chunk[column].where(chunk[column].isna(), chunk[column].astype(str))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Column '{column}' has a value that doesn't fit its {col_type} type: {e}") from e
+    return chunk
+
+def _chunk_rows(chunk):
+    """Rows as tuples of Python values, with None for missing values."""
+    columns = []
+    for column in chunk.columns:
+        values = chunk[column].astype(object).to_numpy()
+        values[pd.isna(chunk[column]).to_numpy()] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+def _copy_postgres(dbapi_conn, driver, table, columns, chunk):
+    """COPY a chunk into PostgreSQL as CSV from an in-memory buffer."""
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    cursor = dbapi_conn.cursor()
+    if driver == "pg8000":
+        cursor.execute(sql, stream=buffer)
+    elif driver == "psycopg":
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.read())
+    else:
+        cursor.copy_expert(sql, buffer)
+    cursor.close()
+
+def _insert_many(dbapi_conn, table, columns, placeholder, chunk):
+    """executemany INSERT; MySQL drivers rewrite it into multi-row VALUES batches."""
+    values = ", ".join([placeholder] * len(chunk.columns))
+    cursor = dbapi_conn.cursor()
+    cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({values})", _chunk_rows(chunk))
+    cursor.close()
+
+def bulk_load_csv(engine, table_name, data_path, chunksize=BULK_LOAD_CHUNKSIZE, indexes=BULK_LOAD_INDEXES, if_exists="fail"):
+    """
+    Stream a CSV into a new table using the fastest load path of the database.
+
+    The CSV is read `chunksize` rows at a time and each chunk is committed in its own
+    transaction, so the whole file never sits in memory:
+    - PostgreSQL: COPY FROM STDIN (pg8000, psycopg2 or psycopg)
+    - MySQL: executemany, sent as multi-row INSERT statements by the driver
+    - SQLite: executemany with synchronous=OFF and an enlarged page cache during the load
+    - anything else: pandas to_sql with multi-row inserts
+    Column types come from a first pass over the file (scan_column_types). Rows are
+    loaded into a '<table>_loading' table that is renamed to `table_name` once every
+    chunk is in, so a failed load never leaves a partial table behind; the `indexes`
+    (lists of columns present in the CSV) are built after the rename.
+
+    Args:
+        if_exists (str): "fail" or "replace" if the table already exists.
+    Returns: number of rows loaded.
+    """
+    if if_exists != "replace":
+        with engine.connect() as conn:
+            if sqlalchemy.inspect(conn).has_table(table_name):
+                raise ValueError(f"Table '{table_name}' already exists.")
+
+    columns = pd.read_csv(data_path, nrows=0).columns
+    if len(columns) == 0:
+        return 0
+    indexes = [index for index in indexes if all(c in columns for c in index)]
+    column_types = scan_column_types(data_path, chunksize, {c for index in indexes for c in index})
+    # Text columns are read as strings so values such as '06' keep their leading zeros
+    text_columns = {c: str for c, t in column_types.items() if isinstance(t, sqlalchemy.String)}
+
+    loading_name = f"{table_name}_loading"
+    metadata = sqlalchemy.MetaData()
+    loading = sqlalchemy.Table(loading_name, metadata, *[sqlalchemy.Column(c, t) for c, t in column_types.items()])
+    with engine.begin() as conn:
+        loading.drop(conn, checkfirst=True)  # left over from an interrupted load
+        loading.create(conn)
+
+    dialect, driver = engine.dialect.name, engine.dialect.driver
+    quote = engine.dialect.identifier_preparer.quote
+    quoted_loading = quote(loading_name)
+    quoted_columns = ", ".join(quote(c) for c in column_types)
+
+    rows = 0
+    try:
+        with engine.connect() as conn:
+            dbapi_conn = conn.connection.dbapi_connection
+            if dialect == "sqlite":
+                dbapi_conn.execute("PRAGMA synchronous = OFF")
+                dbapi_conn.execute("PRAGMA cache_size = -200000")  # ~200 MB
+                dbapi_conn.execute("PRAGMA temp_store = MEMORY")
+            try:
+                for chunk in pd.read_csv(data_path, chunksize=chunksize, dtype=text_columns):
+                    chunk = _cast_chunk(chunk, column_types)
+                    if dialect == "postgresql":
+                        _copy_postgres(dbapi_conn, driver, quoted_loading, quoted_columns, chunk)
+                    elif dialect == "mysql":
+                        _insert_many(dbapi_conn, quoted_loading, quoted_columns, "%s", chunk)
+                    elif dialect == "sqlite":
+                        _insert_many(dbapi_conn, quoted_loading, quoted_columns, "?", chunk)
+                    else:
+                        chunk.to_sql(loading_name, conn, index=False, if_exists="append", method="multi", chunksize=1000)
+                    if dialect in ("postgresql", "mysql", "sqlite"):
+                        dbapi_conn.commit()
+                    else:
+                        conn.commit()
+                    rows += len(chunk)
+            finally:
+                if dialect == "sqlite":
+                    dbapi_conn.execute("PRAGMA synchronous = FULL")
+
+        with engine.begin() as conn:
+            if sqlalchemy.inspect(conn).has_table(table_name):
+                if if_exists != "replace":
+                    raise ValueError(f"Table '{table_name}' already exists.")
+                sqlalchemy.Table(table_name, sqlalchemy.MetaData()).drop(conn)
+            conn.execute(sqlalchemy.text(f"ALTER TABLE {quoted_loading} RENAME TO {quote(table_name)}"))
+            create_indexes(conn, table_name, indexes)
+    except BaseException:
+        with engine.begin() as conn:
+            loading.drop(conn, checkfirst=True)
+        raise
+    return rows
+
+def create_indexes(conn, table_name, indexes):
+    """
+    Create the `indexes` (lists of columns) on an existing table, skipping any that
+    already exist or name columns the table doesn't have. On MySQL, TEXT columns are
+    indexed on a prefix.
+    Returns: names of the indexes created.
+    """
+    table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), autoload_with=conn)
+    existing = {index["name"] for index in sqlalchemy.inspect(conn).get_indexes(table_name)}
+    created = []
+    for columns in indexes:
+        name = f"idx_{table_name}_{'_'.join(columns)}"
+        if name in existing or not all(c in table.c for c in columns):
+            continue
+        prefixes = {c: 64 for c in columns if isinstance(table.c[c].type, sqlalchemy.Text)}
+        sqlalchemy.Index(name, *[table.c[c] for c in columns], mysql_length=prefixes or None).create(conn)
+        created.append(name)
+    return created
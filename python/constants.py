@@ -6,5 +6,77 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CONNECTION_TYPE = os.getenv("DB_CONNECTION_TYPE", "mysql")
 MODE = os.getenv("MODE", "development").lower() # "development" or "production"
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true" # sample stacks, served on /debug/profile
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", 0.01)) # seconds between samples
 MAX_INPUT_LENGTH = 1000
-BLOCKED_PATTERNS = ["ignore", "disregard", "forget", "repeat back", "show me the prompt", "new instructions", "override", "pretend", "bypass","you are now", "system message","system:", "assistant:", "user:", "reset"]
\ No newline at end of file
+BLOCKED_PATTERNS = ["ignore", "disregard", "forget", "repeat back", "show me the prompt", "new instructions", "override", "pretend", "bypass","you are now", "system message","system:", "assistant:", "user:", "reset"]
+
+# EPA AQS API request limits (see readme "Request Limits and Terms of Service")
+AQS_MAX_PARAMS_PER_REQUEST = 5
+AQS_REQUESTS_PER_MINUTE = 10
+AQS_MIN_REQUEST_INTERVAL = 5.0 # seconds to wait after a request completes
+
+# On-disk cache for AQS API responses
+AQS_CACHE_DIR = os.getenv("AQS_CACHE_DIR", ".aqs_cache")
+AQS_CACHE_MAX_BYTES = int(os.getenv("AQS_CACHE_MAX_BYTES", 2 * 1024**3))
+AQS_CACHE_TTL = float(os.getenv("AQS_CACHE_TTL", 24 * 60 * 60)) # seconds, for years that are not yet certified
+
+# Natural key of quarterlyData rows, used to upsert incremental syncs
+QUARTERLY_NATURAL_KEY = ["state_code", "county_code", "site_number", "parameter_code", "poc", "year", "quarter",
+                         "sample_duration", "pollutant_standard", "event_type"]
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", "data/sync_state.json")
+
+# Parquet storage for combined datasets
+PARQUET_PARTITION_COLS = ["year", "parameter_code"]
+PARQUET_DATA_PATH = os.getenv("PARQUET_DATA_PATH", "data/combined_data.parquet")
+
+# On-disk cache for rendered dashboard figures, shared by gunicorn workers
+FIGURE_CACHE_DIR = os.getenv("FIGURE_CACHE_DIR", ".figure_cache")
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_BYTES", 256 * 1024**2))
+# Seconds a SQL table's data version (part of the figure cache key) is reused before it is read again
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", 60))
+
+# Map rendering: above MAP_AGGREGATE_THRESHOLD rows the map shows one marker per site,
+# and above MAP_MAX_MARKERS sites one per MAP_GRID_CELL_PX-pixel grid cell
+MAP_AGGREGATE_THRESHOLD = int(os.getenv("MAP_AGGREGATE_THRESHOLD", 5000))
+MAP_MAX_MARKERS = int(os.getenv("MAP_MAX_MARKERS", 2000))
+MAP_GRID_CELL_PX = int(os.getenv("MAP_GRID_CELL_PX", 24))
+
+# Time series: points per line (per county) sent to the browser, and how lines are reduced to it
+TIME_SERIES_POINT_BUDGET = int(os.getenv("TIME_SERIES_POINT_BUDGET", 1000))
+TIME_SERIES_DOWNSAMPLE = os.getenv("TIME_SERIES_DOWNSAMPLE", "lttb").lower() # "lttb" or "minmax"
+
+# On-disk cache for LLM graph results
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024**2))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60)) # seconds
+
+# Estimated tokens of the cleaned_df summary sent with each LLM request
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", 600))
+
+# Worker processes that run LLM-generated figure code
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", 2))
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", 20)) # seconds of wall-clock (and CPU) time per snippet, 0 for no limit
+SANDBOX_MEMORY_LIMIT = int(os.getenv("SANDBOX_MEMORY_LIMIT", 1024**3)) # bytes a worker may grow by
+SANDBOX_MAX_TASKS = int(os.getenv("SANDBOX_MAX_TASKS", 100)) # snippets before a worker is replaced
+
+# SQLite-backed queue for LLM graph jobs, shared by gunicorn workers
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", ".jobs/jobs.sqlite")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 4)) # jobs run at once per process
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", 300)) # seconds without progress before a running job is retried
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", 60 * 60)) # seconds finished jobs are kept
+
+# Bulk CSV loads into the database
+BULK_LOAD_CHUNKSIZE = int(os.getenv("BULK_LOAD_CHUNKSIZE", 50000)) # rows read and committed per batch
+# Covering index for the dashboard's SQL queries (filter on parameter/county, group by date, average the value)
+BULK_LOAD_INDEXES = [["parameter", "county", "date", "arithmetic_mean"]] # built after the load
+
+# Load the dashboard data in the background at startup instead of on the first page load
+PRELOAD_DATA = os.getenv("PRELOAD_DATA", "false").lower() == "true"
+
+# Database connection pool, per process (size it with the gunicorn worker count: workers x (size + overflow) connections)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5)) # connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5)) # extra connections allowed under load
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30)) # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800)) # seconds before a connection is replaced (Cloud SQL drops idle ones)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true" # test connections before use
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pandas.tseries.offsets as offsets
+
+from map_aggregates import SITE_COLUMNS, SITE_KEYS, site_table, select_counties
+
+# Attributes carried through aggregation with 'first', as in the dashboard's groupbys
+FIRST_COLUMNS = [
+    'local_site_name', 'city', 'state', 'county_code', 'latitude', 'longitude',
+    'units_of_measure', 'year', 'quarter', 'parameter_code'
+]
+
+class AggregateCube:
+    """
+    Aggregates of the air quality data, built once at ingest and indexed by
+    (parameter, county, date).
+
+    Each cell holds the sum and count of `value_col` (so cells can be merged into
+    coarser means) plus the 'first' attributes the dashboard shows. Histogram bin
+    counts are kept per (parameter, county) over fixed per-parameter bin edges, so any
+    county selection is an array sum, and per-site aggregates for the map are kept
+    per parameter. Lookups cost time proportional to the result, not to the number of
+    rows behind it.
+    """
+    def __init__(self, df, value_col="arithmetic_mean", bins=50):
+        self.value_col = value_col
+        self.bins = bins
+        df = df.dropna(subset=[value_col])
+        first_columns = [c for c in FIRST_COLUMNS if c in df.columns]
+
+        cells = df.groupby(['parameter', 'county', 'date'], observed=True, sort=True).agg(
+            value_sum=(value_col, 'sum'),
+            value_count=(value_col, 'count'),
+            **{c: (c, 'first') for c in first_columns}
+        )
+        cells[value_col] = cells['value_sum'] / cells['value_count']
+        self.cells = cells
+
+        self._series = {}
+        for (parameter, county), frame in cells.groupby(level=['parameter', 'county'], observed=True, sort=False):
+            self._series[(parameter, county)] = frame.reset_index()
+        self.counties = {}
+        for parameter, county in self._series:
+            self.counties.setdefault(parameter, []).append(county)
+
+        self._build_histograms(df)
+
+        self._sites = {}
+        if all(c in df.columns for c in SITE_KEYS):
+            sites = site_table(df, value_col, by=['parameter'])
+            for parameter, frame in sites.groupby('parameter', observed=True, sort=False):
+                self._sites[parameter] = frame.drop(columns='parameter').reset_index(drop=True)
+
+    def _build_histograms(self, df):
+        """Per parameter: bin edges and a (county x bin) count matrix."""
+        self.bin_edges = {}
+        self._histograms = {}
+        for parameter, frame in df.groupby('parameter', observed=True, sort=False):
+            values = frame[self.value_col].to_numpy(dtype=float)
+            low, high = values.min(), values.max()
+            if low == high:
+                low, high = low - 0.5, high + 0.5
+            edges = np.linspace(low, high, self.bins + 1)
+            bin_index = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, self.bins - 1)
+            # Rows without a county get a row of their own: counted for 'all', never selected by name
+            county_codes, counties = pd.factorize(frame['county'], sort=True, use_na_sentinel=False)
+            counts = np.bincount(
+                county_codes * self.bins + bin_index, minlength=len(counties) * self.bins
+            ).reshape(len(counties), self.bins)
+            self.bin_edges[parameter] = edges
+            self._histograms[parameter] = (pd.Index(counties), counts)
+
+    def time_series(self, parameter, counties=None):
+        """Per-date means for a parameter, one row per (county, date), like grouped_df."""
+        counties = self.counties.get(parameter, []) if not counties else counties
+        frames = [self._series[(parameter, c)] for c in counties if (parameter, c) in self._series]
+        if not frames:
+            return self.cells.iloc[:0].reset_index()
+        return pd.concat(frames, ignore_index=True)
+
+    def histogram(self, parameter, counties=None):
+        """
+        Histogram bin counts of the raw values for a parameter and county selection.
+        Returns: (counts, edges)
+        """
+        if parameter not in self._histograms:
+            return np.zeros(self.bins, dtype=int), np.linspace(0, 1, self.bins + 1)
+        index, counts = self._histograms[parameter]
+        if counties:
+            positions = index.get_indexer(counties)
+            counts = counts[positions[positions >= 0]]
+        return counts.sum(axis=0), self.bin_edges[parameter]
+
+    def map_sites(self, parameter, counties=None):
+        """Per-site mean, maximum, count and date range of a parameter (see map_aggregates.site_table)."""
+        if parameter not in self._sites:
+            return pd.DataFrame(columns=SITE_COLUMNS)
+        return select_counties(self._sites[parameter], counties)
+
+    def grouped_df(self, limit=None):
+        """Means by (date, county, parameter) with 'first' site attributes (the first `limit` rows if given)."""
+        columns = ['date', 'county', 'parameter', self.value_col] + [
+            c for c in ['local_site_name', 'city', 'state', 'county_code', 'latitude', 'longitude', 'units_of_measure']
+            if c in self.cells.columns
+        ]
+        grouped = self.cells.reset_index()[columns].sort_values(['date', 'county', 'parameter'], ignore_index=True)
+        return grouped if limit is None else grouped.head(limit)
+
+    def quarterly_df(self):
+        """Means by county, quarter-end date, year, quarter and parameter, merged from the cells."""
+        cells = self.cells.reset_index()
+        cells['date'] = cells['date'] + offsets.QuarterEnd(0)
+        keys = ['county', 'date', 'year', 'quarter', 'parameter', 'parameter_code']
+        quarterly = cells.groupby(keys, observed=True).agg(
+            latitude=('latitude', 'first'),
+            longitude=('longitude', 'first'),
+            value_sum=('value_sum', 'sum'),
+            value_count=('value_count', 'sum'),
+            units_of_measure=('units_of_measure', 'first'),
+            local_site_name=('local_site_name', 'first'),
+        ).reset_index()
+        quarterly.insert(keys.index('parameter_code') + 3, self.value_col, quarterly['value_sum'] / quarterly['value_count'])
+        return quarterly.drop(columns=['value_sum', 'value_count'])
@@ -0,0 +1,155 @@
+import time
+import atexit
+import threading
+from collections import deque
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy.pool import QueuePool
+
+from constants import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+
+class LatencyStats:
+    """Count, mean, p50/p95 and max of the most recent `window` samples (in seconds)."""
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._samples.append(seconds)
+
+    def summary(self):
+        """Milliseconds, rounded for reporting."""
+        with self._lock:
+            samples = np.array(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+        if not count:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 2),
+            "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 2),
+            "max_ms": round(maximum * 1000, 2),
+        }
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts take.
+
+    `acquire` is the full time to get a connection from the pool, `connect` the time
+    spent opening new DBAPI connections and `wait` the rest, i.e. time blocked on a
+    busy pool. Checkouts that hit `pool_timeout` are counted in `timeouts`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquire_stats = LatencyStats()
+        self.connect_stats = LatencyStats()
+        self.wait_stats = LatencyStats()
+        self.timeouts = 0
+        self._local = threading.local()
+
+    def _do_get(self):
+        self._local.connect_time = 0.0
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        elapsed = time.perf_counter() - start
+        self.acquire_stats.add(elapsed)
+        self.wait_stats.add(max(elapsed - self._local.connect_time, 0.0))
+        return connection
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.connect_stats.add(elapsed)
+            self._local.connect_time = getattr(self._local, "connect_time", 0.0) + elapsed
+
+    def recreate(self):
+        # Keep stats across dispose()/recreate so reports cover the whole process
+        pool = super().recreate()
+        pool.acquire_stats, pool.connect_stats, pool.wait_stats = self.acquire_stats, self.connect_stats, self.wait_stats
+        pool.timeouts = self.timeouts
+        return pool
+
+_engines = {}
+_connectors = []
+_lock = threading.Lock()
+
+def get_pooled_engine(key, url, make_creator=None, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                      pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING):
+    """
+    Return the process-wide engine for `key`, creating it on first use with a
+    TimedQueuePool of `pool_size` connections plus `max_overflow`. `make_creator`,
+    if given, is called once at creation and returns the engine's DBAPI `creator`.
+    """
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            kwargs = {"creator": make_creator()} if make_creator is not None else {}
+            engine = sqlalchemy.create_engine(
+                url,
+                poolclass=TimedQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+                **kwargs
+            )
+            _engines[key] = engine
+        return engine
+
+def register_connector(connector):
+    """Close `connector` (e.g. a Cloud SQL Connector) when the process exits."""
+    with _lock:
+        _connectors.append(connector)
+    return connector
+
+def pool_stats(engine):
+    """Pool occupancy and checkout latencies of an engine created by get_pooled_engine."""
+    pool = engine.pool
+    stats = {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": max(pool.overflow(), 0), "checked_in": pool.checkedin()}
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            acquire=pool.acquire_stats.summary(),
+            wait=pool.wait_stats.summary(),
+            connect=pool.connect_stats.summary(),
+            timeouts=pool.timeouts
+        )
+    return stats
+
+def all_pool_stats():
+    """pool_stats for every registered engine, keyed by a printable engine URL."""
+    with _lock:
+        engines = list(_engines.values())
+    return {engine.url.render_as_string(hide_password=True): pool_stats(engine) for engine in engines}
+
+def dispose_engines():
+    """Dispose all registered engines and close their connectors."""
+    with _lock:
+        engines, connectors = list(_engines.values()), list(_connectors)
+        _engines.clear()
+        _connectors.clear()
+    for engine in engines:
+        engine.dispose()
+    for connector in connectors:
+        try:
+            connector.close()
+        except Exception as e:
+            print(f"Error closing connector: {e}")
+
+atexit.register(dispose_engines)
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+def make_cache_key(*parts):
+    """Content-addressed key: SHA-256 of the JSON-serialized parts (dict keys sorted)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    JSON-serializable values stored as one file per key, with TTL and LRU eviction.
+
+    Writes go to a temporary file that is renamed into place, so several processes
+    (e.g. gunicorn workers) can share one directory. A file's mtime is its last
+    access time and is used for LRU ordering; once the directory grows past
+    `max_bytes` (or `max_entries`), the least recently used files are removed first.
+    """
+    def __init__(self, directory, max_bytes=None, max_entries=None, default_ttl=None, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return default
+        if entry.get("expires") is not None and entry["expires"] <= self.clock():
+            self.delete(key)
+            self.misses += 1
+            return default
+        try:
+            now = self.clock()
+            os.utime(path, (now, now))  # record access for LRU
+        except OSError:
+            pass
+        self.hits += 1
+        return entry["value"]
+
+    def set(self, key, value, ttl=None):
+        """
+        Store `value` under `key`.
+
+        Args:
+            ttl (float, optional): Seconds until the entry expires. Defaults to
+                `default_ttl`; None on both means the entry only leaves by LRU eviction.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        now = self.clock()
+        entry = {"created": now, "expires": now + ttl if ttl is not None else None, "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(entry, file)
+            os.utime(tmp_path, (now, now))
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+    def evict(self):
+        """Remove least recently used entries until the size and entry caps are met."""
+        if self.max_bytes is None and self.max_entries is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue  # removed by another process
+            entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, name in entries:
+            over_bytes = self.max_bytes is not None and total > self.max_bytes
+            over_entries = self.max_entries is not None and count > self.max_entries
+            if not (over_bytes or over_entries):
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+            count -= 1
@@ -0,0 +1,152 @@
+"""
+Downsampling of long time series for plotting: largest-triangle-three-buckets (LTTB)
+or min/max bucketing to a point budget per trace, over precomputed resolution levels
+so that a zoomed-in window is refined from the level that fits it.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from constants import TIME_SERIES_POINT_BUDGET, TIME_SERIES_DOWNSAMPLE
+
+def lttb(x, y, threshold):
+    """Indices of the `threshold` points largest-triangle-three-buckets keeps (all points if there are fewer)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    x = (x.view(np.int64) if x.dtype.kind == 'M' else x).astype(float)
+    y = np.asarray(y, dtype=float)
+    # Bucket i (of threshold - 2) covers [edges[i], edges[i + 1]); the first and last points are always kept
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        indices[i + 1] = previous
+    return indices
+
+def minmax(x, y, threshold):
+    """Indices of the first and last points and the minimum and maximum of equal-count buckets, at most `threshold` in all, in order."""
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = (threshold - 2) // 2
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((np.asarray(y, dtype=float), bucket))
+    bounds = np.searchsorted(bucket[order], np.arange(buckets))
+    lowest, highest = order[bounds], order[np.append(bounds[1:], n) - 1]
+    return np.unique(np.concatenate([lowest, highest, [0, n - 1]]))
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+class SeriesLevels:
+    """
+    One series at several resolutions: the points themselves, then each level reduced
+    `factor` times further by min/max bucketing (vectorized, and it keeps every peak)
+    down to the size a window is reduced from. A window is cut from the finest level
+    with few enough points in it, so zooming in shows more detail without reducing the
+    full series again; with 'lttb' that slice (up to `factor` x `budget` points) is then
+    reduced to `budget` by LTTB, as in MinMaxLTTB.
+    """
+    def __init__(self, x, y, budget=TIME_SERIES_POINT_BUDGET, method=TIME_SERIES_DOWNSAMPLE, factor=4):
+        if method not in METHODS:
+            raise ValueError(f"Unknown downsampling method '{method}'; use one of {sorted(METHODS)}.")
+        self.budget = budget
+        self.reduce = METHODS[method]
+        self.limit = budget * factor if method == "lttb" else budget
+        x, y = np.asarray(x), np.asarray(y)
+        self.levels = [(x, y)]
+        while len(x) > self.limit:
+            keep = minmax(x, y, max(self.limit, len(x) // factor))
+            x, y = x[keep], y[keep]
+            self.levels.append((x, y))
+
+    def window(self, start=None, end=None):
+        """(x, y) of at most `budget` points in [start, end], plus one point on either side so lines reach the edges."""
+        for x, y in self.levels:
+            low = 0 if start is None else max(np.searchsorted(x, start, side='left') - 1, 0)
+            high = len(x) if end is None else min(np.searchsorted(x, end, side='right') + 1, len(x))
+            if high - low <= self.limit:
+                break
+        x, y = x[low:high], y[low:high]
+        if len(x) > self.budget:
+            keep = self.reduce(x, y, self.budget)
+            x, y = x[keep], y[keep]
+        return x, y
+
+class SeriesDownsampler:
+    """
+    Per (parameter, county) SeriesLevels of the time series a source (AggregateCube or
+    AirQualityQueries) returns, built on first use and kept for the `max_series` most
+    recently used series. Levels are kept per data version; a new version drops them.
+    """
+    def __init__(self, budget=TIME_SERIES_POINT_BUDGET, method=TIME_SERIES_DOWNSAMPLE, value_col="arithmetic_mean", max_series=1024):
+        self.budget = budget
+        self.method = method
+        self.value_col = value_col
+        self.max_series = max_series
+        self._levels = OrderedDict()
+        self._counties = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            levels = self._levels.get(key)
+            if levels is not None:
+                self._levels.move_to_end(key)
+            return levels
+
+    def _put(self, key, levels):
+        with self._lock:
+            self._levels[key] = levels
+            while len(self._levels) > self.max_series:
+                self._levels.popitem(last=False)
+
+    def _check_version(self, version):
+        with self._lock:
+            if version != self._version:
+                self._levels.clear()
+                self._counties.clear()
+                self._version = version
+
+    def time_series(self, source, parameter, counties=None, start=None, end=None, version=None):
+        """
+        Like source.time_series(parameter, counties), one row per (county, date), but
+        each county's line has at most `budget` points between `start` and `end`.
+        `version` is the source's data version; levels built for another are not used.
+        """
+        self._check_version(version)
+        counties = None if not counties or counties[0] == 'all' else list(counties)
+        names = counties or self._counties.get((version, parameter))
+        levels = {county: self._get((version, parameter, county)) for county in names or []}
+        if names is None or any(level is None for level in levels.values()):
+            frame = source.time_series(parameter, counties)
+            built = {}
+            for county, rows in frame.groupby('county', observed=True, sort=True):
+                built[county] = SeriesLevels(rows['date'].to_numpy(), rows[self.value_col].to_numpy(), self.budget, self.method)
+                self._put((version, parameter, county), built[county])
+            if counties is None:
+                self._counties[(version, parameter)] = list(built)
+            levels = {county: built.get(county) for county in counties or built}
+
+        start = None if start is None else np.datetime64(pd.Timestamp(start))
+        end = None if end is None else np.datetime64(pd.Timestamp(end))
+        frames = []
+        for county, series in levels.items():
+            if series is None:
+                continue
+            dates, values = series.window(start, end)
+            frames.append(pd.DataFrame({'date': dates, 'county': county, self.value_col: values}))
+        if not frames:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'county': pd.Series(dtype=object), self.value_col: pd.Series(dtype=float)})
+        return pd.concat(frames, ignore_index=True)
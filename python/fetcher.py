@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+
+from constants import AQS_MAX_PARAMS_PER_REQUEST, AQS_REQUESTS_PER_MINUTE, AQS_MIN_REQUEST_INTERVAL
+from main import build_air_quality_request, pollutants, get_response_cache, get_response_cache_key, store_cached_response
+from utils import save_json_to_file, mask_api_key_and_email
+
+# Services that are exempt from the single-year request limit
+MULTI_YEAR_SERVICES = ("monitors",)
+
+class RateLimiter:
+    """
+    Token-bucket scheduler for the AQS request limits.
+
+    Tokens refill at `rate` per `per` seconds up to `capacity`. In addition, a
+    request may only start `min_interval` seconds after the previous one completed.
+    The default capacity of 1 means no bursts, so no 60 second window can ever
+    contain more than `rate` requests.
+
+    Usage:
+        with limiter:
+            response = session.get(...)
+    """
+    def __init__(
+        self,
+        rate=AQS_REQUESTS_PER_MINUTE,
+        per=60.0,
+        min_interval=AQS_MIN_REQUEST_INTERVAL,
+        capacity=1,
+        clock=time.monotonic,
+        sleep=time.sleep
+    ):
+        self.fill_rate = rate / per
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._last_done = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.fill_rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may start, then consume a token."""
+        with self._lock:
+            while True:
+                now = self.clock()
+                self._refill(now)
+                wait = 0.0
+                if self._tokens < 1:
+                    wait = (1 - self._tokens) / self.fill_rate
+                if self._last_done is not None:
+                    wait = max(wait, self._last_done + self.min_interval - now)
+                if wait <= 0:
+                    self._tokens -= 1
+                    return
+                self.sleep(wait)
+
+    def release(self):
+        """Mark the current request as complete; starts the spacing timer."""
+        with self._lock:
+            self._last_done = self.clock()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+def chunk_params(params, size=AQS_MAX_PARAMS_PER_REQUEST):
+    """Split parameter codes into lists of at most `size` codes."""
+    if isinstance(params, (str, int)):
+        params = str(params).split(",")
+    params = [str(p).strip().zfill(5) for p in params if str(p).strip()]
+    return [params[i:i + size] for i in range(0, len(params), size)]
+
+def split_date_range_by_year(bdate, edate):
+    """
+    Split a YYYYMMDD date range into (bdate, edate) pairs that each fall within one year.
+    """
+    bdate, edate = str(bdate), str(edate)
+    if bdate > edate:
+        raise ValueError("bdate must not be after edate.")
+    start_year, end_year = int(bdate[:4]), int(edate[:4])
+    ranges = []
+    for year in range(start_year, end_year + 1):
+        year_bdate = bdate if year == start_year else f"{year}0101"
+        year_edate = edate if year == end_year else f"{year}1231"
+        ranges.append((year_bdate, year_edate))
+    return ranges
+
+def plan_requests(service, by, states, params, bdate, edate, counties=None, **kwargs):
+    """
+    Split a batch job into API-legal requests (one year and at most 5 parameters each).
+
+    Args:
+        service (str): AQS service, e.g. 'quarterlyData'.
+        by (str): Aggregation, e.g. 'byState'.
+        states (list): State FIPS codes.
+        params (list): Parameter codes.
+        bdate (str): Begin date (YYYYMMDD).
+        edate (str): End date (YYYYMMDD).
+        counties (dict, optional): State FIPS code -> list of county FIPS codes.
+            Required for byCounty and bySite.
+    Returns:
+        list: Argument dicts for get_air_quality_data, in request order.
+    """
+    if service in MULTI_YEAR_SERVICES:
+        date_ranges = [(str(bdate), str(edate))]
+    else:
+        date_ranges = split_date_range_by_year(bdate, edate)
+
+    plan = []
+    for state in states:
+        state = str(state).zfill(2)
+        if by in ("byCounty", "bySite"):
+            state_counties = (counties or {}).get(state) or (counties or {}).get(int(state))
+            if not state_counties:
+                raise ValueError(f"counties must be provided for state {state} with {by}.")
+        else:
+            state_counties = [None]
+        for county in state_counties:
+            for year_bdate, year_edate in date_ranges:
+                for param_chunk in chunk_params(params):
+                    aq_args = dict(
+                        service=service, by=by, state=state, param=",".join(param_chunk),
+                        bdate=year_bdate, edate=year_edate, **kwargs
+                    )
+                    if county is not None:
+                        aq_args["county"] = str(county).zfill(3)
+                    plan.append(aq_args)
+    return plan
+
+def get_batch_filename(aq_args):
+    """Output filename for a planned request, extending main.py's naming scheme with the geography."""
+    geography = aq_args["state"] + (f"_{aq_args['county']}" if aq_args.get("county") else "")
+    return f"{aq_args['service']}_{aq_args['by']}_{geography}_{aq_args['param']}_{aq_args['bdate']}_to_{aq_args['edate']}.json"
+
+def _parse_response(response, aq_args, output_dir, cache=None, cache_key=None, params=None):
+    """Decode, mask, cache and optionally save a response. Runs on the parser pool."""
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        print("HTTP error:", e)
+        print("Response:", response.text)
+        return None
+    data = mask_api_key_and_email(response.json())
+    if cache is not None:
+        store_cached_response(cache, cache_key, params, data)
+    return _save_response(data, aq_args, output_dir)
+
+def _save_response(data, aq_args, output_dir):
+    if output_dir:
+        save_json_to_file(data, filename=os.path.join(output_dir, get_batch_filename(aq_args)))
+    return data
+
+def fetch_batch(
+    plan,
+    email=None,
+    api_key=None,
+    session=None,
+    limiter=None,
+    output_dir=None,
+    cache=None,
+    parse_workers=2
+):
+    """
+    Run planned requests through one pooled session under the AQS rate limits.
+
+    Requests are sent one at a time, as the API terms require. Decoding, masking and
+    saving each response happens on a small thread pool while the next request waits
+    for the rate limiter. Requests found in `cache` skip the network and the limiter.
+
+    Args:
+        plan (list): Argument dicts from plan_requests().
+        session (requests.Session, optional): Session to reuse. Defaults to a new one.
+        limiter (RateLimiter, optional): Scheduler. Defaults to the documented AQS limits.
+        output_dir (str, optional): Directory to save each masked response in.
+        cache (DiskCache, optional): Response cache, e.g. main.get_response_cache().
+        parse_workers (int): Number of response parser threads.
+    Returns:
+        list: (aq_args, data) tuples in plan order; data is None for failed requests.
+    """
+    owns_session = session is None
+    session = session or requests.Session()
+    limiter = limiter or RateLimiter()
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=parse_workers) as pool:
+            for i, aq_args in enumerate(plan, start=1):
+                endpoint, params = build_air_quality_request(email=email, api_key=api_key, **aq_args)
+                print(f"[{i}/{len(plan)}] {aq_args['service']}/{aq_args['by']} state={aq_args['state']} "
+                      f"param={aq_args['param']} {aq_args['bdate']}-{aq_args['edate']}")
+                cache_key = get_response_cache_key(endpoint, params) if cache is not None else None
+                cached = cache.get(cache_key) if cache is not None else None
+                if cached is not None:
+                    futures.append((aq_args, pool.submit(_save_response, cached, aq_args, output_dir)))
+                    continue
+                with limiter:
+                    try:
+                        response = session.get(endpoint, params=params)
+                    except requests.RequestException as e:
+                        print("Request error:", e)
+                        response = None
+                if response is None:
+                    futures.append((aq_args, None))
+                else:
+                    futures.append((aq_args, pool.submit(
+                        _parse_response, response, aq_args, output_dir, cache, cache_key, params
+                    )))
+            return [(aq_args, future.result() if future else None) for aq_args, future in futures]
+    finally:
+        if owns_session:
+            session.close()
+
+def main():
+    this_year = date.today().year
+    plan = plan_requests(
+        service="quarterlyData",
+        by="byState",
+        states=input("Enter state FIPS codes (comma-separated, e.g., 06,32): ").split(","),
+        params=[code for _, code in pollutants],
+        bdate=input(f"Enter begin date (YYYYMMDD, default {this_year}0101): ") or f"{this_year}0101",
+        edate=input(f"Enter end date (YYYYMMDD, default {this_year}1231): ") or f"{this_year}1231",
+    )
+    print(f"Planned {len(plan)} requests.")
+    results = fetch_batch(plan, output_dir="data/raw", cache=get_response_cache())
+    failed = sum(1 for _, data in results if data is None)
+    print(f"Completed {len(results) - failed} of {len(results)} requests.")
+
+if __name__ == "__main__":
+    main()
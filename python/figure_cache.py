@@ -0,0 +1,65 @@
+import json
+import functools
+
+import pandas as pd
+
+from constants import FIGURE_CACHE_DIR, FIGURE_CACHE_MAX_BYTES
+from disk_cache import DiskCache, make_cache_key
+from metrics import METRICS, SIZE_BUCKETS, callback_context, phase
+from utils import normalize_counties
+
+def get_data_version(df):
+    """Fingerprint of a loaded frame; changes whenever the underlying table is refreshed."""
+    return f"{len(df)}-{int(pd.util.hash_pandas_object(df, index=False).sum()) & 0xFFFFFFFFFFFF:x}"
+
+class FigureCache:
+    """
+    Serialized figure JSON for Dash callbacks, keyed on (callback, pollutant, sorted
+    counties, data version).
+
+    Entries live in a DiskCache directory, so all gunicorn workers behind
+    `app.server` share them, with LRU eviction past `max_bytes`. Entries built from
+    an older data version are never hit again and age out; `invalidate()` drops
+    them right away. `data_version` may be a callable, resolved on each lookup, so the
+    cache can be set up before the data is loaded.
+    """
+    def __init__(self, data_version, directory=FIGURE_CACHE_DIR, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.data_version = data_version
+        self.store = DiskCache(directory, max_bytes=max_bytes)
+
+    def key(self, callback, pollutant, counties, *extra):
+        data_version = self.data_version() if callable(self.data_version) else self.data_version
+        return make_cache_key(callback, pollutant, normalize_counties(counties), data_version, *extra)
+
+    def get_or_build(self, callback, pollutant, counties, build, extra=()):
+        """Return the cached figure dict, or call `build()` and cache its result. `extra` values are part of the key."""
+        key = self.key(callback, pollutant, counties, *extra)
+        figure = self.store.get(key)
+        METRICS.inc("dashboard_figure_cache_total", callback=callback, result="miss" if figure is None else "hit")
+        if figure is None:
+            fig = build()
+            with phase("serialize", callback):
+                text = fig.to_json()
+                figure = json.loads(text)
+            METRICS.observe("dashboard_figure_bytes", len(text), buckets=SIZE_BUCKETS, callback=callback)
+            self.store.set(key, figure)
+        return figure
+
+    def memoize(self, callback):
+        """
+        Decorator for callbacks taking (pollutant, counties, *extra) and returning a
+        figure; extra arguments must be JSON-serializable and are part of the key. Phases timed inside count towards `callback`.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(pollutant, counties, *extra):
+                with callback_context(callback):
+                    return self.get_or_build(callback, pollutant, counties, lambda: func(pollutant, counties, *extra), extra)
+            return wrapper
+        return decorator
+
+    def invalidate(self, data_version=None):
+        """Drop all cached figures, e.g. after the table is refreshed."""
+        self.store.clear()
+        if data_version is not None:
+            self.data_version = data_version
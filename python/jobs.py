@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from constants import JOB_QUEUE_PATH, JOB_CONCURRENCY, JOB_STALE_AFTER, JOB_RETENTION
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by every process that opens the same file.
+
+    Jobs are identified by a caller-chosen key (e.g. the LLM cache key), so
+    submitting a job that is already queued or running returns the existing one
+    instead of starting a duplicate. Running jobs whose process stopped reporting
+    progress for `stale_after` seconds are handed out again.
+    """
+    def __init__(self, path=JOB_QUEUE_PATH, stale_after=JOB_STALE_AFTER, retention=JOB_RETENTION, clock=time.time):
+        self.path = path
+        self.stale_after = stale_after
+        self.retention = retention
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, payload TEXT NOT NULL, "
+                "error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, job_id, payload):
+        """Queue `payload` under `job_id` unless that job is already queued or running."""
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, stage, payload, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, "Queued", json.dumps(payload), now, now)
+                )
+            elif row[0] not in (QUEUED, RUNNING):
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, payload = ?, error = NULL, created = ?, updated = ? WHERE id = ?",
+                    (QUEUED, "Queued", json.dumps(payload), now, now, job_id)
+                )
+            conn.execute("COMMIT")
+        return job_id
+
+    def claim(self):
+        """Mark the oldest queued (or stale running) job as running and return (job_id, payload), or None."""
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = ? OR (status = ? AND updated < ?) ORDER BY created LIMIT 1",
+                (QUEUED, RUNNING, now - self.stale_after)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = ?, stage = ?, updated = ? WHERE id = ?", (RUNNING, "Starting", now, row[0]))
+            conn.execute("COMMIT")
+        return (row[0], json.loads(row[1])) if row else None
+
+    def report(self, job_id, stage):
+        """Record the current stage of a running job."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ?, updated = ? WHERE id = ?", (stage, self.clock(), job_id))
+
+    def finish(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, stage = ?, updated = ? WHERE id = ?", (DONE, "Done", self.clock(), job_id))
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, updated = ? WHERE id = ?",
+                (FAILED, "Failed", str(error), self.clock(), job_id)
+            )
+
+    def get(self, job_id):
+        """Return {'status', 'stage', 'error'} for a job, or None if it is unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, stage, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return {"status": row[0], "stage": row[1], "error": row[2]} if row else None
+
+    def purge(self):
+        """Delete finished and failed jobs older than `retention` seconds."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?",
+                (DONE, FAILED, self.clock() - self.retention)
+            )
+
+class JobRunner:
+    """
+    Background thread with its own asyncio event loop that claims jobs from a
+    JobQueue and runs up to `concurrency` of them at once.
+
+    `handler(payload, report)` is a coroutine function; `report(stage)` records
+    progress that pollers can show. A handler that raises fails its job.
+    """
+    def __init__(self, queue, handler, concurrency=JOB_CONCURRENCY, poll_interval=0.2):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="job-runner", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def _run_job(self, job_id, payload):
+        try:
+            await self.handler(payload, lambda stage: self.queue.report(job_id, stage))
+            self.queue.finish(job_id)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.queue.fail(job_id, e)
+
+    async def _run(self):
+        active = set()
+        last_purge = 0
+        while not self._stop.is_set():
+            claimed = None
+            if len(active) < self.concurrency:
+                try:
+                    claimed = self.queue.claim()
+                except sqlite3.Error as e:
+                    print(f"Error claiming job: {e}")
+                if claimed is not None:
+                    task = asyncio.create_task(self._run_job(*claimed))
+                    active.add(task)
+                    task.add_done_callback(active.discard)
+            if time.time() - last_purge > 60:
+                self.queue.purge()
+                last_purge = time.time()
+            await asyncio.sleep(0 if claimed else self.poll_interval)
+        if active:
+            await asyncio.gather(*active, return_exceptions=True)
@@ -0,0 +1,31 @@
+import re
+
+from constants import LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL
+from disk_cache import DiskCache, make_cache_key
+
+def normalize_prompt(text):
+    """Collapse whitespace and case so trivially different prompts share an entry."""
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+class LLMResponseCache:
+    """
+    Cache of LLM graph results (extracted code and rendered figure JSON), keyed on the
+    normalized, sanitized prompt, the language and the data context version.
+
+    Entries expire after `ttl` seconds and are evicted LRU past `max_bytes`. Identical
+    requests in flight share one job (the job id is the cache key), so only finished
+    results are stored here.
+    """
+    def __init__(self, context_version, directory=LLM_CACHE_DIR, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL):
+        self.context_version = context_version
+        self.store = DiskCache(directory, max_bytes=max_bytes, default_ttl=ttl)
+
+    def key(self, prompt, language):
+        return make_cache_key(normalize_prompt(prompt), language, self.context_version)
+
+    def get(self, prompt, language):
+        """Return the cached result for (prompt, language), or None."""
+        return self.store.get(self.key(prompt, language))
+
+    def set(self, prompt, language, result):
+        self.store.set(self.key(prompt, language), result)
@@ -1,8 +1,10 @@
 import requests
 import os
 from dotenv import load_dotenv
-from datetime import datetime as dt
+from datetime import datetime as dt, date
 from utils import save_json_to_file, load_json_to_dataframe, mask_api_key_and_email, select_one_option, select_multiple_options
+from disk_cache import DiskCache, make_cache_key
+from constants import AQS_CACHE_DIR, AQS_CACHE_MAX_BYTES, AQS_CACHE_TTL
 
 # Load environment variables from .env file
 load_dotenv()
@@ -47,7 +49,7 @@ pollutants = [
     ("PM2.5 - Local Conditions", 88101)
 ]
 
-def get_air_quality_data(
+def build_air_quality_request(
     service="annualData",
     by="byCounty",
     email=None,
@@ -60,7 +62,8 @@ def get_air_quality_data(
     **kwargs
 ):
     """
-    Generic function to call the EPA AQS API using the OpenAPI spec.
+    Validate and normalize the arguments for an EPA AQS API call.
+    Returns: (endpoint, params)
     """
     # Load credentials from environment if not provided
     email = email or os.getenv("API_EMAIL")
@@ -108,15 +111,83 @@ def get_air_quality_data(
         params["county"] = county  # Include county only if required
     params.update(kwargs)  # Add any extra params
 
-    response = requests.get(endpoint, params=params)
+    return endpoint, params
+
+def get_air_quality_data(
+    service="annualData",
+    by="byCounty",
+    email=None,
+    api_key=None,
+    param=None,
+    state=None,
+    county=None,
+    bdate=None,
+    edate=None,
+    session=None,
+    cache=None,
+    **kwargs
+):
+    """
+    Generic function to call the EPA AQS API using the OpenAPI spec.
+    Pass a requests.Session as `session` to reuse pooled connections across calls,
+    and a DiskCache as `cache` to reuse earlier responses (stored with email/key masked).
+    """
+    endpoint, params = build_air_quality_request(
+        service=service, by=by, email=email, api_key=api_key, param=param,
+        state=state, county=county, bdate=bdate, edate=edate, **kwargs
+    )
+
+    if cache is not None:
+        cache_key = get_response_cache_key(endpoint, params)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    http = session or requests
+    response = http.get(endpoint, params=params)
     try:
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if cache is not None:
+            store_cached_response(cache, cache_key, params, data)
+        return data
     except requests.HTTPError as e:
         print("HTTP error:", e)
         print("Response:", response.text)
         return None
 
+def get_response_cache():
+    """Default on-disk AQS response cache, configured in constants.py."""
+    return DiskCache(AQS_CACHE_DIR, max_bytes=AQS_CACHE_MAX_BYTES)
+
+def get_response_cache_key(endpoint, params):
+    """Cache key for normalized request params, excluding the email and key credentials."""
+    key_params = {k: v for k, v in params.items() if k not in ("email", "key")}
+    return make_cache_key(endpoint, key_params)
+
+def is_year_certified(year, today=None):
+    """
+    Whether a year's data is past the AQS certification deadline (May 1 of the
+    following year), after which date_of_last_change is no longer expected to move.
+    """
+    today = today or date.today()
+    return today >= date(int(year) + 1, 5, 1)
+
+def get_response_cache_ttl(params, today=None):
+    """None (keep until evicted) for certified years, AQS_CACHE_TTL for years that may still change."""
+    if is_year_certified(str(params["edate"])[:4], today=today):
+        return None
+    return AQS_CACHE_TTL
+
+def store_cached_response(cache, cache_key, params, data):
+    """Mask credentials and store a successful response, using the year-based TTL policy."""
+    header = data.get("Header") if isinstance(data, dict) else None
+    if isinstance(header, list):
+        header = header[0] if header else None
+    if header and str(header.get("status", "")).lower().startswith("failed"):
+        return
+    cache.set(cache_key, mask_api_key_and_email(data), ttl=get_response_cache_ttl(params))
+
 def format_date_to_yyyymmdd(date_str):
     """Convert a date string to the format 'YYYYMMDD'.
     Accepts formats like 'YYYY-MM-DD', 'MM-DD-YYYY', 'YYYY/MM/DD', or 'MM/DD/YYYY'.
@@ -158,7 +229,7 @@ def main():
     print("Fetching data with parameters:")
     for k, v in aq_args.items():
         print(f"  {k}: {v}")
-    air_quality_data = get_air_quality_data(**aq_args)
+    air_quality_data = get_air_quality_data(cache=get_response_cache(), **aq_args)
 
     filename = f"{service}_{aggregation}_{param}_{bdate}_to_{edate}.json"
 
@@ -0,0 +1,87 @@
+"""
+Pre-aggregated map layers: one marker per monitoring site instead of one per
+site x quarter, and per screen-space grid cell when there are still too many sites.
+"""
+import numpy as np
+import pandas as pd
+
+SITE_KEYS = ['county', 'local_site_name', 'latitude', 'longitude']
+SITE_COLUMNS = SITE_KEYS + ['arithmetic_mean', 'maximum', 'observations', 'first_date', 'last_date']
+
+TILE_SIZE = 256 # web mercator tile size in pixels
+
+def site_table(df, value_col="arithmetic_mean", by=()):
+    """
+    Per-site mean, maximum and count of `value_col` and first/last date, one row per
+    (*by, county, site name, latitude, longitude).
+    """
+    keys = list(by) + SITE_KEYS
+    return df.groupby(keys, observed=True, sort=True, dropna=False).agg(
+        arithmetic_mean=(value_col, 'mean'),
+        maximum=(value_col, 'max'),
+        observations=(value_col, 'count'),
+        first_date=('date', 'min'),
+        last_date=('date', 'max'),
+    ).reset_index()
+
+def select_counties(sites, counties=None):
+    """Rows of a site table in `counties` ('all' or empty means every county)."""
+    if counties and counties[0] != 'all':
+        sites = sites[sites['county'].isin(counties)]
+    return sites.reset_index(drop=True)
+
+def mercator_pixels(latitude, longitude, zoom):
+    """Web mercator pixel coordinates of points at `zoom`."""
+    scale = TILE_SIZE * 2.0 ** zoom
+    latitude = np.radians(np.clip(np.asarray(latitude, dtype=float), -85.05112878, 85.05112878))
+    x = (np.asarray(longitude, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(latitude) + 1.0 / np.cos(latitude)) / np.pi) / 2.0 * scale
+    return x, y
+
+def fit_view(latitude, longitude, width=700, height=450, max_zoom=12):
+    """Center and zoom that fit the points into a `width` x `height` pixel map."""
+    latitude, longitude = np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float)
+    center = {"lat": float(np.nanmean(latitude)), "lon": float(np.nanmean(longitude))}
+    x, y = mercator_pixels(latitude, longitude, 0)
+    span_x, span_y = np.nanmax(x) - np.nanmin(x), np.nanmax(y) - np.nanmin(y)
+    zooms = [max_zoom]
+    if span_x > 0:
+        zooms.append(np.log2(width / span_x))
+    if span_y > 0:
+        zooms.append(np.log2(height / span_y))
+    return center, float(max(0, np.floor(min(zooms))))
+
+def grid_aggregate(sites, zoom, cell_px=24):
+    """
+    Merge the sites of a site table that fall in the same `cell_px`-pixel grid cell at
+    `zoom` into one marker: observation-weighted mean, overall maximum, summed
+    observations, the cell's mean position, and the site name if the cell has one site
+    (otherwise 'N sites'). Has a 'sites' count column.
+    """
+    if sites.empty:
+        return sites.assign(sites=pd.Series(dtype=int))
+    x, y = mercator_pixels(sites['latitude'], sites['longitude'], zoom)
+    cells = sites.assign(
+        cell_x=np.floor(x / cell_px).astype(np.int64),
+        cell_y=np.floor(y / cell_px).astype(np.int64),
+        weighted_sum=sites['arithmetic_mean'] * sites['observations'],
+        local_site_name=sites['local_site_name'].astype(object),
+        county=sites['county'].astype(object),
+    )
+    grid = cells.groupby(['cell_x', 'cell_y'], sort=True).agg(
+        latitude=('latitude', 'mean'),
+        longitude=('longitude', 'mean'),
+        weighted_sum=('weighted_sum', 'sum'),
+        maximum=('maximum', 'max'),
+        observations=('observations', 'sum'),
+        first_date=('first_date', 'min'),
+        last_date=('last_date', 'max'),
+        sites=('local_site_name', 'size'),
+        local_site_name=('local_site_name', 'first'),
+        county=('county', 'first'),
+    ).reset_index(drop=True)
+    grid['arithmetic_mean'] = grid['weighted_sum'] / grid['observations']
+    several = grid['sites'] > 1
+    grid.loc[several, 'local_site_name'] = grid.loc[several, 'sites'].astype(str) + " sites"
+    grid.loc[several, 'county'] = None
+    return grid[SITE_COLUMNS + ['sites']]
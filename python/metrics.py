@@ -0,0 +1,258 @@
+"""
+Request instrumentation for the dashboard server: request and callback-phase timings,
+response sizes and cache hit counts, served in the Prometheus text format on /metrics.
+An optional sampling profiler (PROFILER_ENABLED) serves collapsed stacks on
+/debug/profile.
+
+Metrics are kept per process; with several gunicorn workers each scrape sees the
+worker that answered it.
+"""
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024**2, 10 * 1024**2, 100 * 1024**2)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_string(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """
+    A registry of counters and histograms keyed on (name, labels), plus collectors:
+    callables returning (name, labels, value) gauges read at scrape time, for counts
+    kept elsewhere (cache hits, pool occupancy).
+    """
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        def header(name, kind):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                header(name, "counter")
+                seen.add(name)
+            lines.append(f"{name}{_label_string(labels)} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            if name not in seen:
+                header(name, "histogram")
+                seen.add(name)
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_label_string(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_label_string(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_label_string(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_label_string(labels)} {count}")
+        for collect in self.collectors:
+            try:
+                gauges = list(collect())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, labels, value in gauges:
+                if name not in seen:
+                    header(name, "gauge")
+                    seen.add(name)
+                lines.append(f"{name}{_label_string(_labels(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS.describe("dashboard_request_seconds", "Time to answer an HTTP request, by endpoint (Dash callbacks by their output).")
+METRICS.describe("dashboard_response_bytes", "Size of HTTP response bodies, by endpoint.")
+METRICS.describe("dashboard_phase_seconds", "Time spent in a phase (filter, figure, serialize, validate, llm, exec) of a callback or job.")
+METRICS.describe("dashboard_figure_cache_total", "Figure cache lookups by callback and result (hit or miss).")
+METRICS.describe("dashboard_figure_bytes", "Size of the figure JSON built by a callback.")
+
+_context = threading.local()
+
+def current_callback():
+    """The name set by the innermost callback_context of this thread, or 'none'."""
+    return getattr(_context, "callback", None) or "none"
+
+@contextmanager
+def callback_context(name):
+    """Attribute the phases timed in the block to callback `name`."""
+    previous = getattr(_context, "callback", None)
+    _context.callback = name
+    try:
+        yield
+    finally:
+        _context.callback = previous
+
+@contextmanager
+def phase(name, callback=None, metrics=METRICS):
+    """Time the block as phase `name` of `callback` (default: current_callback())."""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("dashboard_phase_seconds", time.perf_counter() - began, callback=callback or current_callback(), phase=name)
+
+def _endpoint(outputs):
+    """
+    The Dash callback output for callback requests if it is one of `outputs()` (the
+    app's registered outputs; the body is client-supplied, so anything else would let
+    clients add label values without bound), otherwise the route.
+    """
+    if request.path.endswith("/_dash-update-component"):
+        body = request.get_json(silent=True) or {}
+        output = body.get("output")
+        return output if isinstance(output, str) and outputs is not None and output in outputs() else "callback"
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def instrument_server(server, metrics=METRICS, outputs=None):
+    """
+    Time every request on the Flask `server`, record response sizes and serve /metrics.
+    `outputs` returns the callback outputs that may be used as endpoint labels
+    (e.g. lambda: app.callback_map); other callback requests are labeled 'callback'.
+    """
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_endpoint = _endpoint(outputs)
+
+    @server.after_request
+    def record_request(response):
+        if "metrics_start" in g:
+            endpoint = g.metrics_endpoint
+            metrics.observe("dashboard_request_seconds", time.perf_counter() - g.metrics_start, endpoint=endpoint, status=response.status_code)
+            size = response.calculate_content_length()
+            if size is not None:
+                metrics.observe("dashboard_response_bytes", size, buckets=SIZE_BUCKETS, endpoint=endpoint)
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return server
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all other threads every `interval` seconds and counts them
+    in collapsed-stack form ('module:function;module:function ...'), the input format
+    of flamegraph tools. Cheap enough to leave on while reproducing a slow interaction.
+    """
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_id)
+
+    def sample(self, exclude=None):
+        """Record the current stack of every thread except `exclude`."""
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            stacks.append(";".join(reversed(names)))
+        with self._lock:
+            self.stacks.update(stacks)
+            self.samples += 1
+
+    def collapsed(self, limit=None):
+        """The sampled stacks, most frequent first, one 'stack count' line each."""
+        with self._lock:
+            stacks = self.stacks.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+def enable_profiler(server, interval):
+    """Start a SamplingProfiler and serve its stacks on /debug/profile (?reset=1 clears them)."""
+    profiler = SamplingProfiler(interval).start()
+
+    @server.route("/debug/profile")
+    def profile_endpoint():
+        text = profiler.collapsed(limit=request.args.get("limit", type=int))
+        if request.args.get("reset"):
+            profiler.reset()
+        return Response(text, mimetype="text/plain")
+
+    return profiler
@@ -0,0 +1,234 @@
+import time
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import func, select
+
+from bulk_load import create_indexes
+from constants import BULK_LOAD_INDEXES, DATA_VERSION_TTL
+from map_aggregates import SITE_KEYS, select_counties
+
+# Site attributes reported with each aggregate. SQL has no portable 'first', so these
+# are MIN() per group, whereas the pandas groupbys take the first row's value.
+SITE_COLUMNS = ['local_site_name', 'city', 'state', 'county_code', 'latitude', 'longitude', 'units_of_measure']
+
+class AirQualityQueries:
+    """
+    Dashboard aggregates computed by the database instead of pandas.
+
+    Has the same lookups as cube.AggregateCube (time_series, histogram, map_sites,
+    grouped_df, quarterly_df), but each one is a parameterized SELECT ... GROUP BY that returns
+    only the rows a callback needs, so app memory and startup time don't grow with
+    the table. Selections can be narrowed to a date range with `start`/`end`
+    ('YYYY-MM-DD'). Rows without an arithmetic_mean are ignored, as in the pandas path.
+    """
+    def __init__(self, engine, table_name, value_col="arithmetic_mean", bins=50, version_ttl=DATA_VERSION_TTL, clock=time.monotonic):
+        self.engine = engine
+        self.value_col = value_col
+        self.bins = bins
+        self.version_ttl = version_ttl
+        self.clock = clock
+        self._version = None # (version, when it was read)
+        self.table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), autoload_with=engine)
+        self._caches = (None, {}) # (data version, {cache name: {parameter: value}})
+
+    def ensure_indexes(self, indexes=BULK_LOAD_INDEXES):
+        """Create the covering (parameter, county, date, value) index if the table lacks it."""
+        with self.engine.begin() as conn:
+            return create_indexes(conn, self.table.name, indexes)
+
+    def _where(self, query, parameter=None, counties=None, start=None, end=None):
+        c = self.table.c
+        query = query.where(c[self.value_col].is_not(None))
+        if parameter:
+            query = query.where(c.parameter == parameter)
+        if counties and counties[0] != 'all':
+            query = query.where(c.county.in_(list(counties)))
+        if start:
+            query = query.where(c.date >= str(start))
+        if end:
+            query = query.where(c.date <= str(end))
+        return query
+
+    def _read(self, query):
+        with self.engine.connect() as conn:
+            df = pd.read_sql(query, conn)
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def data_version(self):
+        """
+        Cheap fingerprint of the table contents, for cache keys. It is read again once
+        it is `version_ttl` seconds old, so a refresh of the table (e.g. by sync.py)
+        shows up within that time.
+        """
+        now = self.clock()
+        if self._version is not None and now - self._version[1] < self.version_ttl:
+            return self._version[0]
+        c = self.table.c
+        query = select(func.count(), func.sum(c[self.value_col]), func.max(c.date))
+        with self.engine.connect() as conn:
+            count, total, latest = conn.execute(query).one()
+        version = f"{count}-{total}-{latest}"
+        self._version = (version, now)
+        return version
+
+    def _cache(self, name):
+        """The per-parameter cache `name`, emptied along with the others when data_version() changes."""
+        version = self.data_version()
+        cached_version, caches = self._caches
+        if cached_version != version:
+            caches = {}
+            self._caches = (version, caches)
+        return caches.setdefault(name, {})
+
+    def time_series(self, parameter, counties=None, start=None, end=None):
+        """Per-date means for a parameter, one row per (county, date)."""
+        c = self.table.c
+        query = self._where(
+            select(c.date, c.county, func.avg(c[self.value_col]).label(self.value_col)),
+            parameter, counties, start, end
+        ).group_by(c.county, c.date).order_by(c.county, c.date)
+        return self._read(query)
+
+    def bin_edges(self, parameter):
+        """Fixed per-parameter bin edges over the full value range, as in AggregateCube."""
+        bin_edges = self._cache("bin_edges")
+        if parameter not in bin_edges:
+            c = self.table.c
+            query = self._where(select(func.min(c[self.value_col]), func.max(c[self.value_col])), parameter)
+            with self.engine.connect() as conn:
+                low, high = conn.execute(query).one()
+            if low is None:
+                return None
+            if low == high:
+                low, high = low - 0.5, high + 0.5
+            bin_edges[parameter] = np.linspace(low, high, self.bins + 1)
+        return bin_edges[parameter]
+
+    def _bin_index(self, edges):
+        """SQL expression for the bin number of each value over `edges` (the last bin includes its right edge)."""
+        c = self.table.c
+        low, width = float(edges[0]), float(edges[1] - edges[0])
+        position = (c[self.value_col] - low) / width
+        # SQLite may lack FLOOR; CAST truncates, which is the same for non-negative positions
+        if self.engine.dialect.name == "sqlite":
+            bin_index = sqlalchemy.cast(position, sqlalchemy.Integer)
+        else:
+            bin_index = func.floor(position)
+        return sqlalchemy.case((c[self.value_col] >= float(edges[-1]), self.bins - 1), else_=bin_index)
+
+    def county_histograms(self, parameter):
+        """
+        Bin counts of a parameter per county, from one query per parameter (then kept
+        until the data version changes).
+        Returns: (county index, county x bin count matrix), or None without data.
+        """
+        histograms = self._cache("histograms")
+        if parameter not in histograms:
+            edges = self.bin_edges(parameter)
+            if edges is None:
+                return None
+            c = self.table.c
+            query = self._where(
+                select(c.county, self._bin_index(edges).label('bin'), func.count().label('count')), parameter
+            ).group_by(c.county, 'bin')
+            with self.engine.connect() as conn:
+                rows = conn.execute(query).all()
+            # NULL counties sort last and get a row of their own: counted for 'all', never selected by name
+            counties = pd.Index(sorted({county for county, _, _ in rows}, key=lambda county: (county is None, county or "")))
+            counts = np.zeros((len(counties), self.bins), dtype=int)
+            if rows:
+                county_rows, bin_numbers, bin_counts = zip(*rows)
+                bin_numbers = np.clip(np.asarray(bin_numbers, dtype=int), 0, self.bins - 1)
+                np.add.at(counts, (counties.get_indexer(county_rows), bin_numbers), bin_counts)
+            histograms[parameter] = (counties, counts)
+        return histograms[parameter]
+
+    def histogram(self, parameter, counties=None, start=None, end=None):
+        """
+        Histogram bin counts for a parameter and county selection: a sum over the
+        per-county counts of county_histograms, or, for a date range, a query.
+        Returns: (counts, edges)
+        """
+        edges = self.bin_edges(parameter)
+        if edges is None:
+            return np.zeros(self.bins, dtype=int), np.linspace(0, 1, self.bins + 1)
+        if start is None and end is None:
+            index, counts = self.county_histograms(parameter)
+            if counties and counties[0] != 'all':
+                positions = index.get_indexer(list(counties))
+                counts = counts[positions[positions >= 0]]
+            return counts.sum(axis=0), edges
+        query = self._where(
+            select(self._bin_index(edges).label('bin'), func.count().label('count')), parameter, counties, start, end
+        ).group_by('bin')
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        counts = np.zeros(self.bins, dtype=int)
+        for bin_number, count in rows:
+            counts[min(max(int(bin_number), 0), self.bins - 1)] += count
+        return counts, edges
+
+    def map_rows(self, parameter, counties=None, start=None, end=None):
+        """The per-site rows the map plots (only the columns it uses)."""
+        c = self.table.c
+        query = self._where(
+            select(c.latitude, c.longitude, c[self.value_col], c.local_site_name, c.date),
+            parameter, counties, start, end
+        )
+        return self._read(query)
+
+    def map_count(self, parameter, counties=None, start=None, end=None):
+        """Number of rows map_rows would return."""
+        query = self._where(select(func.count()), parameter, counties, start, end)
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def map_sites(self, parameter, counties=None):
+        """Per-site mean, maximum, count and date range of a parameter, queried once per parameter and data version."""
+        sites_by_parameter = self._cache("sites")
+        if parameter not in sites_by_parameter:
+            c = self.table.c
+            keys = [c[name] for name in SITE_KEYS]
+            value = c[self.value_col]
+            query = self._where(select(
+                *keys,
+                func.avg(value).label(self.value_col),
+                func.max(value).label('maximum'),
+                func.count(value).label('observations'),
+                func.min(c.date).label('first_date'),
+                func.max(c.date).label('last_date'),
+            ), parameter).group_by(*keys).order_by(*keys)
+            sites = self._read(query)
+            sites['first_date'] = pd.to_datetime(sites['first_date'])
+            sites['last_date'] = pd.to_datetime(sites['last_date'])
+            sites_by_parameter[parameter] = sites
+        return select_counties(sites_by_parameter[parameter], counties)
+
+    def grouped_df(self, limit=None):
+        """Means by (date, county, parameter) with site attributes, sorted like AggregateCube.grouped_df."""
+        c = self.table.c
+        site_columns = [func.min(c[name]).label(name) for name in SITE_COLUMNS if name in c]
+        query = self._where(
+            select(c.date, c.county, c.parameter, func.avg(c[self.value_col]).label(self.value_col), *site_columns)
+        ).group_by(c.date, c.county, c.parameter).order_by(c.date, c.county, c.parameter)
+        if limit is not None:
+            query = query.limit(limit)
+        return self._read(query)
+
+    def quarterly_df(self):
+        """Means by county, quarter-end date, year, quarter and parameter, like AggregateCube.quarterly_df."""
+        c = self.table.c
+        keys = [c.county, c.date, c.year, c.quarter, c.parameter, c.parameter_code]
+        query = self._where(select(
+            *keys,
+            func.min(c.latitude).label('latitude'),
+            func.min(c.longitude).label('longitude'),
+            func.avg(c[self.value_col]).label(self.value_col),
+            func.min(c.units_of_measure).label('units_of_measure'),
+            func.min(c.local_site_name).label('local_site_name'),
+        )).group_by(*keys).order_by(*keys)
+        return self._read(query)
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import tempfile
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+from constants import SANDBOX_WORKERS, SANDBOX_TIMEOUT, SANDBOX_MEMORY_LIMIT, SANDBOX_MAX_TASKS
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+# Only these variables are passed to workers; secrets from the app environment are not
+WORKER_ENV_VARS = ["PATH", "PYTHONPATH", "HOME", "LANG", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT"]
+
+class SandboxError(Exception):
+    """Generated code raised, timed out or exceeded its limits."""
+
+class _Worker:
+    """A worker process and its connection (None if it failed to start)."""
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.tasks = 0
+
+class SandboxPool:
+    """
+    Pre-warmed pool of worker processes for running LLM-generated figure code.
+
+    The dataframe is written once to an Arrow IPC file that every worker reads
+    through a read-only memory map, so nothing is pickled per call and pandas/Plotly
+    imports are paid once per worker. Each snippet runs with a wall-clock timeout
+    (the worker is killed and replaced when it expires), a CPU-time limit of its own
+    and a memory cap; a `timeout` of None or 0 means no limit. Workers are recycled
+    after `max_tasks` snippets. Replacements start in the background, and one that
+    doesn't connect within `startup_timeout` fails the run that picks it up.
+
+    Workers are started as separate interpreters running sandbox_worker.py, not
+    with multiprocessing, which would re-import the dashboard script in each one.
+
+    Usage:
+        pool = SandboxPool(cleaned_df)
+        fig_json = pool.run(code)
+    """
+    def __init__(
+        self,
+        df,
+        size=SANDBOX_WORKERS,
+        timeout=SANDBOX_TIMEOUT,
+        memory_limit=SANDBOX_MEMORY_LIMIT,
+        max_tasks=SANDBOX_MAX_TASKS,
+        startup_timeout=60
+    ):
+        import pyarrow as pa
+
+        self.timeout = timeout or None
+        self.memory_limit = memory_limit
+        self.max_tasks = max_tasks
+        self.startup_timeout = startup_timeout
+
+        fd, self._data_path = tempfile.mkstemp(suffix=".arrow")
+        os.close(fd)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(self._data_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        self._authkey = os.urandom(32)
+        self._listener = Listener(authkey=self._authkey)
+        self._connections = {}
+        self._connected = threading.Condition()
+        self._idle = queue.Queue()
+        self._closed = False
+        threading.Thread(target=self._accept_connections, name="sandbox-accept", daemon=True).start()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    def _accept_connections(self):
+        """Accept worker connections in the background; each worker sends its pid first."""
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue
+            try:
+                pid = conn.recv() if conn.poll(self.startup_timeout) else None
+            except (EOFError, OSError):
+                pid = None
+            with self._connected:
+                if pid is None or self._closed:
+                    conn.close()
+                    continue
+                self._connections[pid] = conn
+                self._connected.notify_all()
+
+    def _spawn(self):
+        """Start a worker and wait up to startup_timeout for it to connect; its conn is None if it didn't."""
+        env = {name: os.environ[name] for name in WORKER_ENV_VARS if name in os.environ}
+        env["SANDBOX_AUTHKEY"] = self._authkey.hex()
+        args = [sys.executable, WORKER_SCRIPT, str(self._listener.address), self._data_path,
+                str(int(self.memory_limit or 0)), str(self.timeout or 0)]
+        process = subprocess.Popen(args, env=env, stdin=subprocess.DEVNULL)
+        deadline = time.monotonic() + self.startup_timeout
+        with self._connected:
+            while process.pid not in self._connections and process.poll() is None and time.monotonic() < deadline:
+                self._connected.wait(min(deadline - time.monotonic(), 0.1))
+            conn = self._connections.pop(process.pid, None)
+        worker = _Worker(process, conn)
+        if conn is None:
+            self._kill(worker)
+        return worker
+
+    def _replace(self, worker):
+        """Kill `worker` and start its replacement in the background, so the caller doesn't wait for it."""
+        self._kill(worker)
+        threading.Thread(target=self._add_worker, name="sandbox-spawn", daemon=True).start()
+
+    def _add_worker(self):
+        worker = self._spawn()
+        with self._connected:
+            if not self._closed:
+                self._idle.put(worker)
+                return
+        self._kill(worker)
+
+    def _kill(self, worker):
+        if worker.process.poll() is None:
+            worker.process.kill()
+        worker.process.wait()
+        if worker.conn is not None:
+            worker.conn.close()
+
+    def run(self, code, timeout=None):
+        """
+        Run `code` in a worker and return the JSON of the `fig` it defines (None if it
+        defines none). `timeout` defaults to the pool's; None means no limit.
+        Raises SandboxError on exceptions, timeouts or limit breaches.
+        """
+        if self._closed:
+            raise SandboxError("Sandbox pool is closed.")
+        if timeout is None:
+            timeout = self.timeout
+        worker = self._idle.get()
+        replace = True # unless the worker answers
+        try:
+            if worker.conn is None:
+                raise SandboxError("Sandbox worker failed to start.")
+            if not worker.ready:
+                if not worker.conn.poll(self.startup_timeout):
+                    raise SandboxError("Sandbox worker failed to start.")
+                worker.conn.recv()
+                worker.ready = True
+            worker.conn.send(code)
+            if not worker.conn.poll(timeout):
+                raise SandboxError(f"Generated code timed out after {timeout} seconds.")
+            status, payload = worker.conn.recv()
+            replace = False
+        except (EOFError, OSError):
+            # The worker died, e.g. on SIGXCPU after its CPU limit or from the OOM killer
+            raise SandboxError("Generated code exceeded its resource limits.")
+        finally:
+            worker.tasks += 1
+            if not replace and worker.tasks >= self.max_tasks:
+                worker.conn.send(None)
+                replace = True
+            if replace:
+                self._replace(worker)
+            else:
+                self._idle.put(worker)
+
+        if status != "ok":
+            raise SandboxError(payload)
+        return payload
+
+    def close(self):
+        """Stop all workers and remove the shared data file."""
+        with self._connected:
+            if self._closed:
+                return
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if worker.conn is not None:
+                    worker.conn.send(None)
+            except OSError:
+                pass
+            self._kill(worker)
+        self._listener.close()
+        with self._connected:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        if os.path.exists(self._data_path):
+            os.remove(self._data_path)
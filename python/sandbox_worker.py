@@ -0,0 +1,78 @@
+"""
+Worker process for sandbox.SandboxPool.
+
+Run as a script by the pool. It deliberately imports nothing from the app (in
+particular not constants, which loads .env), so generated code never sees API
+keys or database credentials.
+"""
+import os
+import sys
+from multiprocessing.connection import Client
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def limit_memory(memory_limit):
+    """Cap further memory growth of the current process at `memory_limit` bytes."""
+    if resource is None or not memory_limit:
+        return
+    try:
+        with open("/proc/self/statm") as file:
+            current = int(file.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        current = 0
+    limit = current + memory_limit
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def limit_cpu(cpu_seconds):
+    """Allow `cpu_seconds` more CPU time (SIGXCPU after that); called before each snippet, so it is a per-snippet limit."""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+
+def serve(conn, data_path, memory_limit, cpu_seconds):
+    """
+    Import pandas/Plotly and map the dataframe once, then run code snippets
+    received on `conn` until it receives None.
+    """
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    import pyarrow as pa
+
+    # Each snippet gets a shallow copy; with copy-on-write its changes never reach the shared frame
+    pd.options.mode.copy_on_write = True
+    with pa.memory_map(data_path, "r") as source:
+        cleaned_df = pa.ipc.open_file(source).read_all().to_pandas()
+    limit_memory(memory_limit)
+    conn.send(("ready", None))
+
+    while True:
+        code = conn.recv()
+        if code is None:
+            break
+        limit_cpu(cpu_seconds)
+        try:
+            local_vars = {}
+            exec(code, {"cleaned_df": cleaned_df.copy(deep=False), "px": px, "go": go, "pd": pd}, local_vars)
+            fig = local_vars.get("fig", None)
+            conn.send(("ok", fig.to_json() if fig is not None else None))
+        except MemoryError:
+            conn.send(("error", "Generated code exceeded the memory limit."))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+if __name__ == "__main__":
+    address, data_path, memory_limit, cpu_seconds = sys.argv[1:5]
+    authkey = bytes.fromhex(os.environ.pop("SANDBOX_AUTHKEY"))
+    try:
+        conn = Client(address, authkey=authkey)
+        conn.send(os.getpid())  # lets the pool match the connection to this process
+        serve(conn, data_path, int(memory_limit), float(cpu_seconds))
+    except (EOFError, OSError):
+        pass  # the app went away
+
@@ -0,0 +1,200 @@
+"""
+Declared column types for AQS API data.
+
+The AQS specification (assets/aqs_api_specification.json) lists the services but not
+the types of the fields they return, and metaData/fieldsByService only names and
+describes each field. So the types are declared here, once per field name (a field
+means the same thing in every service), and each service's schema is the declared
+type of each of its fields:
+
+- codes (FIPS state/county/site, agency, method) are zero-padded strings stored as
+  categoricals, so '06' and 6 don't both appear;
+- repeated strings (parameter, county, units_of_measure, ...) are categoricals;
+- counts, years and codes such as parameter_code are small integers where the values
+  fit, percentages float32; measurements and coordinates stay float64;
+- dates and datetimes are parsed.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SPEC_PATH = os.path.join(os.path.dirname(__file__), "..", "assets", "aqs_api_specification.json")
+
+# Zero-padded code fields and their width
+CODE_WIDTHS = {
+    "state_code": 2,
+    "county_code": 3,
+    "site_number": 4,
+    "cbsa_code": 5,
+    "monitoring_agency_code": 4,
+    "method_code": 3,
+    "units_of_measure_code": 3,
+}
+
+FIELD_TYPES = {
+    **{field: "code" for field in CODE_WIDTHS},
+    # Repeated strings
+    **{field: "category" for field in [
+        "datum", "parameter", "sample_duration", "sample_duration_code", "sample_duration_type",
+        "pollutant_standard", "metric_used", "method", "method_type", "units_of_measure", "event_type",
+        "quarterly_criteria_met", "validity_indicator", "certification_indicator", "monitoring_agency",
+        "local_site_name", "address", "site_address", "state", "county", "city", "cbsa", "qualifier",
+        "sample_frequency", "time_local", "time_gmt", "status", "request_time", "url",
+    ]},
+    # Integers
+    "parameter_code": "int32",
+    "poc": "int16",
+    "year": "int16",
+    "quarter": "int8",
+    "first_max_hour": "int8",
+    "aqi": "int16",
+    "rows": "int32",
+    **{field: "int32" for field in [
+        "observation_count", "valid_samples", "valid_day_count", "required_day_count", "scheduled_samples",
+        "exceptional_data_count", "null_observation_count", "primary_exceedance_count",
+        "secondary_exceedance_count",
+    ]},
+    # Percentages
+    **{field: "float32" for field in ["observation_percent", "percent_days", "percent_one_value"]},
+    # Measurements stay float64: float32 can't hold values such as 0.0104 exactly, and the
+    # error would show in aggregates, hover labels and the LLM context
+    **{field: "float64" for field in [
+        "arithmetic_mean", "standard_deviation", "minimum_value", "maximum_value", "sample_measurement",
+        "detection_limit", "uncertainty", "first_max_value", "second_max_value", "third_max_value", "fourth_max_value",
+        "first_max_nonoverlap_value", "second_max_nonoverlap_value", "ninety_ninth_percentile",
+        "ninety_eighth_percentile", "ninety_fifth_percentile", "ninetieth_percentile",
+        "seventy_fifth_percentile", "fiftieth_percentile", "tenth_percentile",
+    ]},
+    "latitude": "float64",
+    "longitude": "float64",
+    # Dates
+    **{field: "datetime" for field in [
+        "date", "date_local", "date_gmt", "date_of_last_change", "first_max_datetime", "second_max_datetime",
+        "third_max_datetime", "fourth_max_datetime", "first_max_n_o_datetime", "second_max_n_o_datetime",
+    ]},
+}
+
+SITE_FIELDS = [
+    "state_code", "county_code", "site_number", "parameter_code", "poc", "latitude", "longitude", "datum", "parameter",
+]
+HEADER_FIELDS = ["status", "request_time", "url", "rows"]
+
+# Fields returned by the data services this project downloads (see metaData/fieldsByService)
+SERVICE_FIELDS = {
+    "quarterlyData": SITE_FIELDS + [
+        "sample_duration", "sample_duration_code", "sample_duration_type", "pollutant_standard", "year", "quarter",
+        "units_of_measure", "event_type", "observation_count", "observation_percent", "arithmetic_mean",
+        "minimum_value", "maximum_value", "quarterly_criteria_met", "valid_samples", "valid_day_count",
+        "scheduled_samples", "percent_days", "percent_one_value", "monitoring_agency_code", "monitoring_agency",
+        "local_site_name", "address", "state", "county", "city", "cbsa_code", "cbsa", "date_of_last_change",
+    ],
+    "annualData": SITE_FIELDS + [
+        "sample_duration_code", "sample_duration", "pollutant_standard", "metric_used", "method", "year",
+        "units_of_measure", "event_type", "observation_count", "observation_percent", "validity_indicator",
+        "valid_day_count", "required_day_count", "exceptional_data_count", "null_observation_count",
+        "primary_exceedance_count", "secondary_exceedance_count", "certification_indicator", "arithmetic_mean",
+        "standard_deviation", "first_max_value", "first_max_datetime", "second_max_value", "second_max_datetime",
+        "third_max_value", "third_max_datetime", "fourth_max_value", "fourth_max_datetime",
+        "first_max_nonoverlap_value", "first_max_n_o_datetime", "second_max_nonoverlap_value",
+        "second_max_n_o_datetime", "ninety_ninth_percentile", "ninety_eighth_percentile", "ninety_fifth_percentile",
+        "ninetieth_percentile", "seventy_fifth_percentile", "fiftieth_percentile", "tenth_percentile",
+        "local_site_name", "site_address", "state", "county", "city", "cbsa_code", "cbsa", "date_of_last_change",
+    ],
+    "dailyData": SITE_FIELDS + [
+        "sample_duration_code", "sample_duration", "pollutant_standard", "date_local", "units_of_measure",
+        "event_type", "observation_count", "observation_percent", "validity_indicator", "arithmetic_mean",
+        "first_max_value", "first_max_hour", "aqi", "method_code", "method", "local_site_name", "site_address",
+        "state", "county", "city", "cbsa_code", "cbsa", "date_of_last_change",
+    ],
+    "sampleData": SITE_FIELDS + [
+        "date_local", "time_local", "date_gmt", "time_gmt", "sample_measurement", "units_of_measure",
+        "units_of_measure_code", "sample_duration", "sample_duration_code", "sample_frequency", "detection_limit",
+        "uncertainty", "qualifier", "method_type", "method", "method_code", "state", "county",
+        "date_of_last_change", "cbsa_code",
+    ],
+}
+
+def spec_services(spec_path=SPEC_PATH):
+    """Service names in the AQS API specification (the first segment of each path)."""
+    with open(spec_path) as f:
+        spec = json.load(f)
+    return sorted({path.strip("/").split("/")[0] for path in spec["paths"]})
+
+def fields_from_metadata(response):
+    """Field names from a metaData/fieldsByService response."""
+    return [field["field_name"] for field in response.get("Data", [])]
+
+def get_schema(service=None, fields=None):
+    """
+    The declared {field: type} schema of an AQS service, plus the response header
+    fields and the derived 'date'. Pass the `fields` of a metaData/fieldsByService
+    response for a service without a declared field list; fields without a declared
+    type are left out (and so left to pandas). With neither, every declared field.
+    """
+    if fields is None and service is not None:
+        if service not in SERVICE_FIELDS:
+            if service not in spec_services():
+                raise ValueError(f"Unknown AQS service '{service}'.")
+            raise ValueError(f"No declared fields for '{service}'; pass the field names from its metaData/fieldsByService response.")
+        fields = SERVICE_FIELDS[service]
+    if fields is None:
+        return dict(FIELD_TYPES)
+    fields = list(dict.fromkeys(list(fields) + HEADER_FIELDS + ["date"]))
+    return {field: FIELD_TYPES[field] for field in fields if field in FIELD_TYPES}
+
+def _to_numeric(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return pd.to_numeric(values, errors="coerce")
+
+def _to_code(values, width):
+    """Zero-padded code strings: 6, 6.0 and '06' all become '06'. Only the distinct values are formatted."""
+    codes, uniques = pd.factorize(values)
+    padded = []
+    for value in uniques:
+        if isinstance(value, (int, float, np.integer, np.floating)) and float(value).is_integer():
+            value = int(value)
+        value = str(value)
+        padded.append(value.zfill(width) if value.isdigit() else value)
+    # Values that only differed before padding (6 and '06') share a category
+    categories, positions = np.unique(np.array(padded, dtype=object), return_inverse=True) if padded else ([], [])
+    positions = np.append(np.asarray(positions, dtype=np.int64), -1) # code -1 (missing) stays missing
+    return pd.Series(pd.Categorical.from_codes(positions[codes], categories), index=values.index)
+
+def _to_int(values, dtype):
+    """Integers of `dtype` if they fit and none are missing, otherwise float32 (still exact for counts below 2**24)."""
+    numbers = _to_numeric(values)
+    info = np.iinfo(dtype)
+    if numbers.notna().all() and (numbers == numbers.round()).all() and (numbers.empty or info.min <= numbers.min() and numbers.max() <= info.max):
+        return numbers.astype(dtype)
+    if numbers.isna().all() or numbers.abs().max() < 2**24:
+        return numbers.astype("float32")
+    return numbers
+
+def apply_schema(df, service=None, fields=None):
+    """
+    Cast the columns of `df` that have a declared type (see get_schema) to it. Other
+    columns are unchanged. Returns a new frame.
+    """
+    schema = get_schema(service, fields)
+    df = df.copy()
+    for column in df.columns:
+        kind = schema.get(column)
+        if kind is None:
+            continue
+        values = df[column]
+        if kind == "code":
+            df[column] = _to_code(values, CODE_WIDTHS[column])
+        elif kind == "category":
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[column] = values.astype("category")
+        elif kind == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                df[column] = pd.to_datetime(values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values, errors="coerce")
+        elif kind.startswith("int"):
+            df[column] = _to_int(values, kind)
+        else:
+            df[column] = _to_numeric(values).astype(kind)
+    return df
@@ -0,0 +1,54 @@
+"""
+Prompt injection screening of chatbot requests. The blocked phrases are matched by
+one compiled regex, and similarity to the system prompt is the Dice coefficient of
+character shingle sets, with the prompt's shingles computed once per prompt text.
+Both take time linear in the input, where difflib.SequenceMatcher is quadratic in
+the worst case.
+"""
+import re
+from functools import lru_cache
+
+from constants import MAX_INPUT_LENGTH, BLOCKED_PATTERNS
+
+SHINGLE_SIZE = 5 # characters per shingle
+
+def compile_patterns(patterns):
+    """One regex matching any of the lowercase literal `patterns`, longest first."""
+    return re.compile("|".join(re.escape(pattern.lower()) for pattern in sorted(patterns, key=len, reverse=True)))
+
+BLOCKED_REGEX = compile_patterns(BLOCKED_PATTERNS)
+SANITIZE_REGEX = re.compile(r"```|system:|assistant:|user:", flags=re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def shingles(text, size=SHINGLE_SIZE):
+    """The set of `size`-character substrings of `text`, lowercased with runs of whitespace collapsed."""
+    text = _WHITESPACE.sub(" ", text.lower()).strip()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+@lru_cache(maxsize=16)
+def prompt_shingles(system_prompt):
+    """Shingles of a system prompt; prompts are formatted the same way per language, so this is computed once each."""
+    return frozenset(shingles(system_prompt))
+
+def similarity(a, b):
+    """Dice coefficient 2|A & B| / (|A| + |B|) of two shingle sets, the set analogue of SequenceMatcher.ratio()."""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return 2 * sum(1 for shingle in a if shingle in b) / (len(a) + len(b))
+
+def is_similar(user_input, system_prompt, threshold=0.8):
+    return similarity(shingles(user_input), prompt_shingles(system_prompt)) > threshold
+
+def secure_user_input(user_input, system_prompt):
+    """(True, sanitized input) if the request passes screening, otherwise (False, reason)."""
+    if len(user_input) > MAX_INPUT_LENGTH:
+        return False, "Input too long. Please shorten your request."
+    if BLOCKED_REGEX.search(user_input.lower()):
+        return False, "Input contains blocked phrases. Please rephrase."
+    if is_similar(user_input, system_prompt):
+        return False, "Input too similar to system prompt. Please rephrase."
+    return True, SANITIZE_REGEX.sub("", user_input)
@@ -0,0 +1,59 @@
+import time
+import threading
+from contextlib import contextmanager
+
+class StartupTimer:
+    """
+    Startup instrumentation: seconds from `start` to named milestones (imports done,
+    app created, first request served, ...) and the duration of named steps (data
+    load, LLM client setup, ...). Each is printed once and kept for /healthz.
+    """
+    def __init__(self, start=None, clock=time.perf_counter):
+        self.clock = clock
+        self.start = clock() if start is None else start
+        self.milestones = {}
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record the first time `name` is reached."""
+        with self._lock:
+            if name in self.milestones:
+                return
+            self.milestones[name] = round(self.clock() - self.start, 3)
+        print(f"Startup: {name} after {self.milestones[name]:.2f}s")
+
+    @contextmanager
+    def measure(self, name):
+        """Record how long the block takes."""
+        began = self.clock()
+        try:
+            yield
+        finally:
+            self.durations[name] = round(self.clock() - began, 3)
+            print(f"Startup: {name} took {self.durations[name]:.2f}s")
+
+    def report(self):
+        return {"milestones": dict(self.milestones), "durations": dict(self.durations)}
+
+class LazyValue:
+    """
+    A value built by `factory()` on first use, once, even with concurrent callers.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.factory()
+                    self._loaded = True
+        return self._value
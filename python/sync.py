@@ -0,0 +1,183 @@
+import os
+import json
+import argparse
+import tempfile
+from datetime import date
+
+import pandas as pd
+import pandas.tseries.offsets as offsets
+
+from constants import CONNECTION_TYPE, QUARTERLY_NATURAL_KEY, SYNC_STATE_PATH
+from fetcher import RateLimiter, chunk_params, split_date_range_by_year
+from main import get_air_quality_data, pollutants
+from utils import mask_api_key_and_email, upsert_dataframe, get_configured_engine
+
+def get_sync_key(service, param, state, county=None):
+    """High-water mark key for one (service, param, geography)."""
+    county = str(county).zfill(3) if county else "*"
+    return f"{service}|{str(param).zfill(5)}|{str(state).zfill(2)}|{county}"
+
+def merge_ranges(covered, bdate, edate):
+    """
+    The YYYYMMDD range covered after pulling bdate..edate: the union with `covered` if
+    the two overlap or touch, otherwise bdate..edate alone.
+    """
+    if covered:
+        start, end = covered
+        day = pd.Timedelta(days=1)
+        if pd.Timestamp(bdate) <= pd.Timestamp(end) + day and pd.Timestamp(start) <= pd.Timestamp(edate) + day:
+            return min(start, bdate), max(end, edate)
+    return bdate, edate
+
+def load_sync_state(path=SYNC_STATE_PATH):
+    """Load saved high-water marks, or an empty state on the first run."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+def save_sync_state(sync_state, path=SYNC_STATE_PATH):
+    """Save high-water marks atomically so an interrupted run keeps the previous state."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(sync_state, file, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def response_to_frame(data):
+    """Flatten an AQS response into rows shaped like the combined_data tables."""
+    records = data.get("Data") or []
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+    header = data.get("Header") or {}
+    if isinstance(header, list):
+        header = header[0] if header else {}
+    for key, value in header.items():
+        df[key] = value
+    if "year" in df.columns and "quarter" in df.columns:
+        quarter_end_month = pd.to_datetime(dict(year=df["year"].astype(int), month=df["quarter"].astype(int) * 3, day=1))
+        df["date"] = quarter_end_month + offsets.MonthEnd(0)
+    return df
+
+def sync_incremental(
+    engine,
+    table_name,
+    states,
+    params,
+    bdate,
+    edate,
+    service="quarterlyData",
+    by="byState",
+    counties=None,
+    email=None,
+    api_key=None,
+    key_columns=QUARTERLY_NATURAL_KEY,
+    state_path=SYNC_STATE_PATH,
+    session=None,
+    limiter=None,
+    today=None
+):
+    """
+    Pull only records changed since the last run and upsert them into `table_name`.
+
+    Each (service, param, geography) keeps a high-water mark: the latest
+    date_of_last_change seen, and the bdate..edate range it covers. Later runs pass it
+    as `cbdate` (and today as `cedate`) for the years inside that range, so the API
+    only returns rows changed since then; years outside it (the first run, or a wider
+    bdate or edate) are pulled in full. Parameters that share a mark share requests,
+    up to 5 per request. A mark only advances when all of its requests succeed.
+
+    Args:
+        counties (dict, optional): State FIPS code -> county FIPS codes, for byCounty/bySite.
+    Returns:
+        int: Number of rows upserted.
+    """
+    today = today or date.today()
+    limiter = limiter or RateLimiter()
+    sync_state = load_sync_state(state_path)
+    params = [str(p).zfill(5) for p in params]
+    bdate, edate = str(bdate), str(edate)
+
+    geographies = []
+    for state in states:
+        state = str(state).zfill(2)
+        if by in ("byCounty", "bySite"):
+            geographies.extend((state, county) for county in (counties or {}).get(state, []))
+        else:
+            geographies.append((state, None))
+
+    total = 0
+    for state, county in geographies:
+        # Group parameters by their current mark so each group can share requests
+        groups = {}
+        for param in params:
+            entry = sync_state.get(get_sync_key(service, param, state, county))
+            # Marks saved without their range are pulled in full once
+            mark, covered = (entry["changed_since"], (entry["bdate"], entry["edate"])) if isinstance(entry, dict) else (None, None)
+            groups.setdefault((mark, covered), []).append(param)
+
+        for (mark, covered), group_params in groups.items():
+            frames, failed = [], False
+            for year_bdate, year_edate in split_date_range_by_year(bdate, edate):
+                change_args = {}
+                if mark and covered[0] <= year_bdate and year_edate <= covered[1]:
+                    change_args = dict(cbdate=mark.replace("-", ""), cedate=today.strftime("%Y%m%d"))
+                for param_chunk in chunk_params(group_params):
+                    with limiter:
+                        data = get_air_quality_data(
+                            service=service, by=by, param=param_chunk, state=state, county=county,
+                            bdate=year_bdate, edate=year_edate, email=email, api_key=api_key,
+                            session=session, **change_args
+                        )
+                    if data is None:
+                        failed = True
+                        continue
+                    frames.append(response_to_frame(mask_api_key_and_email(data)))
+
+            rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            total += upsert_dataframe(engine, table_name, rows, key_columns)
+            print(f"{service} state={state} county={county or '*'} params={','.join(group_params)} "
+                  f"since={mark or 'beginning'}: {len(rows)} changed rows")
+
+            if failed:
+                continue
+            for param in group_params:
+                changed = pd.Series(dtype=object)
+                if not rows.empty:
+                    changed = rows.loc[rows["parameter_code"].astype(str).str.zfill(5) == param, "date_of_last_change"]
+                new_mark = changed.max() if not changed.dropna().empty else (mark or today.isoformat())
+                start, end = merge_ranges(covered, bdate, edate)
+                sync_state[get_sync_key(service, param, state, county)] = {
+                    "changed_since": max(new_mark, mark or new_mark), "bdate": start, "edate": end
+                }
+            save_sync_state(sync_state, state_path)
+
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync AQS records changed since the last run.")
+    parser.add_argument("--states", required=True, help="Comma-separated state FIPS codes, e.g. 06,32")
+    parser.add_argument("--params", default=",".join(str(code) for _, code in pollutants),
+                        help="Comma-separated parameter codes (default: all pollutants)")
+    parser.add_argument("--bdate", required=True, help="Begin date (YYYYMMDD)")
+    parser.add_argument("--edate", required=True, help="End date (YYYYMMDD)")
+    parser.add_argument("--service", default="quarterlyData")
+    parser.add_argument("--state-path", default=SYNC_STATE_PATH)
+    args = parser.parse_args()
+
+    engine, table_name = get_configured_engine(CONNECTION_TYPE)
+    total = sync_incremental(
+        engine, table_name,
+        states=args.states.split(","),
+        params=args.params.split(","),
+        bdate=args.bdate,
+        edate=args.edate,
+        service=args.service,
+        state_path=args.state_path,
+    )
+    print(f"Upserted {total} rows into '{table_name}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+import pandas as pd
+import sqlalchemy
+
+from unittest import mock
+
+from bulk_load import bulk_load_csv, _cast_chunk
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class TestBulkLoad(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(self.directory, 'test.db')}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_matches_to_sql(self):
+        rows = bulk_load_csv(self.engine, "air_quality", DATA_PATH, chunksize=100)
+        expected = pd.read_csv(DATA_PATH)
+        self.assertEqual(rows, len(expected))
+
+        loaded = pd.read_sql_table("air_quality", self.engine)
+        pd.testing.assert_frame_equal(loaded, expected, check_dtype=False)
+
+        indexes = sqlalchemy.inspect(self.engine).get_indexes("air_quality")
+        self.assertEqual([index["column_names"] for index in indexes], [["parameter", "county", "date", "arithmetic_mean"]])
+
+        with self.assertRaises(ValueError):
+            bulk_load_csv(self.engine, "air_quality", DATA_PATH)
+
+    def test_later_chunks_are_cast_to_declared_types(self):
+        path = os.path.join(self.directory, "drift.csv")
+        pd.DataFrame({"county": ["Kern", "Fresno", "Kern"], "year": ["2019", "2020", ""]}).to_csv(path, index=False)
+        bulk_load_csv(self.engine, "drift", path, chunksize=2, indexes=[])
+        with self.engine.connect() as conn:
+            values = conn.execute(sqlalchemy.text("SELECT year, typeof(year) FROM drift")).fetchall()
+        self.assertEqual(values, [(2019, "integer"), (2020, "integer"), (None, "null")])
+
+    def test_later_chunks_widen_column_types(self):
+        path = os.path.join(self.directory, "widen.csv")
+        pd.DataFrame({
+            "code": [1, 2, "06A"], "note": [None, None, "text"], "cbsa_code": [None, None, 41860], "state_code": ["06", "06", "07"],
+        }).to_csv(path, index=False)
+        bulk_load_csv(self.engine, "widen", path, chunksize=2, indexes=[])
+        with self.engine.connect() as conn:
+            values = conn.execute(sqlalchemy.text("SELECT code, note, cbsa_code, typeof(cbsa_code) FROM widen")).fetchall()
+        self.assertEqual(values, [("1", None, None, "null"), ("2", None, None, "null"), ("06A", "text", 41860, "integer")])
+
+        with self.assertRaises(ValueError):
+            _cast_chunk(pd.DataFrame({"code": ["1", "06A"]}), {"code": sqlalchemy.BigInteger()})
+
+    def test_failed_load_leaves_no_table(self):
+        with mock.patch("bulk_load._insert_many", side_effect=[None, RuntimeError("disk full")]):
+            with self.assertRaises(RuntimeError):
+                bulk_load_csv(self.engine, "air_quality", DATA_PATH, chunksize=50)
+        self.assertEqual(sqlalchemy.inspect(self.engine).get_table_names(), [])
+
+        self.assertEqual(bulk_load_csv(self.engine, "air_quality", DATA_PATH), len(pd.read_csv(DATA_PATH)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+import shutil
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "scripts")))
+from combine_csvs import SCHEMA_SAMPLE_ROWS, MANIFEST_SUFFIX, merge_schemas, cast_report, combine_csv_files_streaming, load_manifest
+
+class TestCombineCsvs(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.out_file = self.directory / "combined_output.csv"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_report(self, name, counties, code=1):
+        path = self.directory / name
+        pd.DataFrame({"county": counties, "poc": 1, "code": code, "arithmetic_mean": [0.5] * len(counties)}).to_csv(path, index=False)
+        return path
+
+    def combine(self, files):
+        """(rows written, printed output) of a streamed combine into out_file."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            _, rows = combine_csv_files_streaming(files, self.out_file, workers=1)
+        return rows, output.getvalue()
+
+    def test_merge_schemas(self):
+        merged = merge_schemas([{"poc": "int16", "county": "category"}, {"poc": "int8", "mean": "float64"}])
+        self.assertEqual(merged, {"poc": "Int64", "county": "string", "mean": "float64"})
+        self.assertEqual(merge_schemas([{"poc": "int16", "flag": "bool"}]), {"poc": "Int16", "flag": "boolean"})
+        self.assertEqual(merge_schemas([{"poc": "int16", "mean": "float64"}, {"poc": "Int16"}]), {"poc": "Int16", "mean": "float64"})
+        # An already merged schema is unchanged by merging it again with the same report types
+        self.assertEqual(merge_schemas([merged, {"poc": "int64", "county": "object", "mean": "float64"}]), merged)
+        self.assertEqual(merge_schemas([{"poc": "Int16"}, {"poc": "float32"}, {"poc": "object"}]), {"poc": "string"})
+
+    def test_cast_report_widens(self):
+        df = pd.DataFrame({"poc": [1.0, 2.5], "site": ["1", "06A"]})
+        df, dtypes = cast_report(df, {"poc": "Int64", "site": "Int64"})
+        self.assertEqual(dtypes, {"poc": "float64", "site": "string"})
+        self.assertEqual(df["poc"].tolist(), [1.0, 2.5])
+        self.assertEqual(df["site"].tolist(), ["1", "06A"])
+
+    def test_first_combine(self):
+        files = [self.write_report("report2019.csv", ["Kern", "Fresno"]), self.write_report("report2020.csv", ["Inyo"])]
+        rows, output = self.combine(files)
+        self.assertEqual(rows, 3)
+        self.assertIn("Combining 2 of 2 files", output)
+
+        combined = pd.read_csv(self.out_file)
+        self.assertEqual(combined["county"].tolist(), ["Kern", "Fresno", "Inyo"])
+        self.assertEqual(combined["year"].tolist(), [2019, 2019, 2020])
+        manifest = load_manifest(self.out_file.with_name(self.out_file.name + MANIFEST_SUFFIX))
+        self.assertEqual(sorted(manifest["files"]), sorted(str(f) for f in files))
+        self.assertEqual(manifest["years"], ["2019", "2020"])
+
+    def test_appends_new_files(self):
+        files = [self.write_report("report2019.csv", ["Kern", "Fresno"])]
+        self.combine(files)
+        files.append(self.write_report("report2020.csv", ["Inyo"]))
+        rows, output = self.combine(files)
+        self.assertEqual(rows, 1)
+        self.assertIn("Appending 1 of 2 files", output)
+        self.assertEqual(pd.read_csv(self.out_file)["county"].tolist(), ["Kern", "Fresno", "Inyo"])
+
+    def test_rebuilds_when_files_change_or_are_removed(self):
+        files = [self.write_report("report2019.csv", ["Kern", "Fresno"]), self.write_report("report2020.csv", ["Inyo"])]
+        self.combine(files)
+
+        self.write_report("report2019.csv", ["Kern", "Fresno", "Tulare"])
+        rows, output = self.combine(files)
+        self.assertEqual(rows, 4)
+        self.assertIn("Combining 2 of 2 files (1 changed, 0 removed)", output)
+        self.assertEqual(pd.read_csv(self.out_file)["county"].tolist(), ["Kern", "Fresno", "Tulare", "Inyo"])
+
+        rows, output = self.combine(files[1:])
+        self.assertEqual(rows, 1)
+        self.assertIn("Combining 1 of 1 files (0 changed, 1 removed)", output)
+        self.assertEqual(pd.read_csv(self.out_file)["county"].tolist(), ["Inyo"])
+
+    def test_up_to_date(self):
+        files = [self.write_report("report2019.csv", ["Kern", "Fresno"]), self.write_report("report2020.csv", ["Inyo"])]
+        self.combine(files)
+        before = self.out_file.read_bytes()
+        rows, output = self.combine(files)
+        self.assertEqual(rows, 0)
+        self.assertIn("is up to date", output)
+        self.assertEqual(self.out_file.read_bytes(), before)
+
+    def test_restarts_when_types_widen_past_the_sample(self):
+        # The sampled rows of the second report's (undeclared) code column are integers; a later row isn't
+        code = list(range(SCHEMA_SAMPLE_ROWS)) + ["06A"]
+        files = [self.write_report("report2019.csv", ["Kern"]), self.write_report("report2020.csv", ["Inyo"] * len(code), code)]
+        rows, output = self.combine(files)
+        self.assertEqual(rows, len(code) + 1)
+        self.assertIn("Widened column types", output)
+
+        combined = pd.read_csv(self.out_file, dtype={"code": str})
+        self.assertEqual(len(combined), len(code) + 1)
+        self.assertEqual(combined["code"].iloc[-1], "06A")
+        manifest = load_manifest(self.out_file.with_name(self.out_file.name + MANIFEST_SUFFIX))
+        self.assertEqual(manifest["columns"]["code"], "string")
+
+        # The widened types are kept: adding a file with integer codes appends
+        files.append(self.write_report("report2021.csv", ["Kern"]))
+        rows, output = self.combine(files)
+        self.assertEqual(rows, 1)
+        self.assertIn("Appending 1 of 3 files", output)
+
+if __name__ == "__main__":
+    unittest.main()
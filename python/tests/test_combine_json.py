@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "scripts")))
+from combine_json import header_columns, concat_frames, combine_json_files, add_quarter_end_date
+
+HEADER = {"status": "Success", "request_time": "2025-10-07T00:00:00-04:00", "url": "https://aqs.epa.gov/data/api/quarterlyData/byState", "rows": 2}
+
+class TestCombineJson(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_response(self, name, records, header=HEADER):
+        with open(os.path.join(self.directory, name), "w") as f:
+            json.dump({"Header": [header], "Data": records}, f)
+
+    def test_add_quarter_end_date(self):
+        df = pd.DataFrame({"year": ["2019", "2020", "2020", "2020", "2020"], "quarter": ["4", "1", "2", "3", "4"]})
+        df = add_quarter_end_date(df)
+        expected = pd.to_datetime(["2019-12-31", "2020-03-31", "2020-06-30", "2020-09-30", "2020-12-31"])
+        self.assertEqual(df["date"].tolist(), expected.tolist())
+        self.assertEqual(df["year"].tolist(), [2019, 2020, 2020, 2020, 2020])
+
+    def test_header_columns(self):
+        columns = header_columns({"status": "Success", "error": None}, 3)
+        self.assertEqual(columns["status"].tolist(), ["Success"] * 3)
+        self.assertEqual(list(columns["status"].categories), ["Success"])
+        self.assertTrue(pd.isna(columns["error"]).all())
+
+    def test_concat_frames_unions_categories(self):
+        first = pd.DataFrame({"value": [1.0, 2.0], **header_columns({"request_time": "a", "rows": 2}, 2)})
+        second = pd.DataFrame({"value": [3.0], **header_columns({"request_time": "b", "rows": "1"}, 1)})
+        df = concat_frames([first, second])
+        self.assertEqual(list(df.columns), ["value", "request_time", "rows"])
+        self.assertIsInstance(df["request_time"].dtype, pd.CategoricalDtype)
+        self.assertEqual(sorted(df["request_time"].cat.categories), ["a", "b"])
+        self.assertEqual(df["request_time"].tolist(), ["a", "a", "b"])
+        # Categories of different types fall back to object values
+        self.assertEqual(df["rows"].dtype, object)
+        self.assertEqual(df["rows"].tolist(), [2, 2, "1"])
+
+    def test_columns_match_legacy_combine(self):
+        first = [{"state_code": "06", "year": 2020, "quarter": 1, "arithmetic_mean": 0.04}]
+        second = [{"state_code": "32", "year": 2020, "quarter": 2, "arithmetic_mean": 9.4, "county": "Clark"}]
+        self.write_response("quarterlysummary_by_state_1.json", first)
+        self.write_response("quarterlysummary_by_state_2.json", second, dict(HEADER, rows=1))
+
+        # The previous combine_json_files: one DataFrame from every record with its file's header merged in
+        records = [{**record, **HEADER} for record in first] + [{**record, **dict(HEADER, rows=1)} for record in second]
+        expected = pd.DataFrame(records)
+        for workers in (1, 2):
+            df = combine_json_files(self.directory, workers=workers)
+            self.assertEqual(list(df.columns), list(expected.columns))
+            pd.testing.assert_frame_equal(df.astype(object), expected.astype(object))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import numpy as np
+import pandas as pd
+from cube import AggregateCube
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class TestAggregateCube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(DATA_PATH)
+        df['date'] = pd.to_datetime(df['date'])
+        cls.df = df.dropna(subset=["arithmetic_mean"])
+        cls.cube = AggregateCube(cls.df)
+        cls.pollutant = cls.df['parameter'].iloc[0]
+
+    def test_grouped_df_matches_groupby(self):
+        expected = self.df.groupby(['date', 'county', 'parameter']).agg({
+            'arithmetic_mean': 'mean', 'local_site_name': 'first', 'city': 'first', 'state': 'first',
+            'county_code': 'first', 'latitude': 'first', 'longitude': 'first', 'units_of_measure': 'first'
+        }).reset_index()
+        pd.testing.assert_frame_equal(self.cube.grouped_df(), expected)
+
+    def test_quarterly_df_matches_groupby(self):
+        expected = self.df.groupby(
+            ["county", pd.Grouper(key="date", freq="QE"), "year", "quarter", "parameter", "parameter_code"]
+        ).agg({
+            'latitude': 'first', 'longitude': 'first', 'arithmetic_mean': 'mean',
+            'units_of_measure': 'first', 'local_site_name': 'first'
+        }).reset_index()
+        pd.testing.assert_frame_equal(self.cube.quarterly_df(), expected)
+
+    def test_time_series_slice(self):
+        series = self.cube.time_series(self.pollutant, ["Los Angeles"])
+        grouped = self.cube.grouped_df()
+        expected = grouped[(grouped['parameter'] == self.pollutant) & (grouped['county'] == "Los Angeles")]
+        self.assertEqual(len(series), len(expected))
+        self.assertAlmostEqual(series['arithmetic_mean'].sum(), expected['arithmetic_mean'].sum())
+        self.assertTrue(self.cube.time_series("Unknown").empty)
+
+    def test_histogram_counts(self):
+        counties = ["Los Angeles", "San Diego"]
+        counts, edges = self.cube.histogram(self.pollutant, counties)
+        selected = self.df[(self.df['parameter'] == self.pollutant) & self.df['county'].isin(counties)]
+        expected, _ = np.histogram(selected['arithmetic_mean'], bins=edges)
+        np.testing.assert_array_equal(counts, expected)
+        self.assertEqual(self.cube.histogram(self.pollutant)[0].sum(), (self.df['parameter'] == self.pollutant).sum())
+
+    def test_rows_without_county(self):
+        df = self.df.copy()
+        df['county'] = df['county'].astype(object)
+        df.loc[df.index[0], 'county'] = None
+        cube = AggregateCube(df)
+        parameter = df['parameter'].iloc[0]
+        self.assertEqual(cube.histogram(parameter)[0].sum(), (df['parameter'] == parameter).sum())
+        counts, edges = cube.histogram(parameter, ["Los Angeles"])
+        selected = df[(df['parameter'] == parameter) & (df['county'] == "Los Angeles")]
+        np.testing.assert_array_equal(counts, np.histogram(selected['arithmetic_mean'], bins=edges)[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+import shutil
+import sqlite3
+import threading
+
+import sqlalchemy
+
+import db_pool
+from db_pool import get_pooled_engine, register_connector, pool_stats, dispose_engines, TimedQueuePool
+from utils import get_db_engine
+
+class FakeConnector:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class TestEngineRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.db")
+
+    def tearDown(self):
+        dispose_engines()
+        shutil.rmtree(self.directory)
+
+    def test_engines_are_reused(self):
+        engine = get_db_engine(db_type="sqlite", db_name=self.path)
+        self.assertIs(get_db_engine(db_type="sqlite", db_name=self.path), engine)
+        self.assertIsInstance(engine.pool, TimedQueuePool)
+        self.assertIsNot(get_db_engine(db_type="sqlite", db_name=os.path.join(self.directory, "other.db")), engine)
+
+    def test_connector_built_once_and_closed(self):
+        built = []
+        def make_creator():
+            built.append(1)
+            return lambda: sqlite3.connect(self.path)
+        first = get_pooled_engine("creator", "sqlite://", make_creator=make_creator)
+        second = get_pooled_engine("creator", "sqlite://", make_creator=make_creator)
+        self.assertIs(first, second)
+        self.assertEqual(len(built), 1)
+
+        connector = register_connector(FakeConnector())
+        dispose_engines()
+        self.assertTrue(connector.closed)
+        self.assertEqual(db_pool._engines, {})
+
+    def test_pool_stats_record_waits_and_timeouts(self):
+        engine = get_pooled_engine("stats", f"sqlite:///{self.path}", pool_size=1, max_overflow=0, pool_timeout=0.2)
+        held = engine.connect()
+        release = threading.Timer(0.05, held.close)
+        release.start()
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy.text("SELECT 1"))
+        release.join()
+
+        stats = pool_stats(engine)
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["acquire"]["count"], 2)
+        self.assertEqual(stats["connect"]["count"], 1)
+        self.assertGreaterEqual(stats["wait"]["max_ms"], 40)
+
+        held = engine.connect()
+        with self.assertRaises(sqlalchemy.exc.TimeoutError):
+            engine.connect()
+        held.close()
+        self.assertEqual(pool_stats(engine)["timeouts"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+import shutil
+from datetime import date
+from disk_cache import DiskCache, make_cache_key
+from main import get_air_quality_data, get_response_cache_ttl, is_year_certified
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.text = ""
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, endpoint, params=None):
+        self.calls += 1
+        return FakeResponse({
+            "Header": [{"status": "Success", "url": f"{endpoint}?email={params['email']}&key={params['key']}"}],
+            "Data": [{"year": 2019}]
+        })
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_make_cache_key(self):
+        self.assertEqual(make_cache_key({"a": 1, "b": 2}), make_cache_key({"b": 2, "a": 1}))
+        self.assertNotEqual(make_cache_key({"a": 1}), make_cache_key({"a": 2}))
+
+    def test_ttl(self):
+        cache = DiskCache(self.directory, clock=self.clock)
+        cache.set("k", {"value": 1}, ttl=10)
+        self.assertEqual(cache.get("k"), {"value": 1})
+        self.clock.now += 11
+        self.assertIsNone(cache.get("k"))
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.directory, max_entries=2, clock=self.clock)
+        cache.set("a", 1)
+        self.clock.now += 1
+        cache.set("b", 2)
+        self.clock.now += 1
+        cache.get("a")  # "b" is now least recently used
+        self.clock.now += 1
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_certified_years_do_not_expire(self):
+        today = date(2025, 10, 6)
+        self.assertTrue(is_year_certified(2023, today=today))
+        self.assertTrue(is_year_certified(2024, today=today))
+        self.assertFalse(is_year_certified(2025, today=today))
+        self.assertIsNone(get_response_cache_ttl({"edate": "20241231"}, today=today))
+        self.assertIsNotNone(get_response_cache_ttl({"edate": "20251231"}, today=today))
+
+    def test_get_air_quality_data_uses_cache(self):
+        cache = DiskCache(self.directory)
+        session = FakeSession()
+        args = dict(service="annualData", by="byState", param=88101, state=6, bdate="20190101", edate="20191231", session=session, cache=cache)
+
+        first = get_air_quality_data(email="a@example.com", api_key="one", **args)
+        # different credentials, same normalized request
+        second = get_air_quality_data(email="b@example.com", api_key="two", **args)
+
+        self.assertEqual(session.calls, 1)
+        self.assertEqual(first, second)
+        self.assertNotIn("a@example.com", second["Header"][0]["url"])
+
+if __name__ == "__main__":
+    unittest.main()
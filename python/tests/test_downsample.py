@@ -0,0 +1,68 @@
+import unittest
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import AggregateCube
+from downsample import lttb, minmax, SeriesLevels, SeriesDownsampler
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class TestDownsample(unittest.TestCase):
+    def setUp(self):
+        self.x = pd.date_range("2000-01-01", periods=10000, freq="h").to_numpy()
+        self.y = np.sin(np.arange(10000) / 200.0)
+        self.y[5000] = 10.0 # a spike both methods must keep
+
+    def test_reducers(self):
+        for reduce in (lttb, minmax):
+            keep = reduce(self.x, self.y, 100)
+            self.assertLessEqual(len(keep), 100)
+            self.assertTrue(np.all(np.diff(keep) > 0))
+            self.assertEqual((keep[0], keep[-1]), (0, 9999))
+            self.assertIn(5000, keep)
+        np.testing.assert_array_equal(lttb(self.x[:50], self.y[:50], 100), np.arange(50))
+
+    def test_levels_refine_zoomed_window(self):
+        for method in ("lttb", "minmax"):
+            levels = SeriesLevels(self.x, self.y, budget=100, method=method)
+            self.assertGreater(len(levels.levels), 1)
+            x, y = levels.window()
+            self.assertLessEqual(len(x), 100)
+            # Zoomed in on 50 hours: every point in the window, plus one on either side
+            start, end = self.x[1000], self.x[1049]
+            x, y = levels.window(start, end)
+            np.testing.assert_array_equal(x, self.x[999:1051])
+        with self.assertRaises(ValueError):
+            SeriesLevels(self.x, self.y, method="mean")
+
+    def test_downsampler_caches_levels(self):
+        df = pd.read_csv(DATA_PATH)
+        df['date'] = pd.to_datetime(df['date'])
+        cube = AggregateCube(df)
+        parameter = df['parameter'].iloc[0]
+        calls = []
+
+        class Source:
+            def time_series(self, parameter, counties=None):
+                calls.append(counties)
+                return cube.time_series(parameter, counties)
+
+        downsampler = SeriesDownsampler(budget=10)
+        for counties in (None, None, ["Los Angeles"]):
+            series = downsampler.time_series(Source(), parameter, counties)
+        self.assertEqual(calls, [None]) # counties are served from the levels built for 'all'
+        self.assertEqual(set(series['county']), {"Los Angeles"})
+        self.assertLessEqual(len(series), 10)
+        full = cube.time_series(parameter, ["Los Angeles"])
+        self.assertEqual(series['date'].iloc[0], full['date'].iloc[0])
+        self.assertEqual(series['date'].iloc[-1], full['date'].iloc[-1])
+
+        # A new data version rebuilds the levels from the source
+        downsampler.time_series(Source(), parameter, None, version="v2")
+        downsampler.time_series(Source(), parameter, None, version="v2")
+        self.assertEqual(calls, [None, None])
+
+if __name__ == "__main__":
+    unittest.main()
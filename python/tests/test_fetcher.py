@@ -0,0 +1,87 @@
+import unittest
+from fetcher import RateLimiter, chunk_params, split_date_range_by_year, plan_requests, fetch_batch
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.text = ""
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        self.calls.append((endpoint, params))
+        return FakeResponse({
+            "Header": [{"url": f"{endpoint}?email={params['email']}&key={params['key']}"}],
+            "Data": [{"param": params["param"]}]
+        })
+
+class TestFetcher(unittest.TestCase):
+    def test_chunk_params(self):
+        self.assertEqual(chunk_params("88101,44201"), [["88101", "44201"]])
+        chunks = chunk_params([14129, 42101, 42401, 42602, 44201, 81102, 85129, 88101])
+        self.assertEqual([len(c) for c in chunks], [5, 3])
+
+    def test_split_date_range_by_year(self):
+        self.assertEqual(
+            split_date_range_by_year("20190615", "20210301"),
+            [("20190615", "20191231"), ("20200101", "20201231"), ("20210101", "20210301")]
+        )
+        with self.assertRaises(ValueError):
+            split_date_range_by_year("20200101", "20190101")
+
+    def test_plan_requests(self):
+        plan = plan_requests("quarterlyData", "byState", ["6", "32"], list(range(88101, 88108)), "20190101", "20201231")
+        # 2 states x 2 years x 2 parameter chunks
+        self.assertEqual(len(plan), 8)
+        self.assertEqual(plan[0]["state"], "06")
+        self.assertTrue(all(p["bdate"][:4] == p["edate"][:4] for p in plan))
+
+        with self.assertRaises(ValueError):
+            plan_requests("quarterlyData", "byCounty", ["06"], [88101], "20190101", "20191231")
+        plan = plan_requests("quarterlyData", "byCounty", ["06"], [88101], "20190101", "20191231", counties={"06": ["1", "73"]})
+        self.assertEqual([p["county"] for p in plan], ["001", "073"])
+
+    def test_rate_limiter_spacing(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=10, per=60.0, min_interval=5.0, clock=clock, sleep=clock.sleep)
+        starts = []
+        for _ in range(12):
+            with limiter:
+                starts.append(clock.now)
+                clock.now += 0.5  # request duration
+        gaps = [b - a for a, b in zip(starts, starts[1:])]
+        self.assertTrue(all(gap >= 6.0 - 1e-9 for gap in gaps))
+        # never more than 10 requests start within any 60 second window
+        self.assertTrue(all(sum(1 for t in starts if s <= t < s + 60) <= 10 for s in starts))
+
+    def test_fetch_batch(self):
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+        session = FakeSession()
+        plan = plan_requests("annualData", "byState", ["06"], [88101], "20190101", "20201231")
+        results = fetch_batch(plan, email="test@example.com", api_key="12345", session=session, limiter=limiter)
+
+        self.assertEqual(len(session.calls), 2)
+        self.assertEqual([args["bdate"] for args, _ in results], ["20190101", "20200101"])
+        self.assertEqual(results[0][1]["Header"][0]["url"].count("*****"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import tempfile
+import shutil
+import pandas as pd
+import plotly.graph_objects as go
+from figure_cache import FigureCache, get_data_version
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_memoize(self):
+        cache = FigureCache("v1", directory=self.directory)
+        calls = []
+
+        @cache.memoize("time_series")
+        def update(pollutant, counties):
+            calls.append((pollutant, counties))
+            return go.Figure(go.Scatter(x=[1, 2], y=[3, 4]), layout={"title": pollutant})
+
+        first = update("Ozone", ["Kern", "Alameda"])
+        second = update("Ozone", ["Alameda", "Kern"])
+        update("Ozone", ["all"])
+        update("Ozone", None)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(first, second)
+        self.assertEqual(first["layout"]["title"]["text"], "Ozone")
+
+        # A new data version misses the old entries
+        cache.invalidate(data_version="v2")
+        update("Ozone", ["Kern", "Alameda"])
+        self.assertEqual(len(calls), 3)
+
+    def test_memoize_extra_arguments(self):
+        cache = FigureCache("v1", directory=self.directory)
+        calls = []
+
+        @cache.memoize("time_series")
+        def update(pollutant, counties, window=None):
+            calls.append(window)
+            return go.Figure(go.Scatter(x=[1, 2], y=[3, 4]))
+
+        update("Ozone", None, ["2020-01-01", "2021-01-01"])
+        update("Ozone", None, ["2020-01-01", "2021-01-01"])
+        update("Ozone", None, ["2022-01-01", "2023-01-01"])
+        self.assertEqual(calls, [["2020-01-01", "2021-01-01"], ["2022-01-01", "2023-01-01"]])
+
+    def test_get_data_version(self):
+        df = pd.DataFrame({"county": ["Kern", "Fresno"], "arithmetic_mean": [1.0, 2.0]})
+        self.assertEqual(get_data_version(df), get_data_version(df.copy()))
+        changed = df.assign(arithmetic_mean=[1.0, 2.5])
+        self.assertNotEqual(get_data_version(df), get_data_version(changed))
+
+if __name__ == "__main__":
+    unittest.main()
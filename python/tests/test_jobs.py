@@ -0,0 +1,97 @@
+import unittest
+import asyncio
+import tempfile
+import shutil
+import time
+import os
+from jobs import JobQueue, JobRunner, QUEUED, RUNNING, DONE, FAILED
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.now = 1000.0
+        self.queue = JobQueue(os.path.join(self.directory, "jobs.sqlite"), stale_after=60, retention=600, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_submit_claim_finish(self):
+        self.queue.submit("a", {"prompt": "Plot ozone"})
+        self.queue.submit("a", {"prompt": "Plot ozone"})  # coalesced with the queued job
+        self.assertEqual(self.queue.get("a")["status"], QUEUED)
+
+        self.assertEqual(self.queue.claim(), ("a", {"prompt": "Plot ozone"}))
+        self.assertIsNone(self.queue.claim())
+        self.queue.report("a", "Waiting for Gemini")
+        self.assertEqual(self.queue.get("a"), {"status": RUNNING, "stage": "Waiting for Gemini", "error": None})
+
+        self.queue.finish("a")
+        self.assertEqual(self.queue.get("a")["status"], DONE)
+        self.assertIsNone(self.queue.get("missing"))
+
+    def test_failed_jobs_can_be_resubmitted(self):
+        self.queue.submit("a", {})
+        self.queue.claim()
+        self.queue.fail("a", "timed out")
+        self.assertEqual(self.queue.get("a")["error"], "timed out")
+        self.queue.submit("a", {})
+        self.assertEqual(self.queue.get("a"), {"status": QUEUED, "stage": "Queued", "error": None})
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        self.queue.submit("a", {})
+        self.queue.claim()
+        self.now += 30
+        self.assertIsNone(self.queue.claim())
+        self.now += 60
+        self.assertEqual(self.queue.claim(), ("a", {}))
+
+    def test_purge(self):
+        self.queue.submit("a", {})
+        self.queue.claim()
+        self.queue.finish("a")
+        self.now += 601
+        self.queue.purge()
+        self.assertIsNone(self.queue.get("a"))
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.queue = JobQueue(os.path.join(self.directory, "jobs.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def wait_for(self, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.queue.get(job_id)
+            if job["status"] in (DONE, FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish")
+
+    def test_runs_jobs_concurrently(self):
+        results = {}
+
+        async def handler(payload, report):
+            report("Working")
+            await asyncio.sleep(0.5)
+            if payload["fail"]:
+                raise ValueError("bad request")
+            results[payload["n"]] = True
+
+        for n in range(4):
+            self.queue.submit(f"job-{n}", {"n": n, "fail": n == 3})
+        runner = JobRunner(self.queue, handler, concurrency=4, poll_interval=0.01).start()
+        start = time.time()
+        try:
+            jobs = [self.wait_for(f"job-{n}") for n in range(4)]
+        finally:
+            runner.stop()
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual([job["status"] for job in jobs], [DONE, DONE, DONE, FAILED])
+        self.assertEqual(jobs[3]["error"], "bad request")
+        self.assertEqual(sorted(results), [0, 1, 2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import tempfile
+import shutil
+from llm_cache import LLMResponseCache, normalize_prompt
+
+class TestLLMResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = LLMResponseCache("context-v1", directory=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  Plot  Ozone\nover time "), "plot ozone over time")
+
+    def test_cached_by_normalized_prompt_and_language(self):
+        result = {"code": "fig = px.line(cleaned_df)", "figure": {"data": []}}
+        self.cache.set("Plot ozone", "Python", result)
+        self.assertEqual(self.cache.get("plot   OZONE", "Python"), result)
+        self.assertEqual(self.cache.key("plot   OZONE", "Python"), self.cache.key("Plot ozone", "Python"))
+        self.assertIsNone(self.cache.get("Plot ozone", "R"))
+
+    def test_context_version_is_part_of_the_key(self):
+        self.cache.set("Plot ozone", "Python", {"code": None})
+        other = LLMResponseCache("context-v2", directory=self.directory)
+        self.assertIsNone(other.get("Plot ozone", "Python"))
+
+if __name__ == "__main__":
+    unittest.main()
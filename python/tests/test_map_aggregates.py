@@ -0,0 +1,44 @@
+import unittest
+
+import pandas as pd
+
+from map_aggregates import site_table, grid_aggregate, fit_view
+
+class TestMapAggregates(unittest.TestCase):
+    def setUp(self):
+        self.rows = pd.DataFrame({
+            'county': ["Kern", "Kern", "Kern", "Kern", "Inyo"],
+            'local_site_name': ["A", "A", "B", "B", "C"],
+            'latitude': [35.0, 35.0, 35.001, 35.001, 37.0],
+            'longitude': [-119.0, -119.0, -119.001, -119.001, -118.0],
+            'arithmetic_mean': [1.0, 3.0, 4.0, 4.0, 10.0],
+            'date': pd.to_datetime(["2020-03-31", "2021-03-31", "2020-06-30", "2020-09-30", "2022-12-31"]),
+        })
+
+    def test_site_table(self):
+        sites = site_table(self.rows)
+        self.assertEqual(sites['local_site_name'].tolist(), ["C", "A", "B"])
+        site_a = sites.set_index('local_site_name').loc["A"]
+        self.assertEqual((site_a['arithmetic_mean'], site_a['maximum'], site_a['observations']), (2.0, 3.0, 2))
+        self.assertEqual(site_a['last_date'], pd.Timestamp("2021-03-31"))
+
+    def test_grid_aggregate(self):
+        sites = site_table(self.rows)
+        center, zoom = fit_view(sites['latitude'], sites['longitude'])
+        self.assertTrue(35 < center['lat'] < 37)
+        self.assertGreater(zoom, 0)
+
+        grid = grid_aggregate(sites, zoom).set_index('local_site_name')
+        # A and B are about 100 m apart and share a cell; C is far away
+        self.assertEqual(sorted(grid.index), ["2 sites", "C"])
+        merged = grid.loc["2 sites"]
+        self.assertEqual(merged['sites'], 2)
+        self.assertEqual(merged['observations'], 4)
+        self.assertAlmostEqual(merged['arithmetic_mean'], 3.0) # weighted by observations
+        self.assertEqual(merged['maximum'], 4.0)
+        self.assertEqual(merged['first_date'], pd.Timestamp("2020-03-31"))
+        # Zoomed in far enough, every site has its own cell
+        self.assertEqual(len(grid_aggregate(sites, 18)), 3)
+
+if __name__ == "__main__":
+    unittest.main()
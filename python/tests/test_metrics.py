@@ -0,0 +1,79 @@
+import unittest
+import threading
+
+from flask import Flask
+
+from metrics import Metrics, SamplingProfiler, callback_context, phase, instrument_server
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        metrics = Metrics()
+        metrics.describe("requests_total", "Requests.")
+        metrics.inc("requests_total", path="/")
+        metrics.inc("requests_total", 2, path="/")
+        metrics.observe("latency_seconds", 0.02, buckets=(0.01, 0.1), route='say "hi"')
+        metrics.observe("latency_seconds", 5, buckets=(0.01, 0.1), route='say "hi"')
+        metrics.add_collector(lambda: [("open_connections", {"pool": "a"}, 3)])
+        lines = metrics.render().splitlines()
+        self.assertIn("# HELP requests_total Requests.", lines)
+        self.assertIn('requests_total{path="/"} 3', lines)
+        self.assertIn('latency_seconds_bucket{route="say \\"hi\\"",le="0.01"} 0', lines)
+        self.assertIn('latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_count{route="say \\"hi\\""} 2', lines)
+        self.assertIn("# TYPE open_connections gauge", lines)
+        self.assertIn('open_connections{pool="a"} 3', lines)
+
+    def test_phases_and_server(self):
+        metrics = Metrics()
+        with callback_context("map"):
+            with phase("filter", metrics=metrics):
+                pass
+        with phase("llm", "graph_job", metrics=metrics):
+            pass
+        self.assertEqual(
+            sorted(labels for name, labels in metrics.histograms),
+            [(("callback", "graph_job"), ("phase", "llm")), (("callback", "map"), ("phase", "filter"))]
+        )
+
+        server = Flask(__name__)
+
+        @server.route("/_dash-update-component", methods=["POST"])
+        def update():
+            return {"response": "x" * 2000}
+
+        instrument_server(server, metrics, outputs=lambda: {"map-plot.figure": None})
+        client = server.test_client()
+        client.post("/_dash-update-component", json={"output": "map-plot.figure"})
+        for i in range(3):
+            client.post("/_dash-update-component", json={"output": f"made-up-{i}.figure"})
+        text = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('dashboard_request_seconds_count{endpoint="callback",status="200"} 3', text)
+        self.assertNotIn("made-up", text)
+        self.assertIn('dashboard_request_seconds_count{endpoint="map-plot.figure",status="200"} 1', text)
+        self.assertIn('dashboard_response_bytes_bucket{endpoint="map-plot.figure",le="1024"} 0', text)
+        self.assertIn('dashboard_response_bytes_count{endpoint="map-plot.figure"} 1', text)
+
+    def test_sampling_profiler(self):
+        profiler = SamplingProfiler()
+        stop = threading.Event()
+
+        def busy_worker():
+            while not stop.is_set():
+                sum(range(1000))
+
+        thread = threading.Thread(target=busy_worker)
+        thread.start()
+        try:
+            for _ in range(5):
+                profiler.sample()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(profiler.samples, 5)
+        self.assertIn("busy_worker", profiler.collapsed())
+        profiler.reset()
+        self.assertEqual(profiler.collapsed(), "\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import pandas as pd
+
+from metrics import Metrics
+from prompt_context import PromptContext, schema_summary, estimate_tokens, record_usage
+
+def quarterly_frame(counties=5):
+    names = [f"County {i}" for i in range(counties)]
+    dates = pd.date_range("2019-03-31", periods=8, freq="QE")
+    return pd.DataFrame({
+        "county": pd.Categorical([name for name in names for _ in dates]),
+        "date": list(dates) * counties,
+        "quarter": [date.quarter for date in dates] * counties,
+        "parameter": "Ozone",
+        "arithmetic_mean": [0.0123456789 * (i + 1) for i in range(counties * len(dates))],
+    })
+
+class TestPromptContext(unittest.TestCase):
+    def test_schema_summary(self):
+        text = schema_summary(quarterly_frame())
+        lines = text.splitlines()
+        self.assertEqual(lines[0], "It has 40 rows and 5 columns:")
+        self.assertIn('- county (category): ["County 0", "County 1", "County 2", "County 3", "County 4"]', lines)
+        self.assertIn("- date (datetime64[ns]): 2019-03-31 to 2020-12-31, 8 distinct", lines)
+        self.assertIn("- quarter (int64): 1 to 4, 4 distinct", lines)
+        self.assertIn('- parameter (object): ["Ozone"]', lines)
+        self.assertIn("County 0,2019-03-31,1,Ozone,0.01235", lines) # sample rows with rounded floats
+
+    def test_budget(self):
+        df = quarterly_frame(counties=200)
+        full = schema_summary(df, budget=100000)
+        self.assertIn("Sample rows", full)
+        self.assertEqual(full.splitlines()[1].count('"County'), 50) # the 50 most common values
+        short = schema_summary(df, budget=150)
+        self.assertLessEqual(estimate_tokens(short), 150)
+        self.assertIn("- county (category): 200 distinct, most common", short)
+        self.assertNotIn("Sample rows", short)
+        self.assertLessEqual(estimate_tokens(schema_summary(df, budget=10)), 10)
+
+    def test_prompts_built_once(self):
+        context = PromptContext(quarterly_frame())
+        prompt = context.system_prompt("R")
+        self.assertIs(context.system_prompt("R"), prompt)
+        self.assertIn("named cleaned_df. It has 40 rows", prompt)
+        self.assertIn("provide R code", prompt)
+        self.assertNotIn("provide R code", context.system_prompt(None))
+
+        template = context.template("Python")
+        self.assertIs(context.template("Python"), template)
+        self.assertEqual(template.input_variables, ["messages"])
+        messages = template.invoke({"messages": [("human", "plot ozone")]}).to_messages()
+        self.assertEqual(messages[0].content, context.system_prompt("Python"))
+        self.assertEqual(messages[1].content, "plot ozone")
+        self.assertEqual(context.prompt_tokens("Python", "plot ozone"), estimate_tokens(context.system_prompt("Python")) + 3)
+
+    def test_record_usage(self):
+        class Response:
+            usage_metadata = {"input_tokens": 420, "output_tokens": 180, "total_tokens": 600}
+
+        metrics = Metrics()
+        record_usage("R", 400, Response(), metrics=metrics)
+        record_usage("Python", 300, metrics=metrics)
+        lines = metrics.render().splitlines()
+        self.assertIn('dashboard_llm_tokens_total{kind="input",language="R"} 420', lines)
+        self.assertIn('dashboard_llm_tokens_total{kind="output",language="R"} 180', lines)
+        self.assertIn('dashboard_prompt_tokens_bucket{language="Python",le="500"} 1', lines)
+        self.assertIn('dashboard_prompt_tokens_count{language="R"} 1', lines)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+from bulk_load import bulk_load_csv
+from cube import AggregateCube
+from queries import AirQualityQueries
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class TestAirQualityQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(cls.directory, 'test.db')}")
+        bulk_load_csv(cls.engine, "air_quality", DATA_PATH)
+        cls.queries = AirQualityQueries(cls.engine, "air_quality")
+
+        df = pd.read_csv(DATA_PATH)
+        df['date'] = pd.to_datetime(df['date'])
+        cls.df = df.dropna(subset=["arithmetic_mean"])
+        cls.cube = AggregateCube(cls.df)
+        cls.parameter = cls.df['parameter'].value_counts().index[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        shutil.rmtree(cls.directory)
+
+    def test_time_series_matches_cube(self):
+        for counties in (None, ["Los Angeles", "Riverside"]):
+            expected = self.cube.time_series(self.parameter, counties)[['date', 'county', 'arithmetic_mean']]
+            expected = expected.sort_values(['county', 'date'], ignore_index=True)
+            result = self.queries.time_series(self.parameter, counties)
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+        in_2019_h1 = self.queries.time_series(self.parameter, start="2019-01-01", end="2019-06-30")
+        self.assertTrue(in_2019_h1['date'].between("2019-01-01", "2019-06-30").all())
+        self.assertFalse(in_2019_h1.empty)
+
+    def test_histogram_matches_cube(self):
+        for counties in (None, ["Los Angeles"]):
+            counts, edges = self.queries.histogram(self.parameter, counties)
+            expected_counts, expected_edges = self.cube.histogram(self.parameter, counties)
+            np.testing.assert_allclose(edges, expected_edges)
+            np.testing.assert_array_equal(counts, expected_counts)
+        counts, _ = self.queries.histogram("No such pollutant")
+        self.assertEqual(counts.sum(), 0)
+
+    def test_histogram_from_county_counts(self):
+        index, county_counts = self.queries.county_histograms(self.parameter)
+        selected = self.df[self.df['parameter'] == self.parameter]
+        self.assertEqual(sorted(index), sorted(selected['county'].unique()))
+        self.assertEqual(county_counts.sum(), len(selected))
+
+        counties = ["Los Angeles", "Riverside", "Nowhere"]
+        counts, edges = self.queries.histogram(self.parameter, counties)
+        expected, _ = np.histogram(selected.loc[selected['county'].isin(counties), 'arithmetic_mean'], bins=edges)
+        np.testing.assert_array_equal(counts, expected)
+
+        # A date range is counted by the database
+        counts, edges = self.queries.histogram(self.parameter, None, start="2021-01-01", end="2022-12-31")
+        in_range = selected[selected['date'].between("2021-01-01", "2022-12-31")]
+        expected, _ = np.histogram(in_range['arithmetic_mean'], bins=edges)
+        np.testing.assert_array_equal(counts, expected)
+
+    def test_histogram_with_null_county(self):
+        path = os.path.join(self.directory, "null_county.csv")
+        df = self.df[self.df['parameter'] == self.parameter].copy()
+        df['county'] = df['county'].astype(object)
+        df.loc[df.index[:3], 'county'] = None
+        df.to_csv(path, index=False)
+        bulk_load_csv(self.engine, "null_county", path)
+        queries = AirQualityQueries(self.engine, "null_county")
+
+        counts, edges = queries.histogram(self.parameter)
+        np.testing.assert_array_equal(counts, np.histogram(df['arithmetic_mean'], bins=edges)[0])
+        counts, edges = queries.histogram(self.parameter, ["Los Angeles"])
+        expected = df.loc[df['county'] == "Los Angeles", 'arithmetic_mean']
+        np.testing.assert_array_equal(counts, np.histogram(expected, bins=edges)[0])
+
+    def test_data_version_is_read_again_after_ttl(self):
+        path = os.path.join(self.directory, "refreshed.csv")
+        self.df[self.df['parameter'] == self.parameter].to_csv(path, index=False)
+        bulk_load_csv(self.engine, "refreshed", path)
+        now = [0.0]
+        queries = AirQualityQueries(self.engine, "refreshed", version_ttl=60, clock=lambda: now[0])
+
+        version = queries.data_version()
+        with self.engine.begin() as conn:
+            conn.execute(sqlalchemy.text("UPDATE refreshed SET arithmetic_mean = arithmetic_mean + 1"))
+        now[0] = 59
+        self.assertEqual(queries.data_version(), version)
+        now[0] = 60
+        self.assertNotEqual(queries.data_version(), version)
+
+    def test_cached_lookups_follow_the_data_version(self):
+        path = os.path.join(self.directory, "refreshed_lookups.csv")
+        self.df[self.df['parameter'] == self.parameter].to_csv(path, index=False)
+        bulk_load_csv(self.engine, "refreshed_lookups", path)
+        now = [0.0]
+        queries = AirQualityQueries(self.engine, "refreshed_lookups", version_ttl=60, clock=lambda: now[0])
+
+        counts, _ = queries.histogram(self.parameter)
+        sites = queries.map_sites(self.parameter)
+        with self.engine.begin() as conn:
+            conn.execute(sqlalchemy.text("DELETE FROM refreshed_lookups WHERE county = 'Los Angeles'"))
+        # Kept until the version is read again
+        np.testing.assert_array_equal(queries.histogram(self.parameter)[0], counts)
+        now[0] = 60
+        remaining = self.df[(self.df['parameter'] == self.parameter) & (self.df['county'] != "Los Angeles")]
+        self.assertEqual(queries.histogram(self.parameter)[0].sum(), len(remaining))
+        self.assertLess(len(queries.map_sites(self.parameter)), len(sites))
+        self.assertTrue(queries.map_sites(self.parameter, ["Los Angeles"]).empty)
+
+    def test_quarterly_and_grouped(self):
+        keys = ['county', 'date', 'year', 'quarter', 'parameter', 'parameter_code']
+        expected = self.cube.quarterly_df().sort_values(keys, ignore_index=True)
+        result = self.queries.quarterly_df()
+        self.assertEqual(list(result.columns), list(expected.columns))
+        pd.testing.assert_frame_equal(result[keys + ['arithmetic_mean']], expected[keys + ['arithmetic_mean']], check_dtype=False)
+
+        head = self.queries.grouped_df(limit=5)
+        expected_head = self.cube.grouped_df(limit=5)
+        pd.testing.assert_frame_equal(
+            head[['date', 'county', 'parameter', 'arithmetic_mean']],
+            expected_head[['date', 'county', 'parameter', 'arithmetic_mean']],
+            check_dtype=False
+        )
+
+    def test_map_rows_and_indexes(self):
+        rows = self.queries.map_rows(self.parameter, ["Los Angeles"])
+        expected = self.df[(self.df['parameter'] == self.parameter) & (self.df['county'] == "Los Angeles")]
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual(list(rows.columns), ['latitude', 'longitude', 'arithmetic_mean', 'local_site_name', 'date'])
+
+        # Indexes already created by the bulk load are left alone
+        self.assertEqual(self.queries.ensure_indexes(), [])
+        self.assertNotEqual(self.queries.data_version(), "")
+
+    def test_map_sites_match_cube(self):
+        for counties in (None, ["Los Angeles"]):
+            expected = self.cube.map_sites(self.parameter, counties)
+            expected['county'] = expected['county'].astype(str)
+            result = self.queries.map_sites(self.parameter, counties)
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        self.assertEqual(self.queries.map_count(self.parameter, ["Los Angeles"]), len(self.queries.map_rows(self.parameter, ["Los Angeles"])))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from sandbox import SandboxPool, SandboxError
+
+class TestSandboxPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        df = pd.DataFrame({
+            "county": ["Kern", "Fresno", "Kern"],
+            "arithmetic_mean": [1.0, 2.0, 3.0],
+        })
+        os.environ["SANDBOX_TEST_SECRET"] = "secret"
+        cls.pool = SandboxPool(df, size=1, timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        os.environ.pop("SANDBOX_TEST_SECRET", None)
+
+    def test_returns_figure_json(self):
+        fig_json = self.pool.run("fig = px.bar(cleaned_df, x='county', y='arithmetic_mean')")
+        figure = json.loads(fig_json)
+        self.assertEqual(figure["data"][0]["type"], "bar")
+        self.assertIsNone(self.pool.run("x = len(cleaned_df)"))
+
+    def test_changes_to_dataframe_do_not_persist(self):
+        self.pool.run("cleaned_df.loc[0, 'arithmetic_mean'] = 100.0\ncleaned_df.drop(columns=['county'], inplace=True)")
+        fig_json = self.pool.run("fig = go.Figure(go.Bar(x=cleaned_df['county'], y=cleaned_df['arithmetic_mean'].tolist()))")
+        self.assertEqual(json.loads(fig_json)["data"][0]["y"], [1.0, 2.0, 3.0])
+
+    def test_app_environment_is_not_passed(self):
+        self.assertIsNone(self.pool.run("import os\nassert 'SANDBOX_TEST_SECRET' not in os.environ"))
+
+    def test_errors_and_timeouts(self):
+        with self.assertRaisesRegex(SandboxError, "KeyError"):
+            self.pool.run("fig = cleaned_df['missing']")
+        with self.assertRaisesRegex(SandboxError, "timed out"):
+            self.pool.run("while True:\n    pass", timeout=1)
+        # The timed-out worker was replaced
+        self.assertIsNotNone(self.pool.run("fig = px.line(cleaned_df, y='arithmetic_mean')"))
+
+class TestSandboxLimits(unittest.TestCase):
+    def test_cpu_limit_is_per_snippet(self):
+        pool = SandboxPool(pd.DataFrame({"x": [1]}), size=1, timeout=2)
+        try:
+            # 0.8 s of CPU each: together over the 2 s limit, each well under it
+            busy = "import time\nstart = time.process_time()\nwhile time.process_time() - start < 0.8:\n    pass"
+            for _ in range(4):
+                self.assertIsNone(pool.run(busy))
+        finally:
+            pool.close()
+
+    def test_zero_timeout_means_no_limit(self):
+        pool = SandboxPool(pd.DataFrame({"x": [1]}), size=1, timeout=0)
+        try:
+            self.assertIsNone(pool.run("import time\ntime.sleep(0.5)"))
+        finally:
+            pool.close()
+
+    def test_recycling_counts_tasks_per_worker(self):
+        pool = SandboxPool(pd.DataFrame({"x": [1]}), size=1, timeout=5, max_tasks=2)
+        pid = "import os\nfig = go.Figure(layout_title_text=str(os.getpid()))"
+        try:
+            with self.assertRaisesRegex(SandboxError, "timed out"):
+                pool.run("while True:\n    pass", timeout=1)
+            # The failed snippet doesn't count against the replacement, which runs max_tasks snippets
+            pids = [json.loads(pool.run(pid))["layout"]["title"]["text"] for _ in range(3)]
+            self.assertEqual(pids[0], pids[1])
+            self.assertNotEqual(pids[1], pids[2])
+        finally:
+            pool.close()
+
+    def test_replacement_starts_in_the_background(self):
+        pool = SandboxPool(pd.DataFrame({"x": [1]}), size=1, timeout=5)
+        spawn = pool._spawn
+
+        def slow_spawn():
+            time.sleep(3)
+            return spawn()
+
+        try:
+            with mock.patch.object(pool, "_spawn", slow_spawn):
+                started = time.monotonic()
+                with self.assertRaisesRegex(SandboxError, "timed out"):
+                    pool.run("while True:\n    pass", timeout=0.5)
+                self.assertLess(time.monotonic() - started, 2)
+                # The next run waits for the replacement
+                self.assertIsNone(pool.run("x = 1"))
+        finally:
+            pool.close()
+
+    def test_worker_that_never_connects(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as script:
+            script.write("import sys\nsys.exit(1)\n")
+        try:
+            with mock.patch("sandbox.WORKER_SCRIPT", script.name):
+                pool = SandboxPool(pd.DataFrame({"x": [1]}), size=1, startup_timeout=5)
+                try:
+                    with self.assertRaisesRegex(SandboxError, "failed to start"):
+                        pool.run("fig = None")
+                    with self.assertRaisesRegex(SandboxError, "failed to start"):
+                        pool.run("fig = None")
+                finally:
+                    pool.close()
+        finally:
+            os.remove(script.name)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema, get_schema, fields_from_metadata, spec_services
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class TestSchema(unittest.TestCase):
+    def test_combined_dataset(self):
+        raw = pd.read_csv(DATA_PATH)
+        df = apply_schema(raw, "quarterlyData")
+        self.assertEqual(df["state_code"].iloc[0], "06")
+        self.assertEqual(df["county_code"].iloc[0], "073")
+        self.assertEqual(df["monitoring_agency_code"].iloc[0], "0942")
+        for column in ("parameter", "county", "units_of_measure", "sample_duration", "monitoring_agency", "cbsa", "url"):
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype, column)
+        self.assertEqual(df["arithmetic_mean"].dtype, np.float64)
+        self.assertEqual(df["observation_percent"].dtype, np.float32)
+        self.assertEqual(df["latitude"].dtype, np.float64)
+        self.assertEqual(df["year"].dtype, np.int16)
+        self.assertEqual(df["quarter"].dtype, np.int8)
+        self.assertEqual(df["parameter_code"].dtype, np.int32)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["date"]))
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["date_of_last_change"]))
+
+        # Same values, less memory
+        np.testing.assert_allclose(df["observation_percent"], raw["observation_percent"], rtol=1e-6)
+        self.assertEqual(df["parameter"].astype(str).tolist(), raw["parameter"].tolist())
+        self.assertLess(df.memory_usage(deep=True).sum(), raw.memory_usage(deep=True).sum() / 2)
+
+    def test_integers_with_gaps_or_overflow(self):
+        df = apply_schema(pd.DataFrame({
+            "observation_count": [1.0, np.nan],
+            "quarter": [1, 4],
+            "poc": [1, 100000],
+            "notes": ["kept", "as is"],
+        }))
+        self.assertEqual(df["observation_count"].dtype, np.float32)
+        self.assertEqual(df["quarter"].dtype, np.int8)
+        self.assertEqual(df["poc"].dtype, np.float32)
+        self.assertEqual(df["notes"].dtype, object)
+
+    def test_service_schemas(self):
+        self.assertIn("sampleData", spec_services())
+        self.assertEqual(get_schema("dailyData")["date_local"], "datetime")
+        self.assertNotIn("quarter", get_schema("annualData"))
+        with self.assertRaises(ValueError):
+            get_schema("qaBlanks")
+        with self.assertRaises(ValueError):
+            get_schema("noSuchService")
+        fields = fields_from_metadata({"Data": [{"field_name": "sample_measurement", "field_description": "..."}, {"field_name": "unknown"}]})
+        self.assertEqual(get_schema("qaBlanks", fields)["sample_measurement"], "float64")
+
+if __name__ == "__main__":
+    unittest.main()
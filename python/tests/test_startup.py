@@ -0,0 +1,39 @@
+import unittest
+import threading
+import time
+from startup import StartupTimer, LazyValue
+
+class TestStartup(unittest.TestCase):
+    def test_timer(self):
+        now = [10.0]
+        timer = StartupTimer(clock=lambda: now[0])
+        now[0] = 11.5
+        timer.mark("imports")
+        now[0] = 12.0
+        timer.mark("imports")  # only the first time counts
+        with timer.measure("load_data"):
+            now[0] = 14.0
+        self.assertEqual(timer.report(), {"milestones": {"imports": 1.5}, "durations": {"load_data": 2.0}})
+
+    def test_lazy_value_builds_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"rows": 3}
+
+        value = LazyValue(build)
+        self.assertFalse(value.loaded)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(value.get())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(value.loaded)
+        self.assertTrue(all(r is results[0] for r in results))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import tempfile
+import shutil
+from datetime import date
+
+import pandas as pd
+import sqlalchemy
+
+from fetcher import RateLimiter
+from sync import sync_incremental, load_sync_state, get_sync_key, merge_ranges
+from utils import initialize_db_data
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "combined_data_20251006.csv")
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.text = ""
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        self.calls.append(params)
+        return FakeResponse({
+            "Header": [{"status": "Success", "request_time": "2025-10-07T00:00:00-04:00",
+                        "url": f"{endpoint}?email=a&key=b", "rows": len(self.records)}],
+            "Data": self.records
+        })
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(self.directory, 'test.db')}")
+        self.state_path = os.path.join(self.directory, "sync_state.json")
+        initialize_db_data(self.engine, sqlalchemy.inspect, "air_quality", DATA_PATH, "sqlite")
+        self.limiter = RateLimiter(min_interval=0, rate=1e9)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_sync_upserts_changed_rows(self):
+        source = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+        changed = source.iloc[0].to_dict()
+        changed.update(arithmetic_mean="0.5", date_of_last_change="2025-10-01")
+        new = dict(changed, quarter="4", year="2025")
+        for record in (changed, new):
+            for column in ("status", "request_time", "url", "rows", "date"):
+                record.pop(column)
+        session = FakeSession([changed, new])
+
+        total = sync_incremental(
+            self.engine, "air_quality", states=["06"], params=[14129], bdate="20250101", edate="20251231",
+            email="test@example.com", api_key="12345", state_path=self.state_path, session=session, limiter=self.limiter, today=date(2025, 10, 7)
+        )
+        self.assertEqual(total, 2)
+        table = pd.read_sql("SELECT * FROM air_quality", self.engine)
+        self.assertEqual(len(table), len(source) + 1)
+        updated = table[(table["site_number"] == int(changed["site_number"])) & (table["year"] == int(changed["year"]))
+                        & (table["quarter"] == int(changed["quarter"])) & (table["parameter_code"] == 14129)
+                        & (table["poc"] == int(changed["poc"]))]
+        self.assertEqual(updated["arithmetic_mean"].tolist(), [0.5])
+
+        # The first run is a full pull; the next one only asks for changes since the mark
+        self.assertNotIn("cbdate", session.calls[0])
+        key = get_sync_key("quarterlyData", 14129, "06")
+        self.assertEqual(load_sync_state(self.state_path)[key], {"changed_since": "2025-10-01", "bdate": "20250101", "edate": "20251231"})
+        sync_incremental(
+            self.engine, "air_quality", states=["06"], params=[14129], bdate="20250101", edate="20251231",
+            email="test@example.com", api_key="12345", state_path=self.state_path, session=FakeSession([]), limiter=self.limiter, today=date(2025, 10, 8)
+        )
+        self.assertEqual(len(pd.read_sql("SELECT * FROM air_quality", self.engine)), len(source) + 1)
+
+        # Widening bdate pulls the years before the covered range in full
+        session = FakeSession([])
+        sync_incremental(
+            self.engine, "air_quality", states=["06"], params=[14129], bdate="20230101", edate="20251231",
+            email="test@example.com", api_key="12345", state_path=self.state_path, session=session, limiter=self.limiter, today=date(2025, 10, 9)
+        )
+        self.assertEqual([(call["bdate"], "cbdate" in call) for call in session.calls],
+                         [("20230101", False), ("20240101", False), ("20250101", True)])
+        self.assertEqual(load_sync_state(self.state_path)[key], {"changed_since": "2025-10-01", "bdate": "20230101", "edate": "20251231"})
+
+    def test_merge_ranges(self):
+        self.assertEqual(merge_ranges(None, "20250101", "20251231"), ("20250101", "20251231"))
+        self.assertEqual(merge_ranges(("20240101", "20241231"), "20250101", "20251231"), ("20240101", "20251231"))
+        self.assertEqual(merge_ranges(("20200101", "20201231"), "20250101", "20251231"), ("20250101", "20251231"))
+
+if __name__ == "__main__":
+    unittest.main()
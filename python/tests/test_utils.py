@@ -1,7 +1,10 @@
 import unittest
 import json
 import os
-from utils import mask_api_key_and_email, format_date_to_yyyymmdd, save_json_to_file, load_json_to_dataframe
+import shutil
+import tempfile
+import pandas as pd
+from utils import mask_api_key_and_email, format_date_to_yyyymmdd, save_json_to_file, load_json_to_dataframe, iter_json_array, iter_record_batches, save_parquet_dataset, load_air_quality_df, filter_df, FilterIndex
 
 class TestUtils(unittest.TestCase):
     def test_mask_api_key_and_email(self):
@@ -57,5 +60,67 @@ class TestUtils(unittest.TestCase):
         self.assertListEqual(list(df.columns), ["column1", "column2"])
         os.remove(file_path)  # Clean up the test file
 
+    def test_iter_json_array(self):
+        data = {
+            "Header": [{"status": "Success", "rows": 3}],
+            "Data": [
+                {"column1": "value1", "column2": 1.5},
+                {"column1": "va]ue,\"2\"", "column2": -20},
+                {"column1": None, "column2": 12345678}
+            ]
+        }
+        file_path = "test.json"
+        save_json_to_file(data, file_path)
+
+        # A tiny chunk size forces values to span buffer boundaries
+        self.assertEqual(list(iter_json_array(file_path, key="Data", chunk_size=3)), data["Data"])
+        self.assertEqual(list(iter_json_array(file_path, key="Header", chunk_size=3)), data["Header"])
+        self.assertEqual(list(iter_json_array(file_path, key="Missing")), [])
+
+        batches = list(iter_record_batches(file_path, record_path="Data", batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 1])
+        self.assertEqual(batches[1]["column2"].tolist(), [12345678])
+        os.remove(file_path)  # Clean up the test file
+
+    def test_parquet_dataset_round_trip(self):
+        df = pd.DataFrame({
+            "year": [2019, 2019, 2020, 2020],
+            "parameter_code": [88101, 44201, 88101, 44201],
+            "county": ["Alameda", "Alameda", "Alameda", "Fresno"],
+            "arithmetic_mean": [9.4, 0.04, 8.1, 0.05],
+            "date": ["2019-03-31", "2019-03-31", "2020-03-31", "2020-03-31"]
+        })
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "combined.parquet")
+        save_parquet_dataset(df, path)
+
+        self.assertTrue(os.path.isdir(os.path.join(path, "year=2019", "parameter_code=88101")))
+        loaded, _ = load_air_quality_df("parquet", parquet_path=path, columns=["county", "arithmetic_mean", "year"], filters=[("year", "=", 2020)])
+        self.assertEqual(sorted(loaded.columns), ["arithmetic_mean", "county", "year"])
+        self.assertEqual(loaded["year"].tolist(), [2020, 2020])
+        self.assertIsInstance(loaded["county"].dtype, pd.CategoricalDtype)
+        shutil.rmtree(directory)
+
+    def test_filter_index_matches_filter_df(self):
+        df = pd.DataFrame({
+            "parameter": ["Ozone", "PM2.5", "Ozone", "Ozone", "PM2.5"],
+            "county": ["Alameda", "Alameda", "Fresno", "Kern", "Kern"],
+            "arithmetic_mean": [0.04, 9.4, 0.05, 0.06, 11.2]
+        })
+        index = FilterIndex(df, max_cached=2)
+        selections = [
+            ("Ozone", None), ("Ozone", ["all"]), ("Ozone", ["Kern", "Alameda"]), ("PM2.5", ["Fresno"]), ("CO", None), (None, ["Kern"]),
+            # Only a leading 'all' selects every county, whatever was memoized before
+            ("Ozone", ["all", "Kern"]), ("Ozone", ["Kern", "all"]),
+        ]
+        for pollutant, counties in selections:
+            pd.testing.assert_frame_equal(
+                filter_df(df=df, pollutant=pollutant, counties=counties, index=index),
+                filter_df(df=df, pollutant=pollutant, counties=counties)
+            )
+        self.assertEqual(len(index._cache), 2)
+        # repeated selections are served from the memo
+        self.assertIs(index.filter("Ozone", ["Alameda", "Kern"]), index.filter("Ozone", ["Kern", "Alameda"]))
+
 if __name__ == "__main__":
     unittest.main()
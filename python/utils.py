@@ -1,25 +1,133 @@
+import os
 import json
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import re
 from datetime import datetime as dt
-from difflib import SequenceMatcher
 import sqlalchemy
 
-# POSTGRESQL IMPORTS
-from google.cloud.sql.connector import Connector, IPTypes
-
-from constants import MAX_INPUT_LENGTH, BLOCKED_PATTERNS
+from bulk_load import bulk_load_csv
+from db_pool import get_pooled_engine, register_connector
+from schema import apply_schema
+from constants import PARQUET_PARTITION_COLS
 
 def save_json_to_file(data, filename="../assets/air_quality_data.json"):
     """Save JSON data to a file."""
     with open(filename, "w") as file:
         json.dump(data, file, indent=4)
 
-def load_json_to_dataframe(filename="../assets/air_quality_data.json", record_path=None):
-    """Load JSON data from a file into a Pandas DataFrame."""
+def load_json_to_dataframe(filename="../assets/air_quality_data.json", record_path=None, batch_size=10000, service=None):
+    """
+    Load JSON data from a file into a Pandas DataFrame, with AQS fields cast to their
+    declared types (see schema.apply_schema; `service` limits it to that service's fields).
+    A top-level `record_path` such as "Data" is streamed in batches (see iter_record_batches).
+    """
+    if isinstance(record_path, str):
+        batches = list(iter_record_batches(filename, record_path=record_path, batch_size=batch_size))
+        if not batches:
+            return pd.DataFrame()
+        return apply_schema(pd.concat(batches, ignore_index=True), service)
     with open(filename, "r") as file:
         data = json.load(file)
-    return pd.json_normalize(data, record_path=record_path)
+    return apply_schema(pd.json_normalize(data, record_path=record_path), service)
+
+class _JsonStream:
+    """Minimal incremental JSON tokenizer over a text file, decoding one value at a time."""
+    decoder = json.JSONDecoder()
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the JSON stream.")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # A number or literal at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+def iter_json_array(filename, key="Data", chunk_size=1 << 16):
+    """
+    Yield the items of the top-level `key` array of a JSON object file one at a time,
+    so memory is bounded by the largest item rather than by the file size.
+    A non-array value under `key` is yielded as a single item.
+    """
+    with open(filename, "r") as file:
+        stream = _JsonStream(file, chunk_size)
+        stream.expect("{")
+        while stream.peek() not in ("}", ""):
+            name = stream.value()
+            stream.expect(":")
+            if name != key:
+                stream.value()  # skip other sections (e.g. Header)
+            elif stream.peek() != "[":
+                yield stream.value()
+                return
+            else:
+                stream.expect("[")
+                while stream.peek() != "]":
+                    yield stream.value()
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                return
+            if stream.peek() == ",":
+                stream.pos += 1
+
+def iter_record_batches(filename, record_path="Data", batch_size=10000, normalize=True):
+    """
+    Stream the `record_path` array of an AQS response file as DataFrames of at most
+    `batch_size` rows. Each batch is columnar (one NumPy-backed array per field), so peak
+    memory is bounded by the batch size instead of the file size. Nested objects are
+    flattened with pd.json_normalize; `normalize=False` skips that for flat records,
+    which is several times faster.
+    """
+    to_frame = pd.json_normalize if normalize else pd.DataFrame
+    batch = []
+    for record in iter_json_array(filename, key=record_path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield to_frame(batch)
+            batch = []
+    if batch:
+        yield to_frame(batch)
 
 def mask_api_key_and_email(data):
     """Mask the API key and email address in the 'url' field of the 'Header' section."""
@@ -104,17 +212,84 @@ def get_code_header_title(selected_language):
 def get_param_options(param=None, add_all=True, dataframe=None):
     if dataframe is None:
         return []
-    param_options = [{'label': str(p), 'value': p} for p in sorted(dataframe[str(param)].unique())]
+    param_options = [{'label': str(p), 'value': p} for p in sorted(dataframe[str(param)].dropna().unique())]
     if add_all:
         param_options.insert(0, {'label': 'All', 'value': 'all'})
     return param_options
 
-def get_fig_from_code(code, cleaned_df, px, go, pd):
+def get_fig_from_code(code, cleaned_df, px, go, pd, sandbox=None):
+    """
+    Run generated plotting code and return the `fig` it defines.
+    With a sandbox.SandboxPool the code runs in a worker process instead of in-process.
+    """
+    if sandbox is not None:
+        fig_json = sandbox.run(code)
+        return go.Figure(json.loads(fig_json)) if fig_json else None
     local_vars = {}
     exec(code, {"cleaned_df": cleaned_df, "px": px, "go": go, "pd": pd}, local_vars)
     return local_vars.get('fig', None)
 
-def filter_df(df=None, pollutant=None, counties=None):
+def normalize_counties(counties):
+    """Canonical county selection: 'all' for no selection, otherwise a sorted list."""
+    if not counties or counties[0] == 'all':
+        return 'all'
+    if isinstance(counties, str):
+        counties = [counties]
+    return sorted(counties)
+
+class FilterIndex:
+    """
+    Row-position index over a frame's 'parameter' and 'county' columns.
+
+    A filter intersects precomputed position arrays instead of scanning both columns,
+    and results for repeated selections are memoized, evicting the least recently
+    used once `max_cached` selections are stored. Memoized frames are shared between
+    callers and must not be modified in place.
+    """
+    def __init__(self, df, max_cached=128):
+        self.df = df
+        self.max_cached = max_cached
+        self._parameter_positions = df.groupby('parameter', observed=True, sort=False).indices
+        self._county_positions = df.groupby('county', observed=True, sort=False).indices
+        self._all_positions = np.arange(len(df))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def positions(self, pollutant=None, counties=None):
+        """Sorted row positions matching the selection (same rules as filter_df)."""
+        positions = self._all_positions
+        if pollutant:
+            positions = self._parameter_positions.get(pollutant, self._all_positions[:0])
+        if counties and counties[0] != 'all':
+            county_positions = [self._county_positions[c] for c in counties if c in self._county_positions]
+            if not county_positions:
+                return self._all_positions[:0]
+            county_positions = np.concatenate(county_positions)
+            positions = np.intersect1d(positions, county_positions, assume_unique=True)
+        return positions
+
+    def filter(self, pollutant=None, counties=None):
+        # Keyed on the normalized selection: only a leading 'all' means every county
+        counties = normalize_counties(counties)
+        key = (pollutant, counties if counties == 'all' else tuple(counties))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        filtered = self.df.iloc[self.positions(pollutant, None if counties == 'all' else counties)]
+        with self._lock:
+            self._cache[key] = filtered
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return filtered
+
+def filter_df(df=None, pollutant=None, counties=None, index=None):
+    """
+    Filter rows by pollutant and counties ('all' or empty means every county).
+    Pass a FilterIndex built over `df` as `index` to use its position maps and memo.
+    """
+    if index is not None:
+        return index.filter(pollutant=pollutant, counties=counties)
     if df is None:
         raise ValueError("DataFrame 'df' must be provided.")
 
@@ -125,39 +300,127 @@ def filter_df(df=None, pollutant=None, counties=None):
         filtered = filtered[filtered['county'].isin(counties)]
     return filtered
 
-def secure_user_input(user_input, system_prompt):
-    if len(user_input) > MAX_INPUT_LENGTH:
-        return False, "Input too long. Please shorten your request."
-    if any(pat in user_input.lower() for pat in BLOCKED_PATTERNS):
-        return False, "Input contains blocked phrases. Please rephrase."
-    if is_similar(user_input, system_prompt):
-        return False, "Input too similar to system prompt. Please rephrase."
-    # Optionally sanitize
-    sanitized = re.sub(r"```|system:|assistant:|user:", "", user_input, flags=re.IGNORECASE)
-    return True, sanitized
-
-def is_similar(a, b, threshold=0.8):
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold
-
 def initialize_db_data(engine, inspect, table_name, data_path, connection_type):
     """
     Initialize the database with data from a CSV file if the table doesn't exist.
+    The CSV is streamed in with bulk_load.bulk_load_csv, which only creates the table
+    once every row is in, so a failed load is retried on the next start.
     """
     # If the table doesn't exist, upload the CSV
     if connection_type in ["mysql", "sqlite", "cloud_sql", "postgresql"]:
-        with engine.begin() as conn:
-            if not inspect(conn).has_table(table_name):
-                csv_df = pd.read_csv(data_path)
-                csv_df.to_sql(table_name, conn, index=False, if_exists="replace", chunksize=1000)
-                print(f"Uploaded data to table '{table_name}'.")
+        with engine.connect() as conn:
+            has_table = inspect(conn).has_table(table_name)
+        if not has_table:
+            rows = bulk_load_csv(engine, table_name, data_path, if_exists="replace")
+            print(f"Uploaded {rows} rows to table '{table_name}'.")
+
+def upsert_dataframe(engine, table_name, df, key_columns):
+    """
+    Insert or replace rows of `df` in `table_name`, matching on `key_columns`.
+
+    Rows are written to a staging table, matching rows are deleted from the target and
+    the staged rows are inserted, all in one transaction. This works the same way on
+    SQLite, MySQL and PostgreSQL. Columns the target table doesn't have are dropped,
+    and values are cast to the target column types.
+    Returns: number of rows written.
+    """
+    if df.empty:
+        return 0
+    df = df.drop_duplicates(subset=key_columns, keep="last")
+    with engine.begin() as conn:
+        inspector = sqlalchemy.inspect(conn)
+        if not inspector.has_table(table_name):
+            df.to_sql(table_name, conn, index=False, chunksize=1000)
+            return len(df)
+
+        df = _align_to_table_columns(df, inspector.get_columns(table_name))
+        staging_table = f"{table_name}_staging"
+        df.to_sql(staging_table, conn, index=False, if_exists="replace", chunksize=1000)
+
+        quote = conn.dialect.identifier_preparer.quote
+        target, staging = quote(table_name), quote(staging_table)
+        match = " AND ".join(
+            f"({staging}.{quote(c)} = {target}.{quote(c)} OR ({staging}.{quote(c)} IS NULL AND {target}.{quote(c)} IS NULL))"
+            for c in key_columns
+        )
+        columns = ", ".join(quote(c) for c in df.columns)
+        conn.execute(sqlalchemy.text(f"DELETE FROM {target} WHERE EXISTS (SELECT 1 FROM {staging} WHERE {match})"))
+        conn.execute(sqlalchemy.text(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging}"))
+        conn.execute(sqlalchemy.text(f"DROP TABLE {staging}"))
+    return len(df)
+
+def _align_to_table_columns(df, table_columns):
+    """Keep only columns the table has and cast values to the table's column types."""
+    df = df[[c["name"] for c in table_columns if c["name"] in df.columns]].copy()
+    for column in table_columns:
+        name, col_type = column["name"], column["type"]
+        if name not in df.columns:
+            continue
+        if isinstance(col_type, sqlalchemy.Integer):
+            df[name] = pd.to_numeric(df[name], errors="coerce").astype("Int64")
+        elif isinstance(col_type, (sqlalchemy.Float, sqlalchemy.Numeric)):
+            df[name] = pd.to_numeric(df[name], errors="coerce")
+        elif isinstance(col_type, sqlalchemy.String) and pd.api.types.is_datetime64_any_dtype(df[name]):
+            df[name] = df[name].dt.strftime("%Y-%m-%d")
+    return df
+
+def to_categoricals(df, max_unique_ratio=0.5):
+    """
+    Convert repetitive string columns (e.g. url, monitoring_agency, address) to
+    categoricals, so they are stored dictionary-encoded.
+    """
+    df = df.copy()
+    for column in df.select_dtypes(include=["object", "string"]).columns:
+        values = df[column]
+        if len(values) and values.nunique(dropna=True) <= max_unique_ratio * len(values):
+            df[column] = values.astype("category")
+    return df
+
+def save_parquet_dataset(df, path, partition_cols=PARQUET_PARTITION_COLS):
+    """
+    Save a combined dataset as Parquet, partitioned by year and parameter_code
+    (whichever of `partition_cols` the frame has), with dictionary-encoded categoricals.
+    Partitions present in `df` are replaced; other partitions under `path` are kept.
+    """
+    partition_cols = [c for c in partition_cols if c in df.columns]
+    if "date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df = df.assign(date=pd.to_datetime(df["date"]))
+    df = to_categoricals(df)
+    df.to_parquet(
+        path,
+        engine="pyarrow",
+        index=False,
+        partition_cols=partition_cols or None,
+        existing_data_behavior="delete_matching",
+    )
+    return path
+
+def load_parquet_dataset(path, columns=None, filters=None, partition_cols=PARQUET_PARTITION_COLS):
+    """
+    Load a Parquet dataset written by save_parquet_dataset, reading only the requested
+    `columns` and the partitions matching `filters`, e.g. [("year", ">=", 2020)].
+    """
+    df = pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters)
+    # Partition keys come back as categoricals; restore the integer codes
+    for column in partition_cols:
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = pd.to_numeric(df[column].astype(str))
+    return df
 
-def load_air_quality_df(connection_type, engine=None, table_name=None, download=None, cleaned_download=None):
+def load_air_quality_df(connection_type, engine=None, table_name=None, download=None, cleaned_download=None, parquet_path=None, columns=None, filters=None):
     """
-    Load the air quality dataframe based on the connection type.
-    Supports: 'github_raw', 'mysql', 'sqlite', 'postgresql'.
+    Load the air quality dataframe based on the connection type, with AQS fields cast
+    to their declared types (see schema.apply_schema).
+    Supports: 'github_raw', 'mysql', 'sqlite', 'postgresql', 'parquet'.
+    For 'parquet', only `columns` and the partitions matching `filters` are read.
     Returns: (df, cleaned_df)
     """
-    if connection_type == "github_raw":
+    if connection_type == "parquet":
+        if parquet_path is None:
+            raise ValueError("parquet_path required for parquet connection.")
+        df = load_parquet_dataset(parquet_path, columns=columns, filters=filters)
+        cleaned_df = None
+    elif connection_type == "github_raw":
         if download is None or cleaned_download is None:
             raise ValueError("Download bytes required for github_raw connection.")
         df = pd.read_csv(pd.compat.StringIO(download.decode('utf-8')), index_col=0)
@@ -169,6 +432,9 @@ def load_air_quality_df(connection_type, engine=None, table_name=None, download=
         cleaned_df = None  # You may want to add logic for cleaned_df if needed
     else:
         raise ValueError("Unsupported connection type specified.")
+    df = apply_schema(df)
+    if cleaned_df is not None:
+        cleaned_df = apply_schema(cleaned_df)
     return df, cleaned_df
 
 def get_db_engine(
@@ -185,32 +451,73 @@ def get_db_engine(
     """
     Returns a SQLAlchemy engine for the specified database type.
     Supports: sqlite, mysql, postgresql (with optional Cloud SQL connector).
+
+    Engines are shared process-wide (see db_pool): repeated calls with the same
+    settings return the same engine and connection pool.
     """
     if db_type == "sqlite":
         db_path = db_name or "epa_aqs_data.db"
-        return sqlalchemy.create_engine(f"sqlite:///{db_path}")
+        return get_pooled_engine(("sqlite", db_path), f"sqlite:///{db_path}")
 
     elif db_type == "mysql":
         db_url = f"mysql+mysqlconnector://{db_user}:{db_pass}@{db_host}/{db_user}${db_name}"
-        return sqlalchemy.create_engine(db_url)
+        return get_pooled_engine(("mysql", db_host, db_user, db_name), db_url)
 
     elif db_type == "postgresql":
-        # use the Cloud SQL Python Connector for the connection.
-        connector = Connector(refresh_strategy="LAZY")
-        creator = get_cloud_sql_creator(
-            connector, cloud_sql_instance=db_host, db_user=db_user, db_pass=db_pass, db_name=db_name
-        )
-        if use_cloud_sql_connector and creator:
-            return sqlalchemy.create_engine(
-                "postgresql+pg8000://",
-                creator=creator
-            )
+        if use_cloud_sql_connector:
+            def make_creator():
+                if creator is not None:
+                    return creator
+                cloud_sql_connector = connector
+                if cloud_sql_connector is None:
+                    # use the Cloud SQL Python Connector for the connection (imported here; it is slow to import).
+                    from google.cloud.sql.connector import Connector
+                    cloud_sql_connector = register_connector(Connector(refresh_strategy="LAZY"))
+                return get_cloud_sql_creator(
+                    cloud_sql_connector, cloud_sql_instance=db_host, db_user=db_user, db_pass=db_pass, db_name=db_name
+                )
+            # The connector is only built the first time this engine is requested
+            return get_pooled_engine(("cloud_sql", db_host, db_user, db_name), "postgresql+pg8000://", make_creator=make_creator)
         else:
             # Validate required parameters for fallback connection
             if not all([db_user, db_pass, db_host, db_name]):
                 raise ValueError("db_user, db_pass, db_host, and db_name must be provided for PostgreSQL fallback connection.")
             db_url = f"postgresql+psycopg2://{db_user}:{db_pass}@{db_host}/{db_name}"
-            return sqlalchemy.create_engine(db_url)
+            return get_pooled_engine(("postgresql", db_host, db_user, db_name), db_url)
+
+def get_configured_engine(connection_type):
+    """
+    Build the SQLAlchemy engine and table name for a DB_CONNECTION_TYPE from environment variables.
+    Returns: (engine, table_name)
+    """
+    if connection_type == "mysql":
+        engine = get_db_engine(
+            db_type="mysql",
+            db_name=os.getenv("MYSQL_DB_NAME", None),
+            db_user=os.getenv("MYSQL_DB_USER", None),
+            db_pass=os.getenv("MYSQL_DB_PASS", None),
+            db_host=os.getenv("MYSQL_DB_HOST_LOCAL", None)
+        )
+        table_name = os.getenv("MYSQL_TABLE_NAME", "air_quality")
+    elif connection_type == "cloud_sql":
+        engine = get_db_engine(
+            db_type="postgresql",
+            db_name=os.getenv("CLOUD_SQL_DB_NAME", None),
+            db_user=os.getenv("CLOUD_SQL_DB_USER", None),
+            db_pass=os.getenv("CLOUD_SQL_DB_PASS", None),
+            db_host=os.getenv("CLOUD_SQL_DB_HOST", None),
+            use_cloud_sql_connector=True
+        )
+        table_name = os.getenv("CLOUD_SQL_TABLE_NAME", "air_quality")
+    elif connection_type == "sqlite":
+        engine = get_db_engine(
+            db_type="sqlite",
+            db_name=os.getenv("SQLITE_DB_PATH", "epa_aqs_data.db")
+        )
+        table_name = os.getenv("SQLITE_TABLE_NAME", "air_quality")
+    else:
+        raise ValueError("Unsupported connection type specified.")
+    return engine, table_name
 
 def get_cloud_sql_creator(
     connector,
@@ -218,14 +525,18 @@ def get_cloud_sql_creator(
     db_user,
     db_pass,
     db_name,
-    ip_type=IPTypes.PUBLIC
+    ip_type=None
 ):
     """
     Returns a creator function for Cloud SQL connections.
 
     The returned function provides all necessary connection details (database, user, password, host)
     via the connector.connect method, which is compatible with SQLAlchemy's 'creator' argument.
+    `ip_type` defaults to IPTypes.PUBLIC.
     """
+    if ip_type is None:
+        from google.cloud.sql.connector import IPTypes
+        ip_type = IPTypes.PUBLIC
     def getconn():
         conn = connector.connect(
             cloud_sql_instance,
@@ -1,23 +1,38 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import itertools
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import re
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'python')))
+from utils import save_parquet_dataset
+from schema import apply_schema
 
 # Set BASE_PATH to the directory containing the notebook/script
 BASE_PATH = Path().resolve()
-print(f"Base path set to: {BASE_PATH}")
 
-REPORTS_PATH = BASE_PATH.parent / "my_reports" / "to_combine" # Default path for reports
+MANIFEST_SUFFIX = ".manifest.json" # written next to a streamed output
+SCHEMA_SAMPLE_ROWS = 10000 # rows read per report to infer column types
 
-if not REPORTS_PATH.exists():
-    REPORTS_PATH = Path(input("Enter the path to the reports directory (default is current directory): ").strip())
-    if not REPORTS_PATH:
-      REPORTS_PATH = BASE_PATH
-    else:
-      REPORTS_PATH = REPORTS_PATH.resolve()
-print(f"Reports path set to: {REPORTS_PATH}")
+def get_reports_path():
+    """Return the default reports directory, or ask for one if it doesn't exist."""
+    reports_path = BASE_PATH.parent / "my_reports" / "to_combine" # Default path for reports
+    if not reports_path.exists():
+        answer = input("Enter the path to the reports directory (default is current directory): ").strip()
+        reports_path = Path(answer).resolve() if answer else BASE_PATH
+    print(f"Reports path set to: {reports_path}")
+    return reports_path
 
-# Use rglob() with the pattern '*.csv' to find all CSV files recursively
-csv_files = list(REPORTS_PATH.rglob('*.csv'))
+def find_csv_files(reports_path):
+    """Use rglob() with the pattern '*.csv' to find all CSV files recursively."""
+    return sorted(Path(reports_path).rglob('*.csv'))
 
 def display_file_list(files):
     """Display the list of files found."""
@@ -38,21 +53,32 @@ def extract_year_from_filename(filename, pattern=r"(?!\_)(\d{4})(\d{4})?-?(\d{6}
         return match.group(1)
     return None
 
+def read_report(file, nrows=None):
+    """
+    Read one report, adding a 'year' column from the filename if it has none, with
+    AQS fields cast to their declared types (see schema.apply_schema).
+    Returns: (df, years)
+    """
+    df = pd.read_csv(file, nrows=nrows)
+    years = []
+    if 'year' in df.columns:
+        years = list(df['year'].unique())
+    else:
+        year = extract_year_from_filename(Path(file).name)
+        if year:
+            df['year'] = year
+            years = [year]
+    return apply_schema(df), years
+
 def combine_csv_files(file_list):
     """Combine multiple CSV files into a single DataFrame."""
     dataframes = []
     years = []
     for file in file_list:
         try:
-            df = pd.read_csv(file)
+            df, file_years = read_report(file)
             dataframes.append(df)
-            if 'year' in df.columns:
-               years.extend(df['year'].unique())
-            else:
-              year = extract_year_from_filename(file.name)
-              if year:
-                  years.append(year)
-                  df['year'] = year
+            years.extend(file_years)
         except Exception as e:
           print(f"Error reading {file}: {e}")
     if dataframes:
@@ -60,51 +86,312 @@ def combine_csv_files(file_list):
         return combined_df, years
     else:
         return pd.DataFrame(), years
-    
-def save_combined_csv(df, years, filename=None):
+
+def file_fingerprint(file, previous=None, block_size=1024**2):
+    """
+    The size, mtime and SHA-256 of a file. The hash is reused from `previous` (the
+    file's last manifest entry) when size and mtime haven't changed.
+    """
+    stat = os.stat(file)
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+        return previous
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest.hexdigest()}
+
+def read_schema(file):
+    """Columns and dtypes of a report, inferred from its first SCHEMA_SAMPLE_ROWS rows."""
+    try:
+        df, _ = read_report(file, nrows=SCHEMA_SAMPLE_ROWS)
+    except Exception as e:
+        print(f"Error reading {file}: {e}")
+        return {}
+    return {column: str(dtype) for column, dtype in df.dtypes.items()}
+
+def nullable_dtype(dtype):
+    """
+    The dtype a merged column of this type gets: nullable integers and booleans (for
+    the rows of files without the column), and strings for categoricals and objects
+    (Parquet dictionary-encodes them anyway). A merged dtype maps to itself.
+    """
+    if dtype.startswith("int"):
+        return dtype.capitalize()
+    if dtype == "bool":
+        return "boolean"
+    if dtype in ("category", "object"):
+        return "string"
+    return dtype
+
+def merge_schemas(schemas):
+    """
+    Union of the columns of several reports, in first-seen order, each with a type
+    all of them fit: a type they share, nullable integers, floats, booleans or else
+    strings. Merging an already merged schema again leaves it unchanged.
+    """
+    seen = {}
+    for schema in schemas:
+        for column, dtype in schema.items():
+            seen.setdefault(column, set()).add(nullable_dtype(dtype))
+    merged = {}
+    for column, dtypes in seen.items():
+        if len(dtypes) == 1:
+            merged[column] = dtypes.pop()
+        elif dtypes <= {"Int8", "Int16", "Int32", "Int64"}:
+            merged[column] = "Int64"
+        elif dtypes <= {"Int8", "Int16", "Int32", "Int64", "float32", "float64"}:
+            merged[column] = "float64"
+        else:
+            merged[column] = "string"
+    return merged
+
+def widen_dtype(dtype):
+    """The next wider type a column can take: float64 for integers, then string."""
+    return "float64" if dtype.lower().startswith("int") else "string"
+
+def cast_report(df, dtypes):
+    """
+    Cast `df` to `dtypes`, widening the type of any column with a value that doesn't
+    fit (see widen_dtype); merge_schemas only sees each report's first rows.
+    Returns: (df, the dtypes used)
+    """
+    dtypes = dict(dtypes)
+    for column, dtype in dtypes.items():
+        while True:
+            try:
+                df[column] = df[column].astype(dtype)
+                break
+            except (ValueError, TypeError):
+                dtype = dtypes[column] = widen_dtype(dtype)
+    return df, dtypes
+
+def read_aligned_report(file, dtypes):
+    """Read a report with exactly the merged columns (missing columns are empty). Returns: (df, years, dtypes used)"""
+    df, years = read_report(file)
+    df, dtypes = cast_report(df.reindex(columns=list(dtypes)), dtypes)
+    return df, [str(year) for year in years], dtypes
+
+class SchemaWidened(Exception):
+    """A report has values that need wider column types than the output was started with."""
+    def __init__(self, dtypes):
+        super().__init__(f"Column types widened: {dtypes}")
+        self.dtypes = dtypes
+
+def iter_aligned_reports(executor, files, dtypes, max_pending):
+    """
+    Read reports in the process pool and yield (file, df, years) in file order,
+    with at most `max_pending` files read ahead, so memory stays bounded.
+    Raises SchemaWidened if a report needs wider types than `dtypes`, and ValueError
+    if a report can't be read.
+    """
+    files = iter(files)
+    pending = deque((file, executor.submit(read_aligned_report, file, dtypes)) for file in itertools.islice(files, max_pending))
+    while pending:
+        file, future = pending.popleft()
+        for next_file in itertools.islice(files, 1):
+            pending.append((next_file, executor.submit(read_aligned_report, next_file, dtypes)))
+        try:
+            df, years, used = future.result()
+        except Exception as e:
+            for _, other in pending:
+                other.cancel()
+            raise ValueError(f"Error reading {file}: {e}") from e
+        if used != dtypes:
+            for _, other in pending:
+                other.cancel()
+            raise SchemaWidened(used)
+        yield file, df, years
+
+class CsvAppender:
+    """Writes frames to one CSV file, the header only once."""
+    def __init__(self, path, dtypes, append=False):
+        self.path = path
+        self.header = not append
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+class ParquetAppender:
+    """
+    Writes frames as row groups of a new part file in a Parquet dataset directory.
+    Appending adds a part file; otherwise the directory is replaced.
+    """
+    def __init__(self, path, dtypes, append=False):
+        if not append and path.exists():
+            shutil.rmtree(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.file = path / f"part-{len(list(path.glob('part-*.parquet'))):05d}.parquet"
+        self.schema = pa.Schema.from_pandas(pd.DataFrame(columns=list(dtypes)).astype(dtypes), preserve_index=False)
+        self.writer = None
+
+    def write(self, df):
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.file, self.schema)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def new_manifest():
+    return {"files": {}, "columns": {}, "years": []}
+
+def load_manifest(path):
+    """The files, fingerprints, columns and years recorded by the last streamed combine."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return new_manifest()
+
+def save_manifest(manifest, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def combine_csv_files_streaming(file_list, out_file, output_format="csv", workers=None):
+    """
+    Combine CSV files straight into `out_file` without holding them all in memory.
+
+    Files are parsed in a process pool and each one is appended to the output (a CSV
+    file, or a directory of Parquet part files) as soon as it and the files before it
+    are read; columns are aligned to the union of all files' columns. A manifest next
+    to the output records each file's size, mtime and hash: when only new files were
+    added since the last run they are appended, and when a combined file changed or
+    was removed the output is rebuilt.
+
+    Returns: (out_file, rows written)
+    """
+    out_file = Path(out_file)
+    manifest_path = out_file.with_name(out_file.name + MANIFEST_SUFFIX)
+    manifest = load_manifest(manifest_path) if out_file.exists() else new_manifest()
+    previous = manifest["files"]
+    workers = workers or os.cpu_count()
+    appender_class = ParquetAppender if output_format == "parquet" else CsvAppender
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        fingerprints = dict(zip(file_list, executor.map(file_fingerprint, file_list, [previous.get(str(f)) for f in file_list])))
+        new_files = [f for f in file_list if str(f) not in previous]
+        changed = [f for f in file_list if str(f) in previous and fingerprints[f]["sha256"] != previous[str(f)]["sha256"]]
+        removed = set(previous) - {str(f) for f in file_list}
+        append = bool(previous) and not changed and not removed
+        if append:
+            dtypes = merge_schemas([manifest["columns"]] + list(executor.map(read_schema, new_files)))
+            # New columns or wider types can't be appended to what's already written
+            append = dtypes == merge_schemas([manifest["columns"]])
+        if not append:
+            dtypes = merge_schemas(executor.map(read_schema, file_list))
+            manifest = new_manifest()
+        to_read = new_files if append else file_list
+        print(f"{'Appending' if append else 'Combining'} {len(to_read)} of {len(file_list)} files ({len(changed)} changed, {len(removed)} removed)")
+
+        for f in file_list:
+            if str(f) in manifest["files"]:
+                manifest["files"][str(f)] = fingerprints[f] # refresh mtimes of unchanged files
+        if not to_read:
+            print(f"{out_file} is up to date.")
+            save_manifest(manifest, manifest_path)
+            return out_file, 0
+
+        while True:
+            rows = 0
+            years = set(manifest["years"])
+            appender = appender_class(out_file, dtypes, append=append)
+            try:
+                for file, df, file_years in iter_aligned_reports(executor, to_read, dtypes, max_pending=2 * workers):
+                    appender.write(df)
+                    rows += len(df)
+                    years.update(file_years)
+                    manifest["files"][str(file)] = fingerprints[file]
+            except SchemaWidened as e:
+                # Rows already written have the narrower types; write everything again
+                dtypes = e.dtypes
+                append, to_read, manifest = False, file_list, new_manifest()
+                print(f"Widened column types past the sampled rows, combining all {len(file_list)} files again")
+                continue
+            except BaseException:
+                # The output is incomplete; without a manifest the next run rebuilds it
+                if manifest_path.exists():
+                    os.remove(manifest_path)
+                raise
+            finally:
+                appender.close()
+            break
+
+    manifest["columns"] = dtypes
+    manifest["years"] = sorted(years)
+    save_manifest(manifest, manifest_path)
+    year_range = f" ({manifest['years'][0]}-{manifest['years'][-1]})" if years else ""
+    print(f"Wrote {rows} rows{year_range} to {out_file.resolve()}")
+    return out_file, rows
+
+def save_combined_csv(df, years, filename=None, output_format="csv"):
   """
-  Save the combined DataFrame to a CSV file.
+  Save the combined DataFrame to a CSV file, or to a Parquet dataset partitioned
+  by year when output_format is "parquet".
 
   Args:
     df (pd.DataFrame): The DataFrame to save.
     years (list): List of years extracted from filenames.
     filename (str, optional): Base filename for output. Defaults to None.
+    output_format (str, optional): "csv" or "parquet". Defaults to "csv".
 
   Returns:
-    Path: Path to the saved CSV file.
+    Path: Path to the saved CSV file or Parquet dataset.
   """
   filename = filename or "combined_output"
+  extension = "parquet" if output_format == "parquet" else "csv"
   if years:
     years_clean = sorted(set(years))
     year_range = f"{years_clean[0]}-{years_clean[-1]}"
-    out_file = BASE_PATH / f"{filename}_{year_range}.csv"
+    out_file = BASE_PATH / f"{filename}_{year_range}.{extension}"
   else:
-    out_file = BASE_PATH / f"{filename}.csv"
+    out_file = BASE_PATH / f"{filename}.{extension}"
 
   try:
-    df.to_csv(out_file, index=False)
-    print(f"Combined CSV saved to {out_file.resolve()}")
+    if output_format == "parquet":
+      save_parquet_dataset(df, out_file)
+    else:
+      df.to_csv(out_file, index=False)
+    print(f"Combined {extension.upper()} saved to {out_file.resolve()}")
   except Exception as e:
-    print(f"Error saving CSV: {e}")
+    print(f"Error saving {extension.upper()}: {e}")
     return None
 
   return out_file
 
-def main():
+def main(output_format="csv", stream=False, workers=None):
+    print(f"Base path set to: {BASE_PATH}")
+    csv_files = find_csv_files(get_reports_path())
     display_file_list(csv_files)
     
     if not csv_files:
         print("No CSV files to combine. Exiting.")
         return
     
+    if stream:
+        extension = "parquet" if output_format == "parquet" else "csv"
+        combine_csv_files_streaming(csv_files, BASE_PATH / f"combined_output.{extension}", output_format, workers)
+        return
+
     combined_df, years = combine_csv_files(csv_files)
     
     if combined_df.empty:
         print("No data found in the CSV files. Exiting.")
         return
     
-    save_combined_csv(combined_df, years)
+    save_combined_csv(combined_df, years, output_format=output_format)
 
 if __name__ == "__main__":
-    main()
+    main(
+        output_format="parquet" if "--parquet" in sys.argv else "csv",
+        stream="--stream" in sys.argv,
+        workers=int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    )
     print("Script executed successfully.")
\ No newline at end of file
@@ -1,48 +1,110 @@
 import os
-import json
+import sys
+import functools
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime as dt
-import pandas.tseries.offsets as offsets
+from pandas.api.types import union_categoricals
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'python')))
+from utils import iter_json_array, iter_record_batches, save_parquet_dataset
+from schema import apply_schema
 
-def read_flatten_json(filepath):
-    """Read a JSON file and flatten header into each record."""
-    with open(filepath, "r") as f:
-        j = json.load(f)
-    header = j["Header"][0] if isinstance(j["Header"], list) and len(j["Header"]) == 1 else j["Header"]
-    records = []
-    for record in j["Data"]:
-        record_with_header = {**record, **header}
-        records.append(record_with_header)
-    return records
+def header_columns(header, rows):
+    """
+    The Header fields as constant categorical columns of length `rows`: each value is
+    stored once and every row only holds a one-byte code.
+    """
+    codes = np.zeros(rows, dtype=np.int8)
+    return {
+        key: pd.Categorical.from_codes(codes, [value]) if value is not None else pd.Categorical([None] * rows)
+        for key, value in header.items()
+    }
 
-def combine_json_files(data_dir, pattern="quarterlysummary_by_state", flatten_header=True):
-    """Combine all matching JSON files in a directory."""
-    files = [f for f in os.listdir(data_dir) if f.startswith(pattern) and f.endswith(".json")]
+def read_flatten_json(filepath, batch_size=10000, flatten_header=True):
+    """
+    Read a JSON file's Data records into one frame and broadcast the header into it.
+    The records are streamed in columnar batches of `batch_size` (see
+    utils.iter_record_batches), so the file is never held as a list of dicts.
+    AQS Data records are flat, so they are not run through json_normalize.
+    """
+    header = list(iter_json_array(filepath, key="Header"))
+    header = header[0] if len(header) == 1 else {}
+    frames = list(iter_record_batches(filepath, record_path="Data", batch_size=batch_size, normalize=False))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if flatten_header and header:
+        df = df.assign(**header_columns(header, len(df)))
+    return df
+
+def concat_frames(frames):
+    """
+    pd.concat the per-file frames, keeping columns that are categorical in every
+    frame (the broadcast header fields) categorical over the union of their values.
+    """
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    categorical = [
+        column for column in columns
+        if all(column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames)
+    ]
+    df = pd.concat([frame.drop(columns=categorical) for frame in frames], ignore_index=True)
+    for column in categorical:
+        try:
+            df[column] = union_categoricals([frame[column] for frame in frames])
+        except TypeError:
+            # Categories of different types (e.g. rows as int and str) can't be unioned
+            df[column] = pd.concat([frame[column].astype(object) for frame in frames], ignore_index=True)
+    return df[columns]
+
+def combine_json_files(data_dir, pattern="quarterlysummary_by_state", flatten_header=True, workers=None, batch_size=10000):
+    """
+    Combine all matching JSON files in a directory, reading them in parallel with
+    `workers` processes (all CPUs by default; 1 reads them in this process), each
+    streamed in batches of `batch_size` records.
+    """
+    files = sorted(f for f in os.listdir(data_dir) if f.startswith(pattern) and f.endswith(".json"))
     if not files:
         raise FileNotFoundError("No matching files found.")
-    all_records = []
-    for fname in files:
-        all_records.extend(read_flatten_json(os.path.join(data_dir, fname)))
-    df = pd.DataFrame(all_records)
-    return df
+    paths = [os.path.join(data_dir, fname) for fname in files]
+    read = functools.partial(read_flatten_json, batch_size=batch_size, flatten_header=flatten_header)
+    workers = min(workers or os.cpu_count(), len(paths))
+    if workers == 1:
+        frames = [read(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(read, paths))
+    return concat_frames(frames)
 
 def add_quarter_end_date(df, year_col="year", quarter_col="quarter", date_col="date"):
-    """Add end-of-quarter date column."""
+    """Add end-of-quarter date column, computed from the year and quarter numbers."""
     df[year_col] = df[year_col].astype(int)
     df[quarter_col] = df[quarter_col].astype(int)
-    df[date_col] = pd.to_datetime(df[year_col].astype(str) + 'Q' + df[quarter_col].astype(str)) + offsets.QuarterEnd()
+    # Months since 1970-01 of the first month after the quarter, minus one day
+    months = (df[year_col].to_numpy() - 1970) * 12 + df[quarter_col].to_numpy() * 3
+    quarter_end = months.astype("datetime64[M]").astype("datetime64[D]") - np.timedelta64(1, "D")
+    df[date_col] = quarter_end.astype("datetime64[ns]")
     return df
 
-def main(data_dir=None, output_file=None):
+def main(data_dir=None, output_file=None, output_format="csv", workers=None):
+    """
+    Combine JSON responses and save them as CSV, or as a Parquet dataset
+    partitioned by year and parameter_code when output_format is "parquet".
+    """
     if data_dir is None:
         data_dir = input("Enter the directory containing JSON files: ")
         data_dir = os.path.normpath(data_dir)
     if output_file is None:
-        output_file = f"combined_data_{dt.now().strftime('%Y%m%d-%H%M%S')}.csv"
-    df = combine_json_files(data_dir)
-    df = add_quarter_end_date(df)
-    df.to_csv(output_file, index=False)
+        extension = "parquet" if output_format == "parquet" else "csv"
+        output_file = f"combined_data_{dt.now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    df = combine_json_files(data_dir, workers=workers)
+    df = apply_schema(add_quarter_end_date(df))
+    if output_format == "parquet":
+        save_parquet_dataset(df, output_file)
+    else:
+        df.to_csv(output_file, index=False)
     print(f"Combined data saved to {os.path.abspath(output_file)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(
+        output_format="parquet" if "--parquet" in sys.argv else "csv",
+        workers=int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    )
\ No newline at end of file